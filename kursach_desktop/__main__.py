@@ -1,5 +1,13 @@
-from .cli import app
+import sys
+
+from .daemon import forward
 
 
 if __name__ == "__main__":
+    # Hand the command to a running daemon before paying for the typer/httpx imports.
+    code = forward(sys.argv[1:])
+    if code is not None:
+        raise SystemExit(code)
+    from .cli import app
+
     app()
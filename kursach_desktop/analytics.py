@@ -0,0 +1,396 @@
+"""Vectorized portfolio analytics over sell-overview holdings and price history."""
+
+from __future__ import annotations
+
+import asyncio
+import csv
+import logging
+import math
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Mapping, Sequence, Tuple
+
+from .api import ApiError, AsyncKursachApi
+from .formatting import format_money
+from .history import PriceHistory, parse_timestamp
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_CONFIDENCE_LEVELS: Tuple[float, ...] = (0.95, 0.99)
+SECONDS_PER_YEAR = 365 * 86400
+
+
+class AnalyticsUnavailable(RuntimeError):
+    """Raised when the optional NumPy dependency is missing."""
+
+
+def require_numpy() -> Any:
+    try:
+        import numpy
+    except ImportError as exc:
+        raise AnalyticsUnavailable(
+            "Portfolio analytics need NumPy; install it with `pip install -r requirements.txt` (or `pip install numpy`)"
+        ) from exc
+    return numpy
+
+
+@dataclass
+class PortfolioAnalytics:
+    asset_ids: List[str]
+    symbols: List[str]
+    quantities: "np.ndarray"
+    prices: "np.ndarray"
+    values: "np.ndarray"
+    weights: "np.ndarray"
+    pnl: "np.ndarray"
+    pnl_pct: "np.ndarray"
+    volatility: "np.ndarray"
+    correlation: "np.ndarray"
+    total_value: float
+    total_pnl: float
+    portfolio_volatility: float
+    observations: int
+    step_seconds: int
+    var: Dict[float, float] = field(default_factory=dict)
+    cvar: Dict[float, float] = field(default_factory=dict)
+    seconds: float = 0.0
+
+    def top_correlations(self, count: int = 5) -> List[Tuple[str, str, float]]:
+        np = require_numpy()
+        size = len(self.asset_ids)
+        if size < 2 or count <= 0:
+            return []
+        rows, cols = np.triu_indices(size, k=1)
+        values = self.correlation[rows, cols]
+        valid = ~np.isnan(values)
+        rows, cols, values = rows[valid], cols[valid], values[valid]
+        if not len(values):
+            return []
+        count = min(count, len(values))
+        pick = np.argpartition(-np.abs(values), count - 1)[:count]
+        pick = pick[np.argsort(-np.abs(values[pick]))]
+        return [(self.symbols[rows[i]], self.symbols[cols[i]], float(values[i])) for i in pick]
+
+
+def history_arrays(points: Any) -> Tuple["np.ndarray", "np.ndarray"]:
+    """Convert a :class:`PriceHistory` or raw API points into sorted (seconds, price) arrays."""
+    np = require_numpy()
+    if isinstance(points, PriceHistory):
+        timestamps, prices = points.arrays()
+        return timestamps / 1000.0, prices
+    if isinstance(points, dict):
+        points = points.get("prices") or points.get("history") or []
+    if not isinstance(points, list) or not points:
+        return np.empty(0, dtype=np.float64), np.empty(0, dtype=np.float64)
+    first = points[0]
+    if isinstance(first, dict):
+        raw_times = [point.get("timestamp", point.get("time")) for point in points]
+        prices = np.fromiter((_as_price(point.get("price")) for point in points), dtype=np.float64, count=len(points))
+    else:
+        raw_times = [point[0] for point in points]
+        prices = np.fromiter((_as_price(point[1]) for point in points), dtype=np.float64, count=len(points))
+    if all(isinstance(value, (int, float)) for value in raw_times):
+        times = np.asarray(raw_times, dtype=np.float64)
+        # Millisecond epochs, as the web client receives them.
+        times = np.where(times > 1e11, times / 1000.0, times)
+    else:
+        times = np.fromiter(
+            (parse_timestamp(value) or math.nan for value in raw_times), dtype=np.float64, count=len(raw_times)
+        )
+    keep = ~(np.isnan(times) | np.isnan(prices))
+    times, prices = times[keep], prices[keep]
+    order = np.argsort(times, kind="stable")
+    return times[order], prices[order]
+
+
+def align_histories(
+    series: Sequence[Tuple["np.ndarray", "np.ndarray"]],
+    step: int,
+    *,
+    start: float | None = None,
+) -> Tuple["np.ndarray", "np.ndarray"]:
+    """Sample each series on a ``step``-second grid as ``(grid, matrix)``: last price at or before each tick, else NaN."""
+    np = require_numpy()
+    populated = [times for times, _ in series if len(times)]
+    if not populated:
+        return np.empty(0, dtype=np.float64), np.full((0, len(series)), np.nan)
+    first = max(times[0] for times in populated) if start is None else start
+    last = max(times[-1] for times in populated)
+    grid = np.arange(math.ceil(first / step) * step, last + 1e-9, step, dtype=np.float64)
+    if not len(grid) or grid[-1] < last:
+        grid = np.append(grid, last)
+    matrix = np.full((len(grid), len(series)), np.nan)
+    for column, (times, prices) in enumerate(series):
+        if not len(times):
+            continue
+        index = np.searchsorted(times, grid, side="right") - 1
+        present = index >= 0
+        matrix[present, column] = prices[index[present]]
+    return grid, matrix
+
+
+def compute_analytics(
+    overview: Mapping[str, Any],
+    histories: Mapping[str, Any],
+    *,
+    step: int = 86400,
+    confidence_levels: Sequence[float] = DEFAULT_CONFIDENCE_LEVELS,
+) -> PortfolioAnalytics:
+    np = require_numpy()
+    started = time.perf_counter()
+    holdings = [item for item in overview.get("holdings") or [] if isinstance(item, dict)]
+    count = len(holdings)
+    asset_ids, symbols = _holding_labels(holdings)
+    quantities = _column(np, holdings, "quantity")
+    prices = _column(np, holdings, "current_price")
+    cost = _column(np, holdings, "avg_buy_price")
+
+    values = quantities * prices
+    total_value = float(values.sum())
+    weights = values / total_value if total_value else np.zeros(count)
+    pnl = (prices - cost) * quantities
+    invested = cost * quantities
+    pnl_pct = np.divide(pnl * 100, invested, out=np.zeros(count), where=invested != 0)
+
+    grid, matrix = align_histories([history_arrays(histories.get(asset_id)) for asset_id in asset_ids], step)
+    returns = np.diff(matrix, axis=0) / matrix[:-1] if len(grid) > 1 else np.empty((0, count))
+    periods_per_year = SECONDS_PER_YEAR / step
+    volatility = np.full(count, np.nan)
+    correlation = np.full((count, count), np.nan)
+    portfolio_volatility = math.nan
+    var: Dict[float, float] = {}
+    cvar: Dict[float, float] = {}
+
+    if len(returns) >= 2:
+        observed = (~np.isnan(returns)).sum(axis=0)
+        usable = observed >= 2
+        with np.errstate(invalid="ignore", divide="ignore"):
+            volatility[usable] = np.nanstd(returns[:, usable], axis=0, ddof=1) * math.sqrt(periods_per_year)
+            complete = returns[:, usable][~np.isnan(returns[:, usable]).any(axis=1)]
+            if len(complete) >= 2:
+                block = np.corrcoef(complete, rowvar=False) if complete.shape[1] > 1 else np.ones((1, 1))
+                index = np.flatnonzero(usable)
+                correlation[np.ix_(index, index)] = block
+
+        # Historical simulation: replay each period's returns against today's positions.
+        scenario_pnl = np.nan_to_num(returns) @ values
+        portfolio_returns = scenario_pnl / total_value if total_value else scenario_pnl
+        portfolio_volatility = float(np.std(portfolio_returns, ddof=1) * math.sqrt(periods_per_year))
+        for level in confidence_levels:
+            threshold = np.quantile(scenario_pnl, 1.0 - level)
+            var[level] = float(max(0.0, -threshold))
+            tail = scenario_pnl[scenario_pnl <= threshold]
+            cvar[level] = float(max(0.0, -tail.mean())) if len(tail) else var[level]
+
+    return PortfolioAnalytics(
+        asset_ids=asset_ids,
+        symbols=symbols,
+        quantities=quantities,
+        prices=prices,
+        values=values,
+        weights=weights,
+        pnl=pnl,
+        pnl_pct=pnl_pct,
+        volatility=volatility,
+        correlation=correlation,
+        total_value=total_value,
+        total_pnl=float(pnl.sum()),
+        portfolio_volatility=portfolio_volatility,
+        observations=len(returns),
+        step_seconds=step,
+        var=var,
+        cvar=cvar,
+        seconds=time.perf_counter() - started,
+    )
+
+
+@dataclass
+class ValueCurve:
+    timestamps: "np.ndarray"
+    values: "np.ndarray"
+    asset_ids: List[str]
+    missing: List[str]
+    step_seconds: int
+    seconds: float = 0.0
+
+    @property
+    def change_pct(self) -> float:
+        if len(self.values) < 2 or not self.values[0]:
+            return 0.0
+        return float((self.values[-1] / self.values[0] - 1.0) * 100)
+
+
+def portfolio_value_curve(
+    overview: Mapping[str, Any],
+    histories: Mapping[str, Any],
+    *,
+    step: int = 86400,
+) -> ValueCurve:
+    """Value of today's holdings over time: the aligned price matrix times the quantity vector."""
+    np = require_numpy()
+    started = time.perf_counter()
+    holdings = [item for item in overview.get("holdings") or [] if isinstance(item, dict)]
+    asset_ids, symbols = _holding_labels(holdings)
+    quantities = _column(np, holdings, "quantity")
+    series = [history_arrays(histories.get(asset_id)) for asset_id in asset_ids]
+    grid, matrix = align_histories(series, step)
+    missing = [symbol for symbol, (times, _) in zip(symbols, series) if not len(times)]
+    values = np.nan_to_num(matrix) @ quantities
+    return ValueCurve(
+        timestamps=grid,
+        values=values,
+        asset_ids=asset_ids,
+        missing=missing,
+        step_seconds=step,
+        seconds=time.perf_counter() - started,
+    )
+
+
+def write_value_curve_csv(curve: ValueCurve, path: Path) -> None:
+    with open(path, "w", encoding="utf-8", newline="") as handle:
+        writer = csv.writer(handle)
+        writer.writerow(["timestamp", "value_usd"])
+        for timestamp, value in zip(curve.timestamps.tolist(), curve.values.tolist()):
+            writer.writerow([_format_time(timestamp), f"{value:.2f}"])
+
+
+def print_value_curve(curve: ValueCurve, *, points: int = 15) -> None:
+    np = require_numpy()
+    print("\n=== Portfolio value history ===")
+    if not len(curve.values):
+        print("No price history available for the current holdings.")
+        print("===============================\n")
+        return
+    picks = np.unique(np.linspace(0, len(curve.values) - 1, num=max(2, points)).round().astype(int))
+    low, high = float(curve.values.min()), float(curve.values.max())
+    span = high - low or 1.0
+    for index in picks:
+        value = float(curve.values[index])
+        bar = "#" * (1 + int((value - low) / span * 29))
+        print(f"{_format_time(curve.timestamps[index]):<17} {'$' + format_money(value):>18}  {bar}")
+    print(
+        f"Start ${format_money(curve.values[0])} -> end ${format_money(curve.values[-1])} "
+        f"({curve.change_pct:+.2f}%) | min ${format_money(low)} | max ${format_money(high)}"
+    )
+    print(
+        f"{len(curve.values)} {_period_label(curve.step_seconds)} points over {len(curve.asset_ids)} asset(s), "
+        f"computed in {curve.seconds * 1000:.1f} ms"
+    )
+    if curve.missing:
+        print(f"No history (excluded): {', '.join(curve.missing)}")
+    print("===============================\n")
+
+
+def _format_time(timestamp: float) -> str:
+    return datetime.fromtimestamp(float(timestamp), tz=timezone.utc).strftime("%Y-%m-%d %H:%M")
+
+
+def _holding_labels(holdings: Sequence[Dict[str, Any]]) -> Tuple[List[str], List[str]]:
+    asset_ids = [str(item.get("id") or item.get("asset_id") or "") for item in holdings]
+    symbols = [str(item.get("symbol") or asset_id) for item, asset_id in zip(holdings, asset_ids)]
+    return asset_ids, symbols
+
+
+def _column(np: Any, holdings: Sequence[Dict[str, Any]], key: str) -> "np.ndarray":
+    return np.fromiter((_as_float(item.get(key)) for item in holdings), dtype=np.float64, count=len(holdings))
+
+
+async def fetch_histories(
+    api: AsyncKursachApi,
+    asset_ids: Sequence[str],
+    *,
+    days: int,
+    concurrency: int = 8,
+) -> Dict[str, PriceHistory | None]:
+    """Fetch history for every asset at once, at most ``concurrency`` requests in flight."""
+    limit = asyncio.Semaphore(max(1, concurrency))
+
+    async def fetch(asset_id: str) -> PriceHistory | None:
+        async with limit:
+            try:
+                return await api.get_price_history(asset_id, days=days)
+            except ApiError as exc:
+                LOG.warning("No price history for %s: %s", asset_id, exc)
+                return None
+
+    unique = list(dict.fromkeys(asset_ids))
+    results = await asyncio.gather(*(fetch(asset_id) for asset_id in unique))
+    return dict(zip(unique, results))
+
+
+def print_analytics(analytics: PortfolioAnalytics, *, top: int = 10) -> None:
+    np = require_numpy()
+    print("\n=== Portfolio analytics ===")
+    print(f"{'Asset':<10} {'Weight':>8} {'Value':>16} {'PnL':>14} {'PnL %':>8} {'Vol (ann.)':>11}")
+    order = np.argsort(-analytics.values)
+    for index in order[: top if top > 0 else None]:
+        volatility = analytics.volatility[index]
+        print(
+            f"{analytics.symbols[index]:<10} {analytics.weights[index] * 100:>7.2f}% "
+            f"{'$' + format_money(analytics.values[index]):>16} {'$' + format_money(analytics.pnl[index]):>14} "
+            f"{analytics.pnl_pct[index]:>7.2f}% {('-' if np.isnan(volatility) else f'{volatility * 100:.1f}%'):>11}"
+        )
+    hidden = len(order) - top if top > 0 else 0
+    if hidden > 0:
+        print(f"... and {hidden} more position(s)")
+    print(
+        f"Total value: ${format_money(analytics.total_value)} | "
+        f"Unrealized PnL: ${format_money(analytics.total_pnl)}"
+    )
+    if analytics.observations < 2:
+        print("Not enough price history for volatility, correlation or VaR.")
+    else:
+        period = _period_label(analytics.step_seconds)
+        print(
+            f"Portfolio volatility (ann.): {analytics.portfolio_volatility * 100:.1f}% "
+            f"over {analytics.observations} {period} returns"
+        )
+        for level in sorted(analytics.var):
+            print(
+                f"{period.capitalize()} VaR {level * 100:g}%: ${format_money(analytics.var[level])} | "
+                f"CVaR: ${format_money(analytics.cvar[level])}"
+            )
+        pairs = analytics.top_correlations(5)
+        if pairs:
+            print("Strongest correlations: " + ", ".join(f"{a}/{b} {rho:+.2f}" for a, b, rho in pairs))
+    print(f"Computed {len(analytics.asset_ids)} position(s) in {analytics.seconds * 1000:.1f} ms")
+    print("===========================\n")
+
+
+def _period_label(step: int) -> str:
+    return {300: "5-minute", 3600: "hourly", 86400: "daily"}.get(step, f"{step}s")
+
+
+def _as_price(value: Any) -> float:
+    price = _as_float(value)
+    return price if price > 0 else math.nan
+
+
+def _as_float(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+__all__ = [
+    "AnalyticsUnavailable",
+    "DEFAULT_CONFIDENCE_LEVELS",
+    "PortfolioAnalytics",
+    "ValueCurve",
+    "align_histories",
+    "compute_analytics",
+    "fetch_histories",
+    "history_arrays",
+    "portfolio_value_curve",
+    "print_analytics",
+    "print_value_curve",
+    "require_numpy",
+    "write_value_curve_csv",
+]
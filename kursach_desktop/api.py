@@ -1,19 +1,157 @@
 from __future__ import annotations
 
+import asyncio
+import importlib.util
 import logging
-from typing import Any, Dict, Optional
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, ContextManager, Dict, Iterator, Optional, Tuple
 
 import httpx
 
+from .cache import CacheEntry, ResponseCache
+from .config import AppConfig
+from .history import HistoryStore, PriceHistory
+from .metrics import MetricsRegistry, route_template
+from .profiling import async_span, span
+from .ratelimit import RateLimiter, parse_retry_after
+from .resilience import IDEMPOTENCY_HEADER, CircuitBreaker, RetryPolicy, RetryRule
+from .singleflight import AsyncSingleFlight, SingleFlight
 
 LOG = logging.getLogger(__name__)
 
 
 class ApiError(RuntimeError):
-    def __init__(self, status_code: int, message: str, payload: Any | None = None) -> None:
+    def __init__(
+        self,
+        status_code: int,
+        message: str,
+        payload: Any | None = None,
+        *,
+        retry_after: float | None = None,
+    ) -> None:
         super().__init__(f"HTTP {status_code}: {message}")
         self.status_code = status_code
         self.payload = payload
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(ApiError):
+    """Raised without contacting the backend while the circuit breaker is open."""
+
+    def __init__(self, retry_in: float) -> None:
+        super().__init__(-1, f"Backend marked unavailable; next attempt allowed in {retry_in:.1f}s")
+        self.retry_in = retry_in
+
+
+@dataclass(frozen=True)
+class HttpSettings:
+    """Transport tuning shared by the sync and async clients (see ``AppConfig.http_*``)."""
+
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 5.0
+    http2: bool = False
+    # Empty keeps httpx's own header (gzip, deflate, plus br/zstd when their decoders are installed).
+    accept_encoding: str = ""
+    connect_timeout: float = 5.0
+    read_timeout: float = 20.0
+    pool_timeout: float = 20.0
+
+    @classmethod
+    def from_config(cls, config: AppConfig) -> "HttpSettings":
+        return cls(
+            max_connections=config.http_max_connections,
+            max_keepalive_connections=config.http_max_keepalive_connections,
+            keepalive_expiry=config.http_keepalive_expiry_seconds,
+            http2=config.http2,
+            accept_encoding=config.http_accept_encoding,
+            connect_timeout=config.http_connect_timeout_seconds,
+            read_timeout=config.http_read_timeout_seconds,
+            pool_timeout=config.http_pool_timeout_seconds,
+        )
+
+    def timeout(self) -> httpx.Timeout:
+        return httpx.Timeout(
+            connect=self.connect_timeout, read=self.read_timeout, write=self.read_timeout, pool=self.pool_timeout
+        )
+
+    def limits(self, max_connections: int | None = None) -> httpx.Limits:
+        if max_connections is not None:
+            # An explicitly sized pool (one per device fleet) keeps every connection alive.
+            return httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=self.keepalive_expiry,
+            )
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+    def headers(self) -> Dict[str, str]:
+        headers = {"accept": "application/json"}
+        if self.accept_encoding:
+            headers["accept-encoding"] = self.accept_encoding
+        return headers
+
+
+def create_client(
+    base_url: str,
+    *,
+    verify_ssl: bool = False,
+    timeout: float = 20.0,
+    max_connections: int | None = None,
+    settings: HttpSettings | None = None,
+) -> httpx.Client:
+    settings = settings or _uniform_timeout(timeout)
+    return httpx.Client(
+        base_url=base_url.rstrip("/"),
+        timeout=settings.timeout(),
+        headers=settings.headers(),
+        verify=verify_ssl,
+        limits=settings.limits(max_connections),
+        http2=_http2_available(settings),
+    )
+
+
+def create_async_client(
+    base_url: str,
+    *,
+    verify_ssl: bool = False,
+    timeout: float = 20.0,
+    max_connections: int | None = None,
+    settings: HttpSettings | None = None,
+) -> httpx.AsyncClient:
+    settings = settings or _uniform_timeout(timeout)
+    return httpx.AsyncClient(
+        base_url=base_url.rstrip("/"),
+        timeout=settings.timeout(),
+        headers=settings.headers(),
+        verify=verify_ssl,
+        limits=settings.limits(max_connections),
+        http2=_http2_available(settings),
+    )
+
+
+def _uniform_timeout(timeout: float) -> HttpSettings:
+    return HttpSettings(connect_timeout=timeout, read_timeout=timeout, pool_timeout=timeout)
+
+
+def _http2_available(settings: HttpSettings) -> bool:
+    if not settings.http2:
+        return False
+    if importlib.util.find_spec("h2") is None:
+        LOG.warning(
+            "http2 is enabled but the h2 package is missing (pip install -r requirements.txt, "
+            "which pulls in httpx[http2]); using HTTP/1.1"
+        )
+        return False
+    return True
 
 
 class KursachApi:
@@ -23,44 +161,127 @@ class KursachApi:
         token: str | None = None,
         verify_ssl: bool = False,
         timeout: float = 20.0,
+        client: httpx.Client | None = None,
+        cache: ResponseCache | None = None,
+        history_store: HistoryStore | None = None,
+        metrics: MetricsRegistry | None = None,
+        settings: HttpSettings | None = None,
+        retry_policy: RetryPolicy | None = None,
+        breaker: CircuitBreaker | None = None,
+        coalescer: SingleFlight | None = None,
+        rate_limiter: RateLimiter | None = None,
     ) -> None:
         self.base_url = base_url.rstrip("/")
         self._token = token
-        self._client = httpx.Client(
-            base_url=self.base_url,
-            timeout=timeout,
-            headers={"accept": "application/json"},
-            verify=verify_ssl,
+        self.cache = cache
+        self.history_store = history_store
+        self.metrics = metrics
+        self.retry_policy = retry_policy
+        self.breaker = breaker
+        # Pass one coalescer to every client of a backend to merge identical GETs across them too.
+        self.coalescer = coalescer or SingleFlight()
+        self.rate_limiter = rate_limiter
+        # A caller-supplied client is shared between several tokens and is not closed here.
+        self._owns_client = client is None
+        self._client = client or create_client(
+            self.base_url, verify_ssl=verify_ssl, timeout=timeout, settings=settings
         )
 
     def close(self) -> None:
-        self._client.close()
+        if self._owns_client:
+            self._client.close()
 
     def set_token(self, token: str | None) -> None:
         self._token = token
 
+    def invalidate_cache(self) -> None:
+        if self.cache is not None:
+            self.cache.invalidate()
+
     def _request(self, method: str, url: str, **kwargs: Any) -> Any:
-        headers = kwargs.pop("headers", {})
-        request_headers = {"accept": "application/json"}
-        if self._token:
-            request_headers["Authorization"] = f"Bearer {self._token}"
-        request_headers.update(headers)
+        if method.upper() != "GET":
+            return self._fetch(method, url, kwargs)
+        key = _flight_key(method, url, kwargs, self._token)
+        value, shared = self.coalescer.do(key, lambda: self._fetch(method, url, kwargs))
+        if shared and self.metrics is not None:
+            self.metrics.observe_coalesced(method, url)
+        return value
+
+    def _fetch(self, method: str, url: str, kwargs: Dict[str, Any]) -> Any:
+        headers = _request_headers(self._token, kwargs.pop("headers", {}))
+        cache_key, entry, fresh = _cache_lookup(self.cache, method, url, kwargs.get("params"), self._token)
+        if fresh:
+            return self.cache.hit_value(entry)  # type: ignore[union-attr, arg-type]
+        if entry is not None:
+            headers.update(entry.validators())
+        rule = _retry_rule(self.retry_policy, method, url)
+        attempt = 1
+        while True:
+            try:
+                response = self._send(method, url, headers, kwargs)
+                return _cached_response(self.cache, response, url, cache_key, entry)
+            except ApiError as exc:
+                delay = _retry_delay(self.retry_policy, rule, attempt, exc, self.metrics, method, url)
+                if delay is None:
+                    raise
+            time.sleep(delay)
+            attempt += 1
+
+    def _send(self, method: str, url: str, headers: Dict[str, str], kwargs: Dict[str, Any]) -> httpx.Response:
+        _check_breaker(self.breaker, self.metrics, method, url)
+        delay = _rate_limit_delay(self.rate_limiter, self.metrics, method, url)
+        if delay:
+            time.sleep(delay)
+        probe = _ConnectionProbe() if self.metrics is not None else None
+        started = time.perf_counter()
         try:
-            response = self._client.request(method, url, headers=request_headers, **kwargs)
+            with span("KursachApi._request", "http", method=method, url=url):
+                response = self._client.request(
+                    method, url, headers=headers, extensions=_trace_extension(probe), **kwargs
+                )
         except httpx.HTTPError as exc:
+            _record_error(self.metrics, self.breaker, method, url, exc)
             raise ApiError(-1, f"Network error: {exc}") from exc
+        _record_response(self.metrics, self.breaker, self.rate_limiter, method, url, response, started, probe)
+        return response
 
-        if response.is_error:
-            message = _extract_error_message(response)
-            raise ApiError(response.status_code, message, payload=_safe_json(response))
-
-        if response.status_code == 204:
-            return None
-
-        return _safe_json(response)
+    @contextmanager
+    def _stream(self, method: str, url: str, **kwargs: Any) -> Iterator[httpx.Response]:
+        """Open a streamed response; the body is left unread for the caller to iterate."""
+        headers = _request_headers(self._token, kwargs.pop("headers", {}))
+        _check_breaker(self.breaker, self.metrics, method, url)
+        delay = _rate_limit_delay(self.rate_limiter, self.metrics, method, url)
+        if delay:
+            time.sleep(delay)
+        probe = _ConnectionProbe() if self.metrics is not None else None
+        started = time.perf_counter()
+        try:
+            with self._client.stream(
+                method, url, headers=headers, extensions=_trace_extension(probe), **kwargs
+            ) as response:
+                broken = False
+                try:
+                    if response.is_error:
+                        response.read()
+                        _handle_response(response)
+                    yield response
+                except httpx.HTTPError:
+                    # The body broke off; recorded once, as a network error, below.
+                    broken = True
+                    raise
+                finally:
+                    if not broken:
+                        # Timed to the end of the body, however far the caller read it.
+                        _record_response(
+                            self.metrics, self.breaker, self.rate_limiter, method, url, response, started, probe
+                        )
+        except httpx.HTTPError as exc:
+            _record_error(self.metrics, self.breaker, method, url, exc)
+            raise ApiError(-1, f"Network error: {exc}") from exc
 
     # Auth
     def login(self, *, email: str, password: str) -> Dict[str, Any]:
+        self.invalidate_cache()
         data = self._request("POST", "/auth/login", json={"email": email, "password": password})
         token = data.get("access_token") if isinstance(data, dict) else None
         if not token:
@@ -69,7 +290,10 @@ class KursachApi:
         return data
 
     def logout(self) -> None:
-        self._request("POST", "/auth/logout")
+        try:
+            self._request("POST", "/auth/logout")
+        finally:
+            self.invalidate_cache()
         self.set_token(None)
 
     def get_dashboard(self) -> Dict[str, Any]:
@@ -86,11 +310,7 @@ class KursachApi:
         amount_usd: float | None,
         price_source: str,
     ) -> Dict[str, Any]:
-        body: Dict[str, Any] = {"asset_id": asset_id, "source": price_source}
-        if quantity is not None:
-            body["quantity"] = quantity
-        if amount_usd is not None:
-            body["amount_usd"] = amount_usd
+        body = _sell_body(asset_id, quantity, amount_usd, price_source)
         return self._request("POST", "/crypto/sell/preview", json=body)
 
     def execute_sell(
@@ -100,13 +320,16 @@ class KursachApi:
         quantity: float | None,
         amount_usd: float | None,
         price_source: str,
+        idempotency_key: str | None = None,
     ) -> Dict[str, Any]:
-        body: Dict[str, Any] = {"asset_id": asset_id, "source": price_source}
-        if quantity is not None:
-            body["quantity"] = quantity
-        if amount_usd is not None:
-            body["amount_usd"] = amount_usd
-        return self._request("POST", "/crypto/sell", json=body)
+        """Sell; retried only when the retry policy has a ``POST /crypto/sell`` rule (see backend_idempotency)."""
+        body = _sell_body(asset_id, quantity, amount_usd, price_source)
+        headers = {IDEMPOTENCY_HEADER: idempotency_key or uuid.uuid4().hex}
+        try:
+            return self._request("POST", "/crypto/sell", json=body, headers=headers)
+        finally:
+            # Even a failed sell may have gone through server-side.
+            self.invalidate_cache()
 
     def poll_commands(
         self,
@@ -115,9 +338,7 @@ class KursachApi:
         target_device_id: str | None,
         limit: int = 10,
     ) -> Dict[str, Any]:
-        params = {"target_device": target_device, "limit": limit}
-        if target_device_id:
-            params["target_device_id"] = target_device_id
+        params = _poll_params(target_device, target_device_id, limit)
         return self._request("GET", "/crypto/device-commands/poll", params=params)
 
     def acknowledge_command(self, command_id: int, status: str) -> Dict[str, Any]:
@@ -125,15 +346,459 @@ class KursachApi:
             "POST",
             f"/crypto/device-commands/{command_id}/ack",
             json={"status": status},
+            headers={IDEMPOTENCY_HEADER: _ack_idempotency_key(command_id, status)},
         )
 
-    def get_transactions(self) -> Any:
-        return self._request("GET", "/crypto/transactions")
+    def get_history(self, asset_id: str, *, days: int = 1) -> Any:
+        return self._request("GET", f"/crypto/history/{asset_id}", params={"days": days})
+
+    def get_price_history(self, asset_id: str, *, days: int = 1) -> PriceHistory:
+        """History as a columnar view; with a store, only the missing tail is downloaded."""
+        store = self.history_store
+        if store is None:
+            return PriceHistory.from_points(asset_id, self.get_history(asset_id, days=days))
+        fetch_days = store.missing_days(asset_id, days)
+        if fetch_days:
+            points = self.get_history(asset_id, days=fetch_days)
+            store.merge(asset_id, days, points, fetched_days=fetch_days)
+        return store.read(asset_id, days)
+
+    def get_transactions(
+        self,
+        *,
+        after_id: int | None = None,
+        cursor: str | None = None,
+        url: str = "/crypto/transactions",
+    ) -> Any:
+        return self._request("GET", url, params=_transactions_params(after_id, cursor))
+
+    def stream_transactions(
+        self,
+        *,
+        url: str = "/crypto/transactions",
+        params: Dict[str, Any] | None = None,
+    ) -> ContextManager[httpx.Response]:
+        return self._stream("GET", url, params=params)
+
+
+class AsyncKursachApi:
+    """Same REST surface as :class:`KursachApi` on top of ``httpx.AsyncClient``."""
+
+    def __init__(
+        self,
+        base_url: str,
+        token: str | None = None,
+        verify_ssl: bool = False,
+        timeout: float = 20.0,
+        client: httpx.AsyncClient | None = None,
+        cache: ResponseCache | None = None,
+        history_store: HistoryStore | None = None,
+        metrics: MetricsRegistry | None = None,
+        settings: HttpSettings | None = None,
+        retry_policy: RetryPolicy | None = None,
+        breaker: CircuitBreaker | None = None,
+        coalescer: AsyncSingleFlight | None = None,
+        rate_limiter: RateLimiter | None = None,
+    ) -> None:
+        self.base_url = base_url.rstrip("/")
+        self._token = token
+        self.cache = cache
+        self.history_store = history_store
+        self.metrics = metrics
+        self.retry_policy = retry_policy
+        self.breaker = breaker
+        self.coalescer = coalescer or AsyncSingleFlight()
+        self.rate_limiter = rate_limiter
+        self._owns_client = client is None
+        self._client = client or create_async_client(
+            self.base_url, verify_ssl=verify_ssl, timeout=timeout, settings=settings
+        )
+
+    async def __aenter__(self) -> "AsyncKursachApi":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        if self._owns_client:
+            await self._client.aclose()
+
+    def set_token(self, token: str | None) -> None:
+        self._token = token
+
+    def invalidate_cache(self) -> None:
+        if self.cache is not None:
+            self.cache.invalidate()
+
+    async def _request(self, method: str, url: str, **kwargs: Any) -> Any:
+        if method.upper() != "GET":
+            return await self._fetch(method, url, kwargs)
+        key = _flight_key(method, url, kwargs, self._token)
+        value, shared = await self.coalescer.do(key, lambda: self._fetch(method, url, kwargs))
+        if shared and self.metrics is not None:
+            self.metrics.observe_coalesced(method, url)
+        return value
+
+    async def _fetch(self, method: str, url: str, kwargs: Dict[str, Any]) -> Any:
+        headers = _request_headers(self._token, kwargs.pop("headers", {}))
+        cache_key, entry, fresh = _cache_lookup(self.cache, method, url, kwargs.get("params"), self._token)
+        if fresh:
+            return self.cache.hit_value(entry)  # type: ignore[union-attr, arg-type]
+        if entry is not None:
+            headers.update(entry.validators())
+        rule = _retry_rule(self.retry_policy, method, url)
+        attempt = 1
+        while True:
+            try:
+                response = await self._send(method, url, headers, kwargs)
+                return _cached_response(self.cache, response, url, cache_key, entry)
+            except ApiError as exc:
+                delay = _retry_delay(self.retry_policy, rule, attempt, exc, self.metrics, method, url)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _send(
+        self, method: str, url: str, headers: Dict[str, str], kwargs: Dict[str, Any]
+    ) -> httpx.Response:
+        _check_breaker(self.breaker, self.metrics, method, url)
+        delay = _rate_limit_delay(self.rate_limiter, self.metrics, method, url)
+        if delay:
+            await asyncio.sleep(delay)
+        probe = _ConnectionProbe() if self.metrics is not None else None
+        started = time.perf_counter()
+        try:
+            with async_span("AsyncKursachApi._request", "http", method=method, url=url):
+                response = await self._client.request(
+                    method, url, headers=headers, extensions=_trace_extension(probe, is_async=True), **kwargs
+                )
+        except httpx.HTTPError as exc:
+            _record_error(self.metrics, self.breaker, method, url, exc)
+            raise ApiError(-1, f"Network error: {exc}") from exc
+        _record_response(self.metrics, self.breaker, self.rate_limiter, method, url, response, started, probe)
+        return response
+
+    # Auth
+    async def login(self, *, email: str, password: str) -> Dict[str, Any]:
+        self.invalidate_cache()
+        data = await self._request("POST", "/auth/login", json={"email": email, "password": password})
+        token = data.get("access_token") if isinstance(data, dict) else None
+        if not token:
+            raise ApiError(500, "Login succeeded but token missing", payload=data)
+        self.set_token(token)
+        return data
+
+    async def logout(self) -> None:
+        try:
+            await self._request("POST", "/auth/logout")
+        finally:
+            self.invalidate_cache()
+        self.set_token(None)
+
+    async def get_dashboard(self) -> Dict[str, Any]:
+        return await self._request("GET", "/crypto/dashboard")
+
+    async def get_sell_overview(self) -> Dict[str, Any]:
+        return await self._request("GET", "/crypto/sell/overview")
+
+    async def preview_sell(
+        self,
+        *,
+        asset_id: str,
+        quantity: float | None,
+        amount_usd: float | None,
+        price_source: str,
+    ) -> Dict[str, Any]:
+        body = _sell_body(asset_id, quantity, amount_usd, price_source)
+        return await self._request("POST", "/crypto/sell/preview", json=body)
+
+    async def execute_sell(
+        self,
+        *,
+        asset_id: str,
+        quantity: float | None,
+        amount_usd: float | None,
+        price_source: str,
+        idempotency_key: str | None = None,
+    ) -> Dict[str, Any]:
+        """Sell; retried only when the retry policy has a ``POST /crypto/sell`` rule (see backend_idempotency)."""
+        body = _sell_body(asset_id, quantity, amount_usd, price_source)
+        headers = {IDEMPOTENCY_HEADER: idempotency_key or uuid.uuid4().hex}
+        try:
+            return await self._request("POST", "/crypto/sell", json=body, headers=headers)
+        finally:
+            self.invalidate_cache()
+
+    async def poll_commands(
+        self,
+        *,
+        target_device: str,
+        target_device_id: str | None,
+        limit: int = 10,
+    ) -> Dict[str, Any]:
+        params = _poll_params(target_device, target_device_id, limit)
+        return await self._request("GET", "/crypto/device-commands/poll", params=params)
+
+    async def acknowledge_command(self, command_id: int, status: str) -> Dict[str, Any]:
+        return await self._request(
+            "POST",
+            f"/crypto/device-commands/{command_id}/ack",
+            json={"status": status},
+            headers={IDEMPOTENCY_HEADER: _ack_idempotency_key(command_id, status)},
+        )
+
+    async def get_history(self, asset_id: str, *, days: int = 1) -> Any:
+        return await self._request("GET", f"/crypto/history/{asset_id}", params={"days": days})
+
+    async def get_price_history(self, asset_id: str, *, days: int = 1) -> PriceHistory:
+        store = self.history_store
+        if store is None:
+            return PriceHistory.from_points(asset_id, await self.get_history(asset_id, days=days))
+        fetch_days = store.missing_days(asset_id, days)
+        if fetch_days:
+            points = await self.get_history(asset_id, days=fetch_days)
+            store.merge(asset_id, days, points, fetched_days=fetch_days)
+        return store.read(asset_id, days)
+
+    async def get_transactions(
+        self,
+        *,
+        after_id: int | None = None,
+        cursor: str | None = None,
+        url: str = "/crypto/transactions",
+    ) -> Any:
+        return await self._request("GET", url, params=_transactions_params(after_id, cursor))
+
+
+async def fetch_dashboard_bundle(api: AsyncKursachApi) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Fetch the dashboard and the sell overview concurrently."""
+    dashboard, sell_overview = await asyncio.gather(api.get_dashboard(), api.get_sell_overview())
+    return dashboard, sell_overview
+
+
+def get_dashboard_bundle(api: KursachApi) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Blocking counterpart of :func:`fetch_dashboard_bundle`: the overview is fetched on a helper thread."""
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="dashboard") as pool:
+        sell_overview = pool.submit(api.get_sell_overview)
+        dashboard = api.get_dashboard()
+        return dashboard, sell_overview.result()
+
+
+def _flight_key(method: str, url: str, kwargs: Dict[str, Any], token: str | None) -> Tuple[Any, ...]:
+    extra = tuple(sorted((str(k).lower(), str(v)) for k, v in (kwargs.get("headers") or {}).items()))
+    return (method.upper(), ResponseCache.make_key(url, kwargs.get("params"), token), extra)
+
+
+def _cache_lookup(
+    cache: ResponseCache | None,
+    method: str,
+    url: str,
+    params: Any,
+    token: str | None,
+) -> Tuple[Any, Optional[CacheEntry], bool]:
+    if cache is None or not cache.is_cacheable(method, url):
+        return None, None, False
+    key = cache.make_key(url, params, token)
+    entry, fresh = cache.lookup(key)
+    return key, entry, fresh
+
+
+def _cached_response(
+    cache: ResponseCache | None,
+    response: httpx.Response,
+    url: str,
+    cache_key: Any,
+    entry: Optional[CacheEntry],
+) -> Any:
+    if cache is None or cache_key is None:
+        return _handle_response(response)
+    if response.status_code == 304 and entry is not None:
+        return cache.revalidated(cache_key, url, entry, response.headers)
+    value = _handle_response(response)
+    cache.store(cache_key, url, value, response.headers)
+    return value
+
+
+class _ConnectionProbe:
+    """httpcore ``trace`` callback that notes whether a request had to open a connection."""
+
+    __slots__ = ("opened",)
+
+    def __init__(self) -> None:
+        self.opened = False
+
+    def __call__(self, event: str, info: Dict[str, Any]) -> None:
+        # connection.connect_tcp.* / connection.connect_unix_socket.* only fire for new connections.
+        if event.startswith("connection.connect_"):
+            self.opened = True
+
+    async def on_async_event(self, event: str, info: Dict[str, Any]) -> None:
+        self(event, info)
+
+
+def _trace_extension(probe: _ConnectionProbe | None, *, is_async: bool = False) -> Dict[str, Any] | None:
+    if probe is None:
+        return None
+    return {"trace": probe.on_async_event if is_async else probe}
+
+
+def _record_response(
+    metrics: MetricsRegistry | None,
+    breaker: CircuitBreaker | None,
+    rate_limiter: RateLimiter | None,
+    method: str,
+    url: str,
+    response: httpx.Response,
+    started: float,
+    probe: _ConnectionProbe | None = None,
+) -> None:
+    if breaker is not None:
+        breaker.record(response.status_code)
+    if rate_limiter is not None:
+        rate_limiter.observe(response.status_code, response.headers)
+    if metrics is None:
+        return
+    metrics.observe_request(
+        method,
+        url,
+        response.status_code,
+        time.perf_counter() - started,
+        sent=int(response.request.headers.get("content-length") or 0),
+        received=response.num_bytes_downloaded,
+    )
+    if probe is not None:
+        metrics.observe_connection(response.http_version, reused=not probe.opened)
+    try:
+        decoded = len(response.content)
+    except httpx.ResponseNotRead:
+        # Streamed bodies are decoded by the caller's iterator; only the wire size is known.
+        return
+    metrics.observe_body(response.headers.get("content-encoding") or "identity", response.num_bytes_downloaded, decoded)
+
+
+def _record_error(
+    metrics: MetricsRegistry | None,
+    breaker: CircuitBreaker | None,
+    method: str,
+    url: str,
+    exc: Exception,
+) -> None:
+    if breaker is not None:
+        breaker.record_failure()
+    if metrics is not None:
+        metrics.observe_network_error(method, url, exc)
+
+
+def _check_breaker(breaker: CircuitBreaker | None, metrics: MetricsRegistry | None, method: str, url: str) -> None:
+    if breaker is None or breaker.allow_request():
+        return
+    if metrics is not None:
+        metrics.observe_circuit_rejection(method, url)
+    raise CircuitOpenError(breaker.retry_in())
+
+
+def _rate_limit_delay(
+    rate_limiter: RateLimiter | None, metrics: MetricsRegistry | None, method: str, url: str
+) -> float:
+    if rate_limiter is None:
+        return 0.0
+    delay = rate_limiter.reserve(url)
+    if metrics is not None:
+        metrics.observe_rate_limit_wait(method, url, delay)
+    return delay
+
+
+def _retry_rule(policy: RetryPolicy | None, method: str, url: str) -> RetryRule | None:
+    if policy is None:
+        return None
+    return policy.rule_for(method, route_template(url))
+
+
+def _retry_delay(
+    policy: RetryPolicy | None,
+    rule: RetryRule | None,
+    attempt: int,
+    exc: ApiError,
+    metrics: MetricsRegistry | None,
+    method: str,
+    url: str,
+) -> float | None:
+    if policy is None or rule is None or isinstance(exc, CircuitOpenError):
+        return None
+    delay = policy.delay(rule, attempt, exc.status_code, exc.retry_after)
+    if delay is not None:
+        LOG.warning("%s %s failed (%s); attempt %s in %.2fs", method, url, exc, attempt + 1, delay)
+        if metrics is not None:
+            metrics.observe_retry(method, url, exc.status_code)
+    return delay
+
+
+def _ack_idempotency_key(command_id: int, status: str) -> str:
+    # Stable across outbox retries and restarts, so a replayed ACK is recognised server-side.
+    return f"ack-{command_id}-{status}"
+
+
+def _request_headers(token: str | None, extra: Dict[str, str]) -> Dict[str, str]:
+    request_headers = {"accept": "application/json"}
+    if token:
+        request_headers["Authorization"] = f"Bearer {token}"
+    request_headers.update(extra)
+    return request_headers
+
+
+def _handle_response(response: httpx.Response) -> Any:
+    if response.is_error:
+        message = _extract_error_message(response)
+        raise ApiError(
+            response.status_code,
+            message,
+            payload=_safe_json(response),
+            retry_after=parse_retry_after(response.headers.get("retry-after")),
+        )
+
+    if response.status_code == 204:
+        return None
+
+    return _safe_json(response)
+
+
+def _sell_body(
+    asset_id: str,
+    quantity: float | None,
+    amount_usd: float | None,
+    price_source: str,
+) -> Dict[str, Any]:
+    body: Dict[str, Any] = {"asset_id": asset_id, "source": price_source}
+    if quantity is not None:
+        body["quantity"] = quantity
+    if amount_usd is not None:
+        body["amount_usd"] = amount_usd
+    return body
+
+
+def _transactions_params(after_id: int | None, cursor: str | None) -> Dict[str, Any] | None:
+    # Servers that do not know after_id ignore it; callers still de-duplicate by id.
+    params: Dict[str, Any] = {}
+    if after_id is not None:
+        params["after_id"] = after_id
+    if cursor is not None:
+        params["cursor"] = cursor
+    return params or None
+
+
+def _poll_params(target_device: str, target_device_id: str | None, limit: int) -> Dict[str, Any]:
+    params: Dict[str, Any] = {"target_device": target_device, "limit": limit}
+    if target_device_id:
+        params["target_device_id"] = target_device_id
+    return params
 
 
 def _safe_json(response: httpx.Response) -> Any:
     try:
-        return response.json()
+        with span("json.decode", "http", bytes=len(response.content)):
+            return response.json()
     except ValueError:
         LOG.debug("Response is not JSON: %s", response.text)
         return response.text
@@ -148,4 +813,14 @@ def _extract_error_message(response: httpx.Response) -> str:
     return response.text or "Unexpected API error"
 
 
-__all__ = ["ApiError", "KursachApi"]
+__all__ = [
+    "ApiError",
+    "AsyncKursachApi",
+    "CircuitOpenError",
+    "HttpSettings",
+    "KursachApi",
+    "create_async_client",
+    "create_client",
+    "fetch_dashboard_bundle",
+    "get_dashboard_bundle",
+]
@@ -0,0 +1,243 @@
+from __future__ import annotations
+
+import asyncio
+import csv
+import json
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Sequence, TypeVar
+
+from .api import ApiError, AsyncKursachApi
+from .formatting import format_money, format_quantity
+from .pricing import BEST_SOURCE, BestQuote, best_preview_async, is_valid_source, refresh_if_stale_async
+
+T = TypeVar("T")
+
+
+class OrderFileError(ValueError):
+    """Raised when a batch order file cannot be parsed."""
+
+
+@dataclass
+class SellOrder:
+    asset_id: str
+    quantity: float | None = None
+    amount_usd: float | None = None
+    source: str = "coincap"
+    # Position in the order file (1-based), not a text line: CSV has a header and JSON may span lines.
+    number: int = 0
+
+
+@dataclass
+class OrderOutcome:
+    order: SellOrder
+    preview: Dict[str, Any] | None = None
+    result: Dict[str, Any] | None = None
+    error: str | None = None
+    best: BestQuote | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def load_orders(path: Path, *, default_source: str = "coincap") -> List[SellOrder]:
+    if not path.exists():
+        raise OrderFileError(f"Order file {path} does not exist")
+    text = path.read_text(encoding="utf-8-sig")
+    if path.suffix.lower() == ".json":
+        try:
+            raw = json.loads(text)
+        except json.JSONDecodeError as exc:
+            raise OrderFileError(f"Failed to parse {path}: {exc}") from exc
+        rows = raw.get("orders", []) if isinstance(raw, dict) else raw
+        if not isinstance(rows, list):
+            raise OrderFileError(f"{path} must contain a list of orders")
+    else:
+        rows = list(csv.DictReader(text.splitlines()))
+
+    orders = [_parse_order(row, number, default_source) for number, row in enumerate(rows, start=1)]
+    if not orders:
+        raise OrderFileError(f"{path} does not contain any orders")
+    return orders
+
+
+def _parse_order(row: Any, number: int, default_source: str) -> SellOrder:
+    if not isinstance(row, dict):
+        raise OrderFileError(f"Order #{number} is not an object")
+    asset_id = str(row.get("asset_id") or "").strip()
+    if not asset_id:
+        raise OrderFileError(f"Order #{number} is missing asset_id")
+    quantity = _optional_float(row.get("quantity"), number, "quantity")
+    amount_usd = _optional_float(row.get("amount_usd"), number, "amount_usd")
+    if quantity is None and amount_usd is None:
+        raise OrderFileError(f"Order #{number} ({asset_id}) requires quantity or amount_usd")
+    source = str(row.get("source") or default_source).strip().lower()
+    if not is_valid_source(source):
+        raise OrderFileError(f"Order #{number} ({asset_id}) has unknown price source {source!r}")
+    return SellOrder(asset_id=asset_id, quantity=quantity, amount_usd=amount_usd, source=source, number=number)
+
+
+def _optional_float(value: Any, number: int, name: str) -> float | None:
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError) as exc:
+        raise OrderFileError(f"Order #{number}: {name} must be a number") from exc
+
+
+async def _bounded(limit: asyncio.Semaphore, factory: Callable[[], Awaitable[T]]) -> T:
+    async with limit:
+        return await factory()
+
+
+async def preview_orders(
+    api: AsyncKursachApi,
+    orders: Sequence[SellOrder],
+    *,
+    concurrency: int = 8,
+) -> List[OrderOutcome]:
+    limit = asyncio.Semaphore(max(1, concurrency))
+
+    async def preview(order: SellOrder) -> OrderOutcome:
+        if order.source == BEST_SOURCE:
+            try:
+                best = await _bounded(
+                    limit,
+                    lambda: best_preview_async(
+                        api, asset_id=order.asset_id, quantity=order.quantity, amount_usd=order.amount_usd
+                    ),
+                )
+            except ApiError as exc:
+                return OrderOutcome(order, error=str(exc))
+            return OrderOutcome(order, preview=best.preview, best=best)
+        try:
+            data = await _bounded(
+                limit,
+                lambda: api.preview_sell(
+                    asset_id=order.asset_id,
+                    quantity=order.quantity,
+                    amount_usd=order.amount_usd,
+                    price_source=order.source,
+                ),
+            )
+        except ApiError as exc:
+            return OrderOutcome(order, error=str(exc))
+        return OrderOutcome(order, preview=data)
+
+    return list(await asyncio.gather(*(preview(order) for order in orders)))
+
+
+async def execute_orders(
+    api: AsyncKursachApi,
+    outcomes: Sequence[OrderOutcome],
+    *,
+    concurrency: int = 8,
+    best_max_age: float = 10.0,
+) -> List[OrderOutcome]:
+    """Execute every previewed order; orders for the same asset run in file order."""
+    limit = asyncio.Semaphore(max(1, concurrency))
+    lanes: Dict[str, List[OrderOutcome]] = {}
+    for outcome in outcomes:
+        if outcome.ok:
+            lanes.setdefault(outcome.order.asset_id.lower(), []).append(outcome)
+
+    async def execute(outcome: OrderOutcome) -> Dict[str, Any]:
+        order = outcome.order
+        source = order.source
+        if outcome.best is not None:
+            outcome.best = await refresh_if_stale_async(
+                api,
+                outcome.best,
+                asset_id=order.asset_id,
+                quantity=order.quantity,
+                amount_usd=order.amount_usd,
+                max_age=best_max_age,
+            )
+            source = outcome.best.source
+        return await api.execute_sell(
+            asset_id=order.asset_id,
+            quantity=order.quantity,
+            amount_usd=order.amount_usd,
+            price_source=source,
+        )
+
+    async def run_lane(lane: List[OrderOutcome]) -> None:
+        for outcome in lane:
+            try:
+                # The re-quote is backend traffic too, so it counts against the same limit.
+                outcome.result = await _bounded(limit, lambda: execute(outcome))
+            except ApiError as exc:
+                outcome.error = str(exc)
+
+    await asyncio.gather(*(run_lane(lane) for lane in lanes.values()))
+    return list(outcomes)
+
+
+def print_batch_previews(outcomes: Sequence[OrderOutcome]) -> None:
+    print("\n>>> Batch sell preview")
+    print(f"{'#':>3}  {'Asset':<10} {'Source':<10} {'Quantity':>16} {'Unit price':>14} {'Proceeds':>14}")
+    total = 0.0
+    for outcome in outcomes:
+        order = outcome.order
+        if not outcome.ok or outcome.preview is None:
+            print(f"{order.number:>3}  {order.asset_id:<10} {order.source:<10} FAILED: {outcome.error}")
+            continue
+        preview = outcome.preview
+        total += _as_float(preview.get("proceeds"))
+        source = f"{outcome.best.source}*" if outcome.best else order.source
+        print(
+            f"{order.number:>3}  {str(preview.get('symbol') or order.asset_id):<10} {source:<10} "
+            f"{format_quantity(preview.get('quantity')):>16} {'$' + format_money(preview.get('unit_price')):>14} "
+            f"{'$' + format_money(preview.get('proceeds')):>14}"
+        )
+    approved = sum(1 for outcome in outcomes if outcome.ok)
+    print(f"Orders ready: {approved}/{len(outcomes)} | Estimated proceeds: ${format_money(total)}")
+    if any(outcome.best for outcome in outcomes):
+        print("* best price source, chosen by comparing every source's quote")
+
+
+def print_batch_results(outcomes: Sequence[OrderOutcome]) -> None:
+    print("\n*** Batch sell results ***")
+    received = 0.0
+    realized = 0.0
+    for outcome in outcomes:
+        order = outcome.order
+        if outcome.result is None:
+            print(f"{order.number:>3}  {order.asset_id:<10} FAILED: {outcome.error or 'not executed'}")
+            continue
+        result = outcome.result
+        received += _as_float(result.get("received"))
+        realized += _as_float(result.get("realized_pnl"))
+        print(
+            f"{order.number:>3}  {str(result.get('symbol') or order.asset_id):<10} "
+            f"sold {format_quantity(result.get('quantity'))} @ ${format_money(result.get('price'))} "
+            f"-> ${format_money(result.get('received'))}"
+        )
+    executed = sum(1 for outcome in outcomes if outcome.result is not None)
+    print(f"Executed: {executed}/{len(outcomes)} | Received: ${format_money(received)} | Realized PnL: ${format_money(realized)}")
+    # Executions finish out of order; sells only add cash, so the largest balance is the latest.
+    balances = [_as_float(outcome.result.get("cash_balance")) for outcome in outcomes if outcome.result]
+    if balances:
+        print(f"Cash balance: ${format_money(max(balances))}")
+    print("**************************\n")
+
+
+def _as_float(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+__all__ = [
+    "OrderFileError",
+    "OrderOutcome",
+    "SellOrder",
+    "execute_orders",
+    "load_orders",
+    "preview_orders",
+    "print_batch_previews",
+    "print_batch_results",
+]
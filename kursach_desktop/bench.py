@@ -0,0 +1,340 @@
+"""Poller throughput benchmarks against the in-process fake backend.
+
+Run ``python -m kursach_desktop.bench`` for the default suite. Pass
+``--save results.json`` to record a baseline and ``--baseline results.json``
+on later runs to fail (exit code 1) when a scenario regresses beyond
+``--tolerance``. ``--startup`` times offline CLI invocations in fresh
+interpreters instead and fails when one exceeds ``--startup-budget-ms`` or
+imports a module that offline commands must not load.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import asdict, dataclass, replace
+from pathlib import Path
+from typing import Any, Dict, List, Sequence
+
+import httpx
+
+from .api import KursachApi
+from .commands import DeviceCommandDispatcher
+from .config import AppConfig
+from .fake_backend import FakeBackend, FakeBackendConfig
+from .journal import CommandJournal
+from .outbox import AckOutbox
+from .poller import CommandPoller
+from .state import DesktopStateStore
+
+
+@dataclass
+class Scenario:
+    name: str
+    commands: int = 200
+    latency_seconds: float = 0.01
+    error_rate: float = 0.0
+    command_workers: int = 1
+    use_outbox: bool = False
+    use_journal: bool = False
+
+
+@dataclass
+class BenchResult:
+    name: str
+    commands: int
+    acked: int
+    seconds: float
+    commands_per_sec: float
+    p50_ack_ms: float
+    p99_ack_ms: float
+    requests_per_command: float
+    injected_errors: int
+
+
+@dataclass
+class StartupResult:
+    name: str
+    runs: int
+    median_ms: float
+    best_ms: float
+    forbidden_imports: List[str]
+
+
+# Offline invocations that must start without the HTTP stack.
+STARTUP_COMMANDS: Dict[str, List[str]] = {
+    "status": ["status"],
+    "help": ["--help"],
+}
+STARTUP_FORBIDDEN_IMPORTS = ("httpx", "asyncio", "sqlite3")
+DEFAULT_STARTUP_BUDGET_MS = 400.0
+
+DEFAULT_SCENARIOS: List[Scenario] = [
+    Scenario("serial"),
+    Scenario("pooled", command_workers=4),
+    Scenario("pooled-outbox-journal", command_workers=4, use_outbox=True, use_journal=True),
+    Scenario("lossy-outbox", command_workers=4, use_outbox=True, error_rate=0.05),
+]
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def run_scenario(scenario: Scenario, *, timeout: float = 120.0) -> BenchResult:
+    backend = FakeBackend(
+        FakeBackendConfig(
+            latency_seconds=scenario.latency_seconds,
+            error_rate=scenario.error_rate,
+            backlog=scenario.commands,
+            redelivery_seconds=5.0,
+            seed=42,
+        )
+    )
+    token = backend.issue_token()
+    config = replace(
+        AppConfig(),
+        command_workers=scenario.command_workers,
+        poll_interval_seconds=1,
+        poll_min_interval_seconds=0.05,
+        poll_max_interval_seconds=0.5,
+        auto_confirm_sales=True,
+    )
+    client = httpx.Client(base_url="http://fake", transport=backend.transport())
+    api = KursachApi("http://fake", token=token, client=client)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        state_store = DesktopStateStore(Path(tmp) / "state.json")
+        state_store.set_token(token)
+        journal = CommandJournal(Path(tmp) / "journal.jsonl") if scenario.use_journal else None
+        outbox = (
+            AckOutbox(api, journal=journal, workers=scenario.command_workers, base_delay=0.05)
+            if scenario.use_outbox
+            else None
+        )
+        dispatcher = DeviceCommandDispatcher(api, state_store, config)
+        poller = CommandPoller(api, dispatcher, state_store, config, journal=journal, outbox=outbox)
+
+        started = time.perf_counter()
+        thread = threading.Thread(target=_run_quietly, args=(poller,), daemon=True)
+        thread.start()
+        deadline = started + timeout
+        while backend.pending_commands() and time.perf_counter() < deadline:
+            time.sleep(0.005)
+        elapsed = time.perf_counter() - started
+        poller.stop()
+        thread.join(timeout=30)
+        if journal is not None:
+            journal.close()
+    client.close()
+
+    latencies = backend.ack_latencies()
+    acked = len(latencies)
+    return BenchResult(
+        name=scenario.name,
+        commands=scenario.commands,
+        acked=acked,
+        seconds=round(elapsed, 4),
+        commands_per_sec=round(acked / elapsed, 2) if elapsed else 0.0,
+        p50_ack_ms=round(percentile(latencies, 50) * 1000, 2),
+        p99_ack_ms=round(percentile(latencies, 99) * 1000, 2),
+        requests_per_command=round(backend.total_requests / acked, 3) if acked else 0.0,
+        injected_errors=backend.injected_errors,
+    )
+
+
+class StartupError(RuntimeError):
+    """A measured command exited with a non-zero status, so its timing means nothing."""
+
+
+def measure_startup(name: str, cli_args: Sequence[str], *, runs: int = 10, warmup: int = 2) -> StartupResult:
+    """Time ``python -m kursach_desktop <cli_args>`` end to end in fresh interpreters.
+
+    Raises :class:`StartupError` if any run fails: a crash on import is fast but not a result.
+    """
+    # An unroutable backend makes any accidental network call fail fast instead of hiding in the timing;
+    # a running daemon would answer instead of the code under test, so it is bypassed.
+    env = {**os.environ, "KURSACH_API_BASE_URL": "http://127.0.0.1:9", "KURSACH_DAEMON": "0"}
+    command = [sys.executable, "-m", "kursach_desktop", *cli_args]
+    timings: List[float] = []
+    for index in range(warmup + runs):
+        started = time.perf_counter()
+        completed = subprocess.run(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=False)
+        if index >= warmup:
+            timings.append((time.perf_counter() - started) * 1000)
+        _check_exit(name, completed.returncode, completed.stderr.decode("utf-8", "replace"))
+    traced = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "kursach_desktop", *cli_args],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=False,
+    )
+    _check_exit(name, traced.returncode, traced.stderr)
+    imported = {line.rsplit("|", 1)[-1].strip() for line in traced.stderr.splitlines() if "|" in line}
+    return StartupResult(
+        name=f"startup:{name}",
+        runs=runs,
+        median_ms=round(statistics.median(timings), 1),
+        best_ms=round(min(timings), 1),
+        forbidden_imports=[module for module in STARTUP_FORBIDDEN_IMPORTS if module in imported],
+    )
+
+
+def _check_exit(name: str, returncode: int, stderr: str) -> None:
+    if returncode == 0:
+        return
+    # Skip -X importtime output and the frame click/rich draws around usage errors.
+    lines = [line.strip(" │╭╮╰╯─") for line in stderr.splitlines() if not line.startswith("import time:")]
+    message = next((line for line in reversed(lines) if line), "no output")
+    raise StartupError(f"startup:{name} exited with status {returncode}: {message}")
+
+
+def startup_regressions(
+    results: Sequence[StartupResult],
+    budget_ms: float,
+    baseline: Dict[str, Any] | None = None,
+    tolerance: float = 0.2,
+) -> List[str]:
+    regressions: List[str] = []
+    for result in results:
+        if result.median_ms > budget_ms:
+            regressions.append(f"{result.name}: median {result.median_ms} ms > budget {budget_ms} ms")
+        if result.forbidden_imports:
+            regressions.append(f"{result.name}: imports {', '.join(result.forbidden_imports)}")
+        base = (baseline or {}).get(result.name)
+        if base and result.median_ms > base["median_ms"] * (1 + tolerance):
+            regressions.append(f"{result.name}: median {result.median_ms} ms > baseline {base['median_ms']} ms")
+    return regressions
+
+
+def _run_quietly(poller: CommandPoller) -> None:
+    with contextlib.redirect_stdout(io.StringIO()):
+        poller.run()
+
+
+def compare(results: Sequence[BenchResult], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Return human-readable regressions of ``results`` against a saved baseline."""
+    regressions: List[str] = []
+    for result in results:
+        base = baseline.get(result.name)
+        if not base:
+            continue
+        if result.commands_per_sec < base["commands_per_sec"] * (1 - tolerance):
+            regressions.append(
+                f"{result.name}: throughput {result.commands_per_sec}/s < baseline {base['commands_per_sec']}/s"
+            )
+        if result.p99_ack_ms > base["p99_ack_ms"] * (1 + tolerance):
+            regressions.append(f"{result.name}: p99 {result.p99_ack_ms} ms > baseline {base['p99_ack_ms']} ms")
+        if result.requests_per_command > base["requests_per_command"] * (1 + tolerance):
+            regressions.append(
+                f"{result.name}: {result.requests_per_command} requests/command "
+                f"> baseline {base['requests_per_command']}"
+            )
+        if result.acked < result.commands:
+            regressions.append(f"{result.name}: only {result.acked} of {result.commands} commands acknowledged")
+    return regressions
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark CommandPoller against the fake backend")
+    parser.add_argument("--commands", type=int, default=None, help="Override backlog size for every scenario")
+    parser.add_argument("--latency", type=float, default=None, help="Override per-request latency (seconds)")
+    parser.add_argument("--only", action="append", default=[], help="Run only the named scenario(s)")
+    parser.add_argument("--save", type=Path, help="Write results as a baseline JSON file")
+    parser.add_argument("--baseline", type=Path, help="Compare against a baseline JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression")
+    parser.add_argument("--startup", action="store_true", help="Benchmark CLI startup instead of the poller")
+    parser.add_argument("--startup-runs", type=int, default=10, help="Timed runs per startup command")
+    parser.add_argument(
+        "--startup-budget-ms", type=float, default=DEFAULT_STARTUP_BUDGET_MS, help="Maximum median startup time"
+    )
+    args = parser.parse_args(argv)
+    if args.startup:
+        return _startup_main(args)
+
+    logging.basicConfig(level=logging.CRITICAL)
+    scenarios = [s for s in DEFAULT_SCENARIOS if not args.only or s.name in args.only]
+    results: List[BenchResult] = []
+    for scenario in scenarios:
+        if args.commands is not None:
+            scenario = replace(scenario, commands=args.commands)
+        if args.latency is not None:
+            scenario = replace(scenario, latency_seconds=args.latency)
+        result = run_scenario(scenario)
+        results.append(result)
+        print(
+            f"{result.name:<24} {result.commands_per_sec:>9.1f} cmd/s  "
+            f"p50 {result.p50_ack_ms:>8.1f} ms  p99 {result.p99_ack_ms:>8.1f} ms  "
+            f"{result.requests_per_command:>5.2f} req/cmd  ({result.acked}/{result.commands} acked)"
+        )
+
+    if args.save:
+        args.save.write_text(json.dumps({r.name: asdict(r) for r in results}, indent=2), encoding="utf-8")
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+    return 0
+
+
+def _startup_main(args: argparse.Namespace) -> int:
+    results: List[StartupResult] = []
+    for name, cli_args in STARTUP_COMMANDS.items():
+        if args.only and name not in args.only:
+            continue
+        try:
+            result = measure_startup(name, cli_args, runs=args.startup_runs)
+        except StartupError as exc:
+            print(f"FAILED {exc}")
+            return 1
+        results.append(result)
+        print(
+            f"{result.name:<24} median {result.median_ms:>7.1f} ms  best {result.best_ms:>7.1f} ms  "
+            f"({result.runs} runs){'  imports ' + ', '.join(result.forbidden_imports) if result.forbidden_imports else ''}"
+        )
+
+    if args.save:
+        args.save.write_text(json.dumps({r.name: asdict(r) for r in results}, indent=2), encoding="utf-8")
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8")) if args.baseline else None
+    regressions = startup_regressions(results, args.startup_budget_ms, baseline, args.tolerance)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    return 1 if regressions else 0
+
+
+__all__ = [
+    "BenchResult",
+    "DEFAULT_SCENARIOS",
+    "STARTUP_COMMANDS",
+    "Scenario",
+    "StartupError",
+    "StartupResult",
+    "compare",
+    "measure_startup",
+    "percentile",
+    "run_scenario",
+    "startup_regressions",
+]
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, Mapping, Optional, Tuple
+
+from .config import AppConfig
+
+DEFAULT_CACHE_TTLS: Dict[str, float] = {
+    "/crypto/dashboard": 15.0,
+    "/crypto/sell/overview": 15.0,
+}
+
+
+@dataclass
+class CacheEntry:
+    value: Any
+    expires_at: float
+    etag: str | None = None
+    last_modified: str | None = None
+
+    def validators(self) -> Dict[str, str]:
+        headers: Dict[str, str] = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ResponseCache:
+    """Size-bounded LRU cache for GET responses with per-route TTLs.
+
+    Expired entries that carry an ETag or Last-Modified validator are kept so
+    the next request can be made conditional and answered with a 304.
+    """
+
+    def __init__(
+        self,
+        ttls: Mapping[str, float] | None = None,
+        *,
+        max_entries: int = 128,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.ttls = dict(DEFAULT_CACHE_TTLS if ttls is None else ttls)
+        self.max_entries = max(1, max_entries)
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.evictions = 0
+
+    def is_cacheable(self, method: str, url: str) -> bool:
+        return method.upper() == "GET" and self.ttls.get(url, 0) > 0
+
+    @staticmethod
+    def make_key(url: str, params: Mapping[str, Any] | None, token: str | None) -> Hashable:
+        frozen_params = tuple(sorted((str(k), str(v)) for k, v in (params or {}).items()))
+        return (url, frozen_params, token)
+
+    def lookup(self, key: Hashable) -> Tuple[Optional[CacheEntry], bool]:
+        """Return the entry for ``key`` (if any) and whether it is still fresh."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None, False
+            self._entries.move_to_end(key)
+            if entry.expires_at > self._clock():
+                self.hits += 1
+                return entry, True
+            if not entry.validators():
+                del self._entries[key]
+                self.misses += 1
+                return None, False
+            self.misses += 1
+            return entry, False
+
+    def hit_value(self, entry: CacheEntry) -> Any:
+        # Callers may mutate decoded payloads; never hand out the cached object itself.
+        return copy.deepcopy(entry.value)
+
+    def store(self, key: Hashable, url: str, value: Any, headers: Mapping[str, str]) -> None:
+        if "no-store" in headers.get("cache-control", "").lower():
+            return
+        entry = CacheEntry(
+            value=copy.deepcopy(value),
+            expires_at=self._clock() + self.ttls.get(url, 0),
+            etag=headers.get("etag"),
+            last_modified=headers.get("last-modified"),
+        )
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def revalidated(self, key: Hashable, url: str, entry: CacheEntry, headers: Mapping[str, str]) -> Any:
+        with self._lock:
+            self.revalidations += 1
+            entry.expires_at = self._clock() + self.ttls.get(url, 0)
+            entry.etag = headers.get("etag") or entry.etag
+            entry.last_modified = headers.get("last-modified") or entry.last_modified
+            if key in self._entries:
+                self._entries.move_to_end(key)
+        return self.hit_value(entry)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "revalidations": self.revalidations,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+            }
+
+
+def build_response_cache(config: AppConfig) -> ResponseCache | None:
+    if not config.response_cache_enabled:
+        return None
+    return ResponseCache(config.response_cache_ttls or None, max_entries=config.response_cache_max_entries)
+
+
+__all__ = ["CacheEntry", "DEFAULT_CACHE_TTLS", "ResponseCache", "build_response_cache"]
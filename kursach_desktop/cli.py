@@ -1,36 +1,161 @@
 from __future__ import annotations
 
 import logging
+import sys
+import time
 from dataclasses import dataclass
+from functools import cached_property
 from getpass import getpass
-from typing import Optional
+from pathlib import Path
+from typing import TYPE_CHECKING, Awaitable, List, Optional, TypeVar
 
 import typer
 
-from .api import ApiError, KursachApi
-from .commands import (
-    DeviceCommandDispatcher,
-    format_money,
-    format_quantity,
-    print_dashboard,
-    print_preview,
-    print_sell_result,
-)
-from .config import AppConfig, load_config
-from .poller import CommandPoller
+from .config import DEFAULT_TRANSACTIONS_DB_PATH, AppConfig, load_config
+from .formatting import format_money, format_quantity
 from .state import DesktopStateStore
 
+if TYPE_CHECKING:
+    import asyncio
+
+    import httpx
+
+    from .api import AsyncKursachApi, KursachApi
+    from .cache import ResponseCache
+    from .history import HistoryStore
+    from .metrics import MetricsRegistry
+    from .pricing import BestQuote
+    from .ratelimit import RateLimiter
+    from .resilience import CircuitBreaker, RetryPolicy
+
+
+LOG = logging.getLogger(__name__)
+
+T = TypeVar("T")
 
 app = typer.Typer(add_completion=False, help="Desktop companion for kursach backend")
 sell_app = typer.Typer(help="Sell workflow commands")
 app.add_typer(sell_app, name="sell")
+portfolio_app = typer.Typer(help="Portfolio-wide views")
+app.add_typer(portfolio_app, name="portfolio")
+transactions_app = typer.Typer(help="Local transaction history (SQLite mirror)")
+app.add_typer(transactions_app, name="transactions")
+daemon_app = typer.Typer(help="Warm background process that serves CLI commands over a Unix socket")
+app.add_typer(daemon_app, name="daemon")
 
 
 @dataclass
 class AppContext:
+    """Per-invocation state; the API client and caches are built on first use."""
+
     config: AppConfig
-    api: KursachApi
     state_store: DesktopStateStore
+    metrics: Optional[MetricsRegistry] = None
+
+    @cached_property
+    def cache(self) -> Optional[ResponseCache]:
+        from .cache import build_response_cache
+
+        return build_response_cache(self.config)
+
+    @cached_property
+    def history_store(self) -> Optional[HistoryStore]:
+        from .history import build_history_store
+
+        return build_history_store(self.config)
+
+    @cached_property
+    def retry_policy(self) -> Optional[RetryPolicy]:
+        from .resilience import build_retry_policy
+
+        return build_retry_policy(self.config)
+
+    @cached_property
+    def breaker(self) -> Optional[CircuitBreaker]:
+        from .resilience import build_circuit_breaker
+
+        return build_circuit_breaker(self.config)
+
+    @cached_property
+    def rate_limiter(self) -> Optional[RateLimiter]:
+        from .ratelimit import build_rate_limiter
+
+        return build_rate_limiter(self.config)
+
+    @cached_property
+    def api(self) -> KursachApi:
+        from .api import HttpSettings, KursachApi
+
+        return KursachApi(
+            self.config.normalized_base_url(),
+            token=self.state_store.state.access_token,
+            verify_ssl=self.config.verify_ssl,
+            cache=self.cache,
+            history_store=self.history_store,
+            metrics=self.metrics,
+            settings=HttpSettings.from_config(self.config),
+            retry_policy=self.retry_policy,
+            breaker=self.breaker,
+            rate_limiter=self.rate_limiter,
+        )
+
+    @cached_property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        # One loop for the whole context: the async client's pooled connections belong to it.
+        import asyncio
+
+        return asyncio.new_event_loop()
+
+    @cached_property
+    def async_client(self) -> httpx.AsyncClient:
+        from .api import HttpSettings, create_async_client
+
+        return create_async_client(
+            self.config.normalized_base_url(),
+            verify_ssl=self.config.verify_ssl,
+            settings=HttpSettings.from_config(self.config),
+        )
+
+    @cached_property
+    def async_api(self) -> AsyncKursachApi:
+        return _async_api(self)
+
+    def run(self, coro: Awaitable[T]) -> T:
+        """Run ``coro`` to completion on the context's event loop."""
+        import asyncio
+
+        task = asyncio.ensure_future(coro, loop=self.loop)
+        try:
+            return self.loop.run_until_complete(task)
+        finally:
+            if not task.done():
+                # Interrupted (Ctrl-C): unwind the task so the loop stays usable in the daemon.
+                task.cancel()
+                try:
+                    self.loop.run_until_complete(task)
+                except (asyncio.CancelledError, Exception):
+                    pass  # the original exception is already propagating
+
+    def close(self) -> None:
+        api = self.__dict__.get("api")
+        if api is not None:
+            api.close()
+            if api.coalescer.shared:
+                LOG.info("Coalesced GETs: %s", api.coalescer.stats())
+        async_api = self.__dict__.get("async_api")
+        if async_api is not None and async_api.coalescer.shared:
+            LOG.info("Coalesced async GETs: %s", async_api.coalescer.stats())
+        loop = self.__dict__.get("loop")
+        if loop is not None:
+            async_client = self.__dict__.get("async_client")
+            if async_client is not None:
+                loop.run_until_complete(async_client.aclose())
+            loop.run_until_complete(loop.shutdown_asyncgens())
+            loop.close()
+        self.state_store.close()
+        cache = self.__dict__.get("cache")
+        if cache is not None:
+            LOG.info("Response cache stats: %s", cache.stats())
 
 
 def _get_context(ctx: typer.Context) -> AppContext:
@@ -49,15 +174,64 @@ def main(
         help="Enable debug logs",
         flag_value=True,
     ),
+    metrics_port: Optional[int] = typer.Option(
+        None, help="Serve Prometheus metrics on this local port while the command runs"
+    ),
+    metrics_file: Optional[Path] = typer.Option(None, help="Write Prometheus metrics to this file on exit"),
+    profile: Optional[Path] = typer.Option(
+        None,
+        help="Profile the command into this file: .prof/.pstats (cProfile), .txt (report) or .folded (sampled stacks)",
+    ),
+    trace: Optional[Path] = typer.Option(None, help="Write span timings to this file as Chrome trace events (JSON)"),
 ) -> None:
+    if isinstance(ctx.obj, AppContext):
+        # Running inside the daemon (see daemon.py): its warm context outlives this command.
+        return
+    # Close callbacks run in reverse order: these go first so they see everything else.
+    if profile is not None:
+        from .profiling import ProfileSession
+
+        ctx.call_on_close(ProfileSession(profile).start().stop)
+    if trace is not None:
+        from .profiling import Tracer, install_tracer, span
+
+        tracer = Tracer()
+        install_tracer(tracer)
+        ctx.call_on_close(lambda: tracer.write(trace))
+        ctx.with_resource(span(f"cli {ctx.invoked_subcommand}", "cli"))
     config = load_config()
-    base_url = config.normalized_base_url()
-    state_store = DesktopStateStore()
-    api = KursachApi(base_url, token=state_store.state.access_token, verify_ssl=config.verify_ssl)
-    ctx.obj = AppContext(config=config, api=api, state_store=state_store)
+    if metrics_port is not None:
+        config.metrics_port = metrics_port
+    if metrics_file is not None:
+        config.metrics_file = str(metrics_file)
     log_level = logging.DEBUG if verbose else logging.INFO
     logging.basicConfig(level=log_level, format="%(asctime)s [%(levelname)s] %(message)s")
-    ctx.call_on_close(api.close)
+    metrics = None
+    if config.metrics_port or config.metrics_file:
+        metrics = _start_metrics(ctx, config)
+    context = AppContext(
+        config=config,
+        state_store=DesktopStateStore(flush_interval=config.state_flush_interval_seconds),
+        metrics=metrics,
+    )
+    ctx.obj = context
+    ctx.call_on_close(context.close)
+
+
+def _start_metrics(ctx: typer.Context, config: AppConfig) -> MetricsRegistry:
+    from .metrics import MetricsRegistry, MetricsServer
+
+    metrics = MetricsRegistry()
+    if config.metrics_file:
+        # Registered before the context closes so it runs after every other cleanup has made its requests.
+        ctx.call_on_close(lambda: metrics.write(Path(config.metrics_file)))
+    if config.metrics_port:
+        try:
+            server = MetricsServer(metrics, config.metrics_host, config.metrics_port).start()
+        except OSError as exc:
+            raise typer.BadParameter(f"Cannot serve metrics on port {config.metrics_port}: {exc}") from exc
+        ctx.call_on_close(server.close)
+    return metrics
 
 
 @app.command()
@@ -83,6 +257,8 @@ def login(
     email: Optional[str] = typer.Option(None, "--email", prompt=True),
     password: Optional[str] = typer.Option(None, "--password", prompt=False, hide_input=True),
 ) -> None:
+    from .api import ApiError
+
     context = _get_context(ctx)
     if not password:
         password = getpass("Password: ")
@@ -99,6 +275,8 @@ def login(
 
 @app.command()
 def logout(ctx: typer.Context) -> None:
+    from .api import ApiError
+
     context = _get_context(ctx)
     try:
         context.api.logout()
@@ -110,20 +288,81 @@ def logout(ctx: typer.Context) -> None:
 
 
 @app.command()
-def dashboard(ctx: typer.Context) -> None:
+def dashboard(
+    ctx: typer.Context,
+    watch: bool = typer.Option(False, "--watch", help="Keep the dashboard on screen and refresh it", flag_value=True),
+    interval: float = typer.Option(5.0, help="Seconds between refreshes with --watch"),
+) -> None:
+    from .api import ApiError, fetch_dashboard_bundle
+    from .commands import print_dashboard
+
     context = _get_context(ctx)
+    if interval <= 0:
+        raise typer.BadParameter("--interval must be positive")
     _ensure_authenticated(context)
+    if watch:
+        _watch_dashboard(context, interval)
+        return
     try:
-        dash = context.api.get_dashboard()
-        sell_overview = context.api.get_sell_overview()
+        dash, sell_overview = context.run(fetch_dashboard_bundle(_shared_async_api(context)))
     except ApiError as exc:
         typer.secho(f"Failed to fetch dashboard: {exc}", fg=typer.colors.RED)
         raise typer.Exit(code=1) from exc
     print_dashboard(dash, sell_overview)
 
 
+@app.command()
+def analytics(
+    ctx: typer.Context,
+    days: int = typer.Option(365, help="Days of price history to analyse"),
+    confidence: Optional[List[float]] = typer.Option(
+        None, help="VaR/CVaR confidence level; repeat for several (default 0.95 and 0.99)"
+    ),
+    top: int = typer.Option(10, help="Positions to list, largest first (0 for all)"),
+    concurrency: int = typer.Option(8, help="Maximum parallel history requests"),
+) -> None:
+    from .analytics import DEFAULT_CONFIDENCE_LEVELS, compute_analytics, print_analytics
+    from .history import history_resolution
+
+    context = _get_context(ctx)
+    _require_numpy()
+    levels = tuple(confidence or DEFAULT_CONFIDENCE_LEVELS)
+    if any(not 0 < level < 1 for level in levels):
+        raise typer.BadParameter("Confidence levels must be between 0 and 1, e.g. 0.95")
+    _ensure_authenticated(context)
+    overview, histories = _load_portfolio_histories(context, days, concurrency)
+    print_analytics(
+        compute_analytics(overview, histories, step=history_resolution(days), confidence_levels=levels),
+        top=top,
+    )
+
+
+@portfolio_app.command("history")
+def portfolio_history(
+    ctx: typer.Context,
+    days: int = typer.Option(30, help="Days of history to chart"),
+    points: int = typer.Option(15, help="Rows to print from the value curve"),
+    concurrency: int = typer.Option(8, help="Maximum parallel history requests"),
+    csv_path: Optional[Path] = typer.Option(None, "--csv", help="Also write the full curve to this CSV file"),
+) -> None:
+    from .analytics import portfolio_value_curve, print_value_curve, write_value_curve_csv
+    from .history import history_resolution
+
+    context = _get_context(ctx)
+    _require_numpy()
+    _ensure_authenticated(context)
+    overview, histories = _load_portfolio_histories(context, days, concurrency)
+    curve = portfolio_value_curve(overview, histories, step=history_resolution(days))
+    print_value_curve(curve, points=points)
+    if csv_path is not None:
+        write_value_curve_csv(curve, csv_path)
+        typer.echo(f"Wrote {len(curve.values)} points to {csv_path}")
+
+
 @sell_app.command("overview")
 def sell_overview(ctx: typer.Context) -> None:
+    from .api import ApiError
+
     context = _get_context(ctx)
     _ensure_authenticated(context)
     try:
@@ -150,23 +389,24 @@ def sell_preview(
     asset_id: str = typer.Option(..., help="Asset id to sell"),
     quantity: Optional[float] = typer.Option(None, help="Quantity of the asset to sell"),
     amount_usd: Optional[float] = typer.Option(None, help="Alternatively sell by USD amount"),
-    source: str = typer.Option("coincap", help="Price source: coincap or coingecko"),
+    source: Optional[str] = typer.Option(None, help="Price source: coincap, coingecko or best"),
 ) -> None:
+    from .api import ApiError
+    from .commands import print_preview
+
     context = _get_context(ctx)
     _ensure_authenticated(context)
     if quantity is None and amount_usd is None:
         raise typer.BadParameter("Provide quantity or amount_usd")
+    source = _resolve_source(context, source)
     try:
-        preview = context.api.preview_sell(
-            asset_id=asset_id,
-            quantity=quantity,
-            amount_usd=amount_usd,
-            price_source=source,
-        )
+        preview, best = _preview_sell(context, asset_id, quantity, amount_usd, source)
     except ApiError as exc:
         typer.secho(f"Preview failed: {exc}", fg=typer.colors.RED)
         raise typer.Exit(code=1) from exc
     print_preview(preview)
+    if best is not None:
+        _echo_best_quote(best)
 
 
 @sell_app.command("execute")
@@ -175,32 +415,46 @@ def sell_execute(
     asset_id: str = typer.Option(..., help="Asset id to sell"),
     quantity: Optional[float] = typer.Option(None, help="Quantity of the asset to sell"),
     amount_usd: Optional[float] = typer.Option(None, help="Sell by USD amount"),
-    source: str = typer.Option("coincap", help="Price source"),
+    source: Optional[str] = typer.Option(None, help="Price source: coincap, coingecko or best"),
     skip_preview: bool = typer.Option(False, help="Skip preview step", flag_value=True),
 ) -> None:
+    from .api import ApiError
+    from .commands import print_preview, print_sell_result
+    from .pricing import BEST_SOURCE, refresh_if_stale
+
     context = _get_context(ctx)
     _ensure_authenticated(context)
     if quantity is None and amount_usd is None:
         raise typer.BadParameter("Provide quantity or amount_usd")
+    source = _resolve_source(context, source)
 
-    preview = None
-    if not skip_preview:
+    best: BestQuote | None = None
+    # "best" has to quote every source to pick one, even when the preview is not shown.
+    if not skip_preview or source == BEST_SOURCE:
         try:
-            preview = context.api.preview_sell(
-                asset_id=asset_id,
-                quantity=quantity,
-                amount_usd=amount_usd,
-                price_source=source,
-            )
+            preview, best = _preview_sell(context, asset_id, quantity, amount_usd, source)
         except ApiError as exc:
             typer.secho(f"Preview failed: {exc}", fg=typer.colors.RED)
             raise typer.Exit(code=1) from exc
-        print_preview(preview)
-        if not typer.confirm("Execute this sell?", default=False):
-            typer.echo("Cancelled.")
-            raise typer.Exit(code=0)
+        if not skip_preview:
+            print_preview(preview)
+            if best is not None:
+                _echo_best_quote(best)
+            if not typer.confirm("Execute this sell?", default=False):
+                typer.echo("Cancelled.")
+                raise typer.Exit(code=0)
 
     try:
+        if best is not None:
+            best = refresh_if_stale(
+                context.api,
+                best,
+                asset_id=asset_id,
+                quantity=quantity,
+                amount_usd=amount_usd,
+                max_age=context.config.best_quote_max_age_seconds,
+            )
+            source = best.source
         result = context.api.execute_sell(
             asset_id=asset_id,
             quantity=quantity,
@@ -213,6 +467,53 @@ def sell_execute(
     print_sell_result(result)
 
 
+@sell_app.command("batch")
+def sell_batch(
+    ctx: typer.Context,
+    file: Path = typer.Option(..., "--file", help="CSV or JSON file with asset_id, quantity/amount_usd, source"),
+    source: Optional[str] = typer.Option(None, help="Default price source for orders without one"),
+    concurrency: int = typer.Option(8, help="Maximum parallel preview/sell requests"),
+    yes: bool = typer.Option(False, "--yes", "-y", help="Execute without asking for confirmation", flag_value=True),
+) -> None:
+    from .batch import (
+        OrderFileError,
+        execute_orders,
+        load_orders,
+        preview_orders,
+        print_batch_previews,
+        print_batch_results,
+    )
+
+    context = _get_context(ctx)
+    _ensure_authenticated(context)
+    try:
+        orders = load_orders(file, default_source=_resolve_source(context, source))
+    except OrderFileError as exc:
+        raise typer.BadParameter(str(exc)) from exc
+
+    async def run_batch() -> None:
+        api = _shared_async_api(context)
+        outcomes = await preview_orders(api, orders, concurrency=concurrency)
+        print_batch_previews(outcomes)
+        if not any(outcome.ok for outcome in outcomes):
+            typer.secho("No orders passed preview.", fg=typer.colors.RED)
+            raise typer.Exit(code=1)
+        if not yes and not typer.confirm("Execute all previewed orders?", default=False):
+            typer.echo("Cancelled.")
+            raise typer.Exit(code=0)
+        outcomes = await execute_orders(
+            api,
+            outcomes,
+            concurrency=concurrency,
+            best_max_age=context.config.best_quote_max_age_seconds,
+        )
+        print_batch_results(outcomes)
+        if not all(outcome.result is not None for outcome in outcomes):
+            raise typer.Exit(code=1)
+
+    context.run(run_batch())
+
+
 @app.command()
 def poll(
     ctx: typer.Context,
@@ -233,6 +534,11 @@ def poll(
         flag_value=True,
     ),
 ) -> None:
+    from .commands import DeviceCommandDispatcher
+    from .journal import CommandJournal
+    from .outbox import AckOutbox
+    from .poller import CommandPoller
+
     context = _get_context(ctx)
     if auto_confirm_flag and ask_flag:
         raise typer.BadParameter("Use only one of --auto-confirm or --ask-before-sell")
@@ -247,10 +553,343 @@ def poll(
         context.config,
         auto_confirm=auto_confirm,
     )
-    poller = CommandPoller(context.api, dispatcher, context.state_store, context.config)
+    journal = CommandJournal(rerun_sells=context.config.backend_idempotency)
+    ctx.call_on_close(journal.close)
+    poller = CommandPoller(
+        context.api,
+        dispatcher,
+        context.state_store,
+        context.config,
+        journal=journal,
+        outbox=AckOutbox(
+            context.api,
+            journal=journal,
+            workers=context.config.ack_workers,
+            max_attempts=context.config.ack_max_attempts,
+        ),
+    )
     poller.run(once=once, interval=interval)
 
 
+@app.command("poll-many")
+def poll_many(
+    ctx: typer.Context,
+    profiles: Path = typer.Option(..., help="JSON file with the device profiles to serve"),
+    once: bool = typer.Option(False, help="Run a single poll cycle per device and exit", flag_value=True),
+    interval: Optional[int] = typer.Option(None, help="Override poll interval in seconds"),
+    auto_confirm_flag: bool = typer.Option(
+        False,
+        "--auto-confirm",
+        help="Force auto execution of EXECUTE_DESKTOP_SELL commands.",
+        is_flag=True,
+        flag_value=True,
+    ),
+    metrics_interval: float = typer.Option(60.0, help="Seconds between per-device metrics log lines"),
+) -> None:
+    from .config import load_device_profiles
+    from .poller import MultiDevicePoller
+
+    context = _get_context(ctx)
+    try:
+        device_profiles = load_device_profiles(profiles, context.config)
+    except ValueError as exc:
+        raise typer.BadParameter(str(exc)) from exc
+    poller = MultiDevicePoller(
+        context.config,
+        device_profiles,
+        auto_confirm=True if auto_confirm_flag else None,
+        metrics_interval=metrics_interval,
+        registry=context.metrics,
+    )
+    try:
+        poller.run(once=once, interval=interval)
+    except KeyboardInterrupt:
+        typer.echo("Stopping multi-device poller.")
+    finally:
+        typer.echo("Per-device metrics:")
+        for metrics in poller.metrics.values():
+            typer.echo(
+                f"  {metrics.device_id}: polls {metrics.polls} (errors {metrics.poll_errors}), "
+                f"commands ok {metrics.commands_succeeded} / failed {metrics.commands_failed}, "
+                f"ack errors {metrics.ack_errors}, avg poll {metrics.avg_poll_latency * 1000:.1f} ms"
+            )
+
+
+@transactions_app.command("sync")
+def transactions_sync(
+    ctx: typer.Context,
+    db: Path = typer.Option(DEFAULT_TRANSACTIONS_DB_PATH, help="SQLite database with synced transactions"),
+) -> None:
+    from .api import ApiError
+    from .transactions import TransactionStore
+
+    context = _get_context(ctx)
+    _ensure_authenticated(context)
+    with TransactionStore(db) as store:
+        try:
+            report = store.sync(context.api)
+        except ApiError as exc:
+            typer.secho(f"Failed to sync transactions: {exc}", fg=typer.colors.RED)
+            raise typer.Exit(code=1) from exc
+        total = store.count()
+    typer.echo(
+        f"Synced {report.inserted} new transaction(s) ({report.fetched} received in {report.pages} page(s), "
+        f"{total} stored, last id {report.last_id}) in {report.seconds * 1000:.0f} ms"
+    )
+
+
+@transactions_app.command("export")
+def transactions_export(
+    ctx: typer.Context,
+    output: Path = typer.Option(..., "--output", "-o", help="Destination .csv or .ndjson file"),
+    fmt: Optional[str] = typer.Option(None, "--format", help="csv or ndjson (default: by extension)"),
+    page_size: int = typer.Option(500, help="Rows per page requested from the backend (0 disables paging)"),
+    restart: bool = typer.Option(False, "--restart", help="Ignore an existing checkpoint", flag_value=True),
+) -> None:
+    from .api import ApiError
+    from .export import EXPORT_FORMATS, export_transactions
+
+    context = _get_context(ctx)
+    if fmt and fmt.lower() not in EXPORT_FORMATS:
+        raise typer.BadParameter(f"Unknown export format: {fmt}")
+    _ensure_authenticated(context)
+    try:
+        report = export_transactions(context.api, output, fmt=fmt, page_size=page_size or None, restart=restart)
+    except (ApiError, ValueError) as exc:
+        typer.secho(f"Export interrupted: {exc}. Run the same command again to resume.", fg=typer.colors.RED)
+        raise typer.Exit(code=1) from exc
+    typer.echo(
+        f"{'Resumed and exported' if report.resumed else 'Exported'} {report.rows} transaction(s) "
+        f"to {output} ({report.pages} page(s), {report.bytes_read} bytes) in {report.seconds:.2f}s"
+    )
+
+
+@transactions_app.command("query")
+def transactions_query(
+    asset: Optional[str] = typer.Option(None, help="Only this asset id, e.g. bitcoin"),
+    since: Optional[str] = typer.Option(None, help="Window such as 30d, 12h, 2w or an ISO date"),
+    side: Optional[str] = typer.Option(None, "--type", help="BUY or SELL"),
+    limit: int = typer.Option(50, help="Maximum rows to print (0 for all)"),
+    db: Path = typer.Option(DEFAULT_TRANSACTIONS_DB_PATH, help="SQLite database with synced transactions"),
+) -> None:
+    from .transactions import TransactionStore
+
+    since_ts = _parse_since_option(since)
+    with TransactionStore(db) as store:
+        rows = store.query(asset=asset, since=since_ts, side=side, limit=limit or None)
+    if not rows:
+        typer.echo("No transactions match. Run `python -m kursach_desktop transactions sync` first.")
+        return
+    typer.echo(f"{'#':>6}  {'Date':<20} {'Type':<5} {'Asset':<10} {'Quantity':>16} {'Price':>14} {'Total':>14}")
+    for row in rows:
+        typer.echo(
+            f"{row.id:>6}  {(row.created_at or '-')[:19]:<20} {row.type:<5} {(row.symbol or row.asset_id):<10} "
+            f"{format_quantity(row.quantity):>16} {'$' + format_money(row.price):>14} {'$' + format_money(row.total):>14}"
+        )
+
+
+@transactions_app.command("pnl")
+def transactions_pnl(
+    asset: Optional[str] = typer.Option(None, help="Only this asset id, e.g. bitcoin"),
+    since: Optional[str] = typer.Option(None, help="Window such as 30d, 12h, 2w or an ISO date"),
+    db: Path = typer.Option(DEFAULT_TRANSACTIONS_DB_PATH, help="SQLite database with synced transactions"),
+) -> None:
+    from .transactions import TransactionStore
+
+    since_ts = _parse_since_option(since)
+    with TransactionStore(db) as store:
+        rollups = store.realized_pnl(asset=asset, since=since_ts)
+    if not rollups:
+        typer.echo("No transactions match. Run `python -m kursach_desktop transactions sync` first.")
+        return
+    typer.echo(f"{'Asset':<10} {'Buys':>5} {'Sells':>5} {'Sold qty':>16} {'Proceeds':>14} {'Realized PnL':>14}")
+    for rollup in rollups:
+        typer.echo(
+            f"{(rollup.symbol or rollup.asset_id):<10} {rollup.buys:>5} {rollup.sells:>5} "
+            f"{format_quantity(rollup.sold_quantity):>16} {'$' + format_money(rollup.proceeds):>14} "
+            f"{'$' + format_money(rollup.realized_pnl):>14}"
+        )
+    typer.echo(f"Total realized PnL: ${format_money(sum(rollup.realized_pnl for rollup in rollups))}")
+
+
+@daemon_app.command("run")
+def daemon_run(ctx: typer.Context) -> None:
+    """Serve CLI commands from this process until Ctrl+C or `daemon stop`."""
+    import signal
+
+    from .daemon import DaemonError, DesktopDaemon
+
+    context = _get_context(ctx)
+    daemon = DesktopDaemon(context, context.config.daemon_socket_path())
+    signal.signal(signal.SIGTERM, lambda *_: daemon.stop())
+    try:
+        daemon.serve_forever()
+    except DaemonError as exc:
+        typer.secho(str(exc), fg=typer.colors.RED)
+        raise typer.Exit(code=1) from exc
+    except KeyboardInterrupt:
+        typer.echo("Daemon interrupted.")
+
+
+@daemon_app.command("status")
+def daemon_status(ctx: typer.Context) -> None:
+    from .daemon import DaemonError, request_daemon
+
+    context = _get_context(ctx)
+    try:
+        info = request_daemon(context.config, "ping")
+    except DaemonError as exc:
+        typer.echo(f"Daemon not running: {exc}")
+        raise typer.Exit(code=1) from exc
+    typer.echo(f"Daemon pid {info['pid']} on {info['socket']}")
+    typer.echo(f"  API base URL: {info['api_base_url']}")
+    typer.echo(f"  Uptime: {info['uptime_seconds']:.0f}s | commands served: {info['commands']}")
+    typer.echo(f"  HTTP client warm: {'yes' if info['client_warm'] else 'no'}")
+    typer.echo(f"  Async HTTP client warm: {'yes' if info.get('async_client_warm') else 'no'}")
+    if info.get("cache"):
+        typer.echo(f"  Response cache: {info['cache']}")
+
+
+@daemon_app.command("stop")
+def daemon_stop(ctx: typer.Context) -> None:
+    from .daemon import DaemonError, request_daemon
+
+    context = _get_context(ctx)
+    try:
+        info = request_daemon(context.config, "stop")
+    except DaemonError as exc:
+        typer.echo(f"Daemon not running: {exc}")
+        raise typer.Exit(code=1) from exc
+    typer.echo(f"Stopping daemon pid {info['pid']}.")
+
+
+def _parse_since_option(since: Optional[str]) -> Optional[float]:
+    from .transactions import parse_since
+
+    if not since:
+        return None
+    try:
+        return parse_since(since)
+    except ValueError as exc:
+        raise typer.BadParameter(str(exc)) from exc
+
+
+def _async_api(context: AppContext, *, cache: ResponseCache | None = None) -> AsyncKursachApi:
+    """An ``AsyncKursachApi`` on the context's pooled async client; closing it leaves the client open."""
+    from .api import AsyncKursachApi
+
+    return AsyncKursachApi(
+        context.config.normalized_base_url(),
+        token=context.state_store.state.access_token,
+        client=context.async_client,
+        cache=cache or context.cache,
+        history_store=context.history_store,
+        metrics=context.metrics,
+        retry_policy=context.retry_policy,
+        breaker=context.breaker,
+        rate_limiter=context.rate_limiter,
+    )
+
+
+def _shared_async_api(context: AppContext) -> AsyncKursachApi:
+    api = context.async_api
+    # `login`/`logout` (also run by the daemon) update the state store, not this client.
+    api.set_token(context.state_store.state.access_token)
+    return api
+
+
+def _watch_dashboard(context: AppContext, interval: float) -> None:
+    from .watch import FrameRenderer, watch_cache, watch_dashboard
+
+    renderer = FrameRenderer(sys.stdout)
+    cache = watch_cache(interval)
+    root = logging.getLogger()
+    level = root.level
+    if renderer.ansi:
+        # Request log lines would scroll the redrawn screen.
+        root.setLevel(max(level, logging.WARNING))
+
+    try:
+        # Own response cache (see watch_cache), shared connection pool.
+        context.run(watch_dashboard(_async_api(context, cache=cache), renderer, interval=interval))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        renderer.close()
+        root.setLevel(level)
+    stats = renderer.stats
+    typer.echo(
+        f"Stopped after {stats.frames} refresh(es): {stats.rows_written} row(s) redrawn in {stats.writes} write(s), "
+        f"{cache.stats()['revalidations']} answered 304 Not Modified, {stats.errors} failed"
+    )
+
+
+def _require_numpy() -> None:
+    from .analytics import AnalyticsUnavailable, require_numpy
+
+    try:
+        require_numpy()
+    except AnalyticsUnavailable as exc:
+        typer.secho(str(exc), fg=typer.colors.RED)
+        raise typer.Exit(code=1) from exc
+
+
+def _load_portfolio_histories(context: AppContext, days: int, concurrency: int) -> tuple[dict, dict]:
+    from .analytics import fetch_histories
+    from .api import ApiError
+
+    try:
+        overview = context.api.get_sell_overview()
+        asset_ids = [str(item.get("id")) for item in overview.get("holdings") or [] if item.get("id")]
+        started = time.perf_counter()
+        histories = context.run(
+            fetch_histories(_shared_async_api(context), asset_ids, days=days, concurrency=concurrency)
+        )
+    except ApiError as exc:
+        typer.secho(f"Failed to load portfolio: {exc}", fg=typer.colors.RED)
+        raise typer.Exit(code=1) from exc
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    LOG.info("Loaded %s-day history for %s asset(s) in %.0f ms", days, len(asset_ids), elapsed_ms)
+    return overview, histories
+
+
+def _resolve_source(context: AppContext, source: Optional[str]) -> str:
+    from .pricing import is_valid_source
+
+    resolved = (source or context.config.default_price_source).lower()
+    if not is_valid_source(resolved):
+        raise typer.BadParameter(f"Unknown price source: {resolved}")
+    return resolved
+
+
+def _preview_sell(
+    context: AppContext,
+    asset_id: str,
+    quantity: Optional[float],
+    amount_usd: Optional[float],
+    source: str,
+) -> tuple[dict, BestQuote | None]:
+    from .pricing import BEST_SOURCE, best_preview
+
+    if source == BEST_SOURCE:
+        best = best_preview(context.api, asset_id=asset_id, quantity=quantity, amount_usd=amount_usd)
+        return best.preview, best
+    preview = context.api.preview_sell(
+        asset_id=asset_id,
+        quantity=quantity,
+        amount_usd=amount_usd,
+        price_source=source,
+    )
+    return preview, None
+
+
+def _echo_best_quote(best: BestQuote) -> None:
+    quotes = ", ".join(
+        f"{name} ${format_money(quote.get('proceeds'))}" for name, quote in sorted(best.quotes.items())
+    )
+    typer.echo(f"Best source: {best.source} | spread {best.spread_pct:.3f}% ({quotes})")
+
+
 def _ensure_authenticated(context: AppContext) -> None:
     if not context.state_store.state.access_token:
         typer.secho("Desktop client is not authenticated. Run `python -m kursach_desktop login`.", fg=typer.colors.RED)
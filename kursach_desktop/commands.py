@@ -1,15 +1,31 @@
 from __future__ import annotations
 
+import asyncio
 import logging
-from typing import Any, Callable, Dict, List, Tuple
+import threading
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
 
-from .api import KursachApi
+from .api import AsyncKursachApi, KursachApi, fetch_dashboard_bundle, get_dashboard_bundle
 from .config import AppConfig
+from .formatting import format_money, format_quantity
+from .profiling import async_span, span, traced
+from .pricing import (
+    BEST_SOURCE,
+    PRICE_SOURCES,
+    BestQuote,
+    best_preview,
+    best_preview_async,
+    refresh_if_stale,
+    refresh_if_stale_async,
+)
 from .state import DesktopStateStore
 
 
 LOG = logging.getLogger(__name__)
 
+# One terminal per process: prompts from command workers or other devices (poll-many) must not interleave.
+_PROMPT_LOCK = threading.RLock()
+
 
 class CommandError(Exception):
     """Raised when a device command cannot be fulfilled."""
@@ -23,8 +39,12 @@ class DeviceCommandDispatcher:
         config: AppConfig,
         *,
         auto_confirm: bool | None = None,
+        async_api: AsyncKursachApi | None = None,
+        prompt_lock: asyncio.Lock | None = None,
     ) -> None:
         self.api = api
+        self.async_api = async_api
+        self._prompt_lock = prompt_lock
         self.state_store = state_store
         self.config = config
         self.auto_confirm = auto_confirm if auto_confirm is not None else config.auto_confirm_sales
@@ -34,6 +54,19 @@ class DeviceCommandDispatcher:
             "EXECUTE_DESKTOP_SELL": self._handle_execute_sell,
             "REQUEST_DESKTOP_SELL": self._handle_request_desktop_sell,
         }
+        self._async_handlers: Dict[str, Callable[[Dict[str, Any]], Awaitable[str]]] = {
+            "OPEN_DESKTOP_DASHBOARD": self._handle_dashboard_async,
+            "EXECUTE_DESKTOP_SELL": self._handle_execute_sell_async,
+        }
+
+    @property
+    def prompt_lock(self) -> asyncio.Lock:
+        # Taken on the event loop before a prompt is handed to a worker thread, so dispatchers
+        # sharing it (poll-many) queue up without parking executor threads on _PROMPT_LOCK.
+        # Created on first use, so a dispatcher can be built outside a running loop.
+        if self._prompt_lock is None:
+            self._prompt_lock = asyncio.Lock()
+        return self._prompt_lock
 
     def handle(self, command: Dict[str, Any]) -> str:
         action = (command.get("action") or "").upper()
@@ -42,9 +75,30 @@ class DeviceCommandDispatcher:
         handler = self._handlers.get(action)
         if handler is None:
             raise CommandError(f"Unsupported action: {action or '<empty>'}")
-        return handler(command)
+        with span("DeviceCommandDispatcher.handle", "command", id=command.get("id"), action=action):
+            return handler(command)
+
+    async def handle_async(self, command: Dict[str, Any]) -> str:
+        action = (command.get("action") or "").upper()
+        payload = command.get("payload") or {}
+        LOG.info("Processing command %s | action=%s payload=%s", command.get("id"), action, payload)
+        if action not in self._handlers:
+            raise CommandError(f"Unsupported action: {action or '<empty>'}")
+        async_handler = self._async_handlers.get(action)
+        with async_span("DeviceCommandDispatcher.handle_async", "command", id=command.get("id"), action=action):
+            if async_handler is None or self.async_api is None:
+                # Interactive and local-only handlers stay on the blocking client.
+                if not self._prompts(action):
+                    return await asyncio.to_thread(self._handlers[action], command)
+                async with self.prompt_lock:
+                    return await asyncio.to_thread(self._handlers[action], command)
+            return await async_handler(command)
+
+    def _prompts(self, action: str) -> bool:
+        return action == "REQUEST_DESKTOP_SELL" or (action == "EXECUTE_DESKTOP_SELL" and not self.auto_confirm)
 
     # Individual handlers
+    @traced(cat="command")
     def _handle_login(self, command: Dict[str, Any]) -> str:
         payload = command.get("payload") or {}
         token = payload.get("access_token")
@@ -52,58 +106,167 @@ class DeviceCommandDispatcher:
             raise CommandError("LOGIN_ON_DESKTOP payload does not contain access_token")
         self.state_store.set_token(token)
         self.api.set_token(token)
+        if self.async_api is not None:
+            self.async_api.set_token(token)
         LOG.info("Stored access token from mobile command")
         return "Access token saved"
 
+    @traced(cat="command")
     def _handle_dashboard(self, command: Dict[str, Any]) -> str:
         self._require_token()
-        dashboard = self.api.get_dashboard()
-        sell_overview = self.api.get_sell_overview()
+        dashboard, sell_overview = get_dashboard_bundle(self.api)
+        print_dashboard(dashboard, sell_overview)
+        return "Dashboard rendered"
+
+    @traced(cat="command")
+    async def _handle_dashboard_async(self, command: Dict[str, Any]) -> str:
+        self._require_token()
+        assert self.async_api is not None
+        dashboard, sell_overview = await fetch_dashboard_bundle(self.async_api)
         print_dashboard(dashboard, sell_overview)
         return "Dashboard rendered"
 
+    @traced(cat="command")
     def _handle_execute_sell(self, command: Dict[str, Any]) -> str:
         self._require_token()
+        asset_id, quantity, amount_usd, price_source = self._parse_execute_sell(command)
+
+        preview, best = self._preview(asset_id, quantity, amount_usd, price_source)
+        # The preview belongs to the prompt; keep another device's output from landing between them.
+        with _PROMPT_LOCK:
+            print_preview(preview)
+            confirmed = self._confirm(
+                f"Sell {preview.get('quantity')} {preview.get('symbol')} for {preview.get('proceeds')} USD?"
+            )
+        if not confirmed:
+            raise CommandError("User rejected sell command")
+
+        price_source = self._execution_source(best, asset_id, quantity, amount_usd, price_source)
+        result = self.api.execute_sell(
+            asset_id=asset_id,
+            quantity=quantity,
+            amount_usd=amount_usd,
+            price_source=price_source,
+            idempotency_key=_sell_idempotency_key(command),
+        )
+        print_sell_result(result)
+        return (
+            f"Sold {result.get('quantity')} {result.get('symbol')} "
+            f"for {result.get('received')} USD"
+        )
+
+    @traced(cat="command")
+    async def _handle_execute_sell_async(self, command: Dict[str, Any]) -> str:
+        self._require_token()
+        assert self.async_api is not None
+        asset_id, quantity, amount_usd, price_source = self._parse_execute_sell(command)
+
+        best: BestQuote | None = None
+        if price_source == BEST_SOURCE:
+            best = await best_preview_async(
+                self.async_api, asset_id=asset_id, quantity=quantity, amount_usd=amount_usd
+            )
+            preview = best.preview
+        else:
+            preview = await self.async_api.preview_sell(
+                asset_id=asset_id,
+                quantity=quantity,
+                amount_usd=amount_usd,
+                price_source=price_source,
+            )
+        message = f"Sell {preview.get('quantity')} {preview.get('symbol')} for {preview.get('proceeds')} USD?"
+        if self.auto_confirm:
+            print_preview(preview)
+            confirmed = self._confirm(message)
+        else:
+            async with self.prompt_lock:
+                print_preview(preview)
+                confirmed = await asyncio.to_thread(self._confirm, message)
+        if not confirmed:
+            raise CommandError("User rejected sell command")
+
+        if best is not None:
+            best = await refresh_if_stale_async(
+                self.async_api,
+                best,
+                asset_id=asset_id,
+                quantity=quantity,
+                amount_usd=amount_usd,
+                max_age=self.config.best_quote_max_age_seconds,
+            )
+            price_source = best.source
+
+        result = await self.async_api.execute_sell(
+            asset_id=asset_id,
+            quantity=quantity,
+            amount_usd=amount_usd,
+            price_source=price_source,
+            idempotency_key=_sell_idempotency_key(command),
+        )
+        print_sell_result(result)
+        return (
+            f"Sold {result.get('quantity')} {result.get('symbol')} "
+            f"for {result.get('received')} USD"
+        )
+
+    def _parse_execute_sell(
+        self, command: Dict[str, Any]
+    ) -> Tuple[str, float | None, float | None, str]:
         payload = command.get("payload") or {}
         asset_id = payload.get("asset_id")
         quantity = payload.get("quantity")
         amount_usd = payload.get("amount_usd")
-        price_source = payload.get("source", "coincap")
+        price_source = str(payload.get("source") or self.config.default_price_source).lower()
         if not asset_id:
             raise CommandError("EXECUTE_DESKTOP_SELL payload is missing asset_id")
         if quantity is None and amount_usd is None:
             raise CommandError("EXECUTE_DESKTOP_SELL payload requires quantity or amount_usd")
+        return asset_id, quantity, amount_usd, price_source
 
+    def _preview(
+        self,
+        asset_id: str,
+        quantity: float | None,
+        amount_usd: float | None,
+        price_source: str,
+    ) -> Tuple[Dict[str, Any], BestQuote | None]:
+        if price_source == BEST_SOURCE:
+            best = best_preview(self.api, asset_id=asset_id, quantity=quantity, amount_usd=amount_usd)
+            return best.preview, best
         preview = self.api.preview_sell(
             asset_id=asset_id,
             quantity=quantity,
             amount_usd=amount_usd,
             price_source=price_source,
         )
-        print_preview(preview)
-
-        if not self._confirm(
-            f"Sell {preview.get('quantity')} {preview.get('symbol')} for {preview.get('proceeds')} USD?"
-        ):
-            raise CommandError("User rejected sell command")
+        return preview, None
 
-        result = self.api.execute_sell(
+    def _execution_source(
+        self,
+        best: BestQuote | None,
+        asset_id: str,
+        quantity: float | None,
+        amount_usd: float | None,
+        price_source: str,
+    ) -> str:
+        if best is None:
+            return price_source
+        best = refresh_if_stale(
+            self.api,
+            best,
             asset_id=asset_id,
             quantity=quantity,
             amount_usd=amount_usd,
-            price_source=price_source,
-        )
-        print_sell_result(result)
-        return (
-            f"Sold {result.get('quantity')} {result.get('symbol')} "
-            f"for {result.get('received')} USD"
+            max_age=self.config.best_quote_max_age_seconds,
         )
+        return best.source
 
+    @traced(cat="command")
     def _handle_request_desktop_sell(self, command: Dict[str, Any]) -> str:
         self._require_token()
-        payload = command.get("payload") or {}
         try:
-            return self._interactive_sell(payload)
+            with _PROMPT_LOCK:
+                return self._interactive_sell(command.get("payload") or {})
         except KeyboardInterrupt as exc:
             raise CommandError("Interactive sell cancelled by user") from exc
 
@@ -114,15 +277,11 @@ class DeviceCommandDispatcher:
             raise CommandError("No holdings available for sale.")
 
         asset = self._prompt_asset_selection(holdings, payload)
-        source = self._prompt_price_source(payload.get("source") or "coincap")
+        source = self._prompt_price_source(payload.get("source") or self.config.default_price_source)
         quantity, amount_usd = self._prompt_sale_amount(asset, payload)
 
-        preview = self.api.preview_sell(
-            asset_id=str(asset.get("id") or ""),
-            quantity=quantity,
-            amount_usd=amount_usd,
-            price_source=source,
-        )
+        asset_id = str(asset.get("id") or "")
+        preview, best = self._preview(asset_id, quantity, amount_usd, source)
         print_preview(preview)
 
         if not self._confirm(
@@ -131,8 +290,9 @@ class DeviceCommandDispatcher:
         ):
             raise CommandError("User rejected sell request")
 
+        source = self._execution_source(best, asset_id, quantity, amount_usd, source)
         result = self.api.execute_sell(
-            asset_id=str(asset.get("id") or ""),
+            asset_id=asset_id,
             quantity=quantity,
             amount_usd=amount_usd,
             price_source=source,
@@ -186,16 +346,17 @@ class DeviceCommandDispatcher:
             print("Invalid selection. Enter the number, id, or symbol of the asset.")
 
     def _prompt_price_source(self, default_source: str) -> str:
-        default = default_source.lower() if default_source.lower() in {"coincap", "coingecko"} else "coincap"
+        choices = (*PRICE_SOURCES, BEST_SOURCE)
+        default = default_source.lower() if default_source.lower() in choices else PRICE_SOURCES[0]
         while True:
             value = input(
-                f"Price source [coincap/coingecko] (default {default}): "
+                f"Price source [{'/'.join(choices)}] (default {default}): "
             ).strip().lower()
             if not value:
                 return default
-            if value in {"coincap", "coingecko"}:
+            if value in choices:
                 return value
-            print("Enter either 'coincap' or 'coingecko'.")
+            print(f"Enter one of: {', '.join(choices)}.")
 
     def _prompt_sale_amount(
         self,
@@ -285,7 +446,8 @@ class DeviceCommandDispatcher:
         if self.auto_confirm:
             LOG.info("Auto-confirm enabled: %s", message)
             return True
-        answer = input(f"{message} [y/N]: ").strip().lower()
+        with _PROMPT_LOCK:
+            answer = input(f"{message} [y/N]: ").strip().lower()
         return answer in {"y", "yes"}
 
     def _require_token(self) -> None:
@@ -295,34 +457,24 @@ class DeviceCommandDispatcher:
             )
 
 
-def format_money(value: Any) -> str:
-    try:
-        number = float(value)
-    except (TypeError, ValueError):
-        return str(value)
-    return f"{number:,.2f}"
-
-
-def format_quantity(value: Any) -> str:
-    try:
-        number = float(value)
-    except (TypeError, ValueError):
-        return str(value)
-    return f"{number:,.6f}".rstrip("0").rstrip(".")
+def _sell_idempotency_key(command: Dict[str, Any]) -> str | None:
+    # A command re-delivered after a crash before its ACK must not sell twice.
+    command_id = command.get("id")
+    return f"device-command-{command_id}-sell" if command_id is not None else None
 
 
-def print_dashboard(dashboard: Dict[str, Any], sell_overview: Dict[str, Any]) -> None:
+def dashboard_lines(dashboard: Dict[str, Any], sell_overview: Dict[str, Any]) -> List[str]:
     currency = dashboard.get("currency", "USD")
-    print("\n=== Desktop Dashboard ===")
-    print(
+    lines = [
+        "=== Desktop Dashboard ===",
         f"Portfolio balance: {format_money(dashboard.get('portfolio_balance'))} {currency} "
-        f"(cash {format_money(dashboard.get('cash_balance'))})"
-    )
-    print("Market movers loaded:", len(dashboard.get("market_movers", [])))
-    print("--- Sellable holdings ---")
+        f"(cash {format_money(dashboard.get('cash_balance'))})",
+        f"Market movers loaded: {len(dashboard.get('market_movers', []))}",
+        "--- Sellable holdings ---",
+    ]
     holdings = sell_overview.get("holdings") or []
     if not holdings:
-        print("No holdings available for sale.")
+        lines.append("No holdings available for sale.")
     for asset in holdings:
         symbol = asset.get("symbol")
         qty = format_quantity(asset.get("quantity"))
@@ -330,46 +482,60 @@ def print_dashboard(dashboard: Dict[str, Any], sell_overview: Dict[str, Any]) ->
         value = format_money(asset.get("current_value"))
         pnl = format_money(asset.get("unrealized_pnl"))
         pnl_pct = asset.get("unrealized_pnl_pct", 0.0)
-        print(
-            f"- {symbol}: qty {qty} | price ${price} | value ${value} | PnL ${pnl} ({pnl_pct:.2f}%)"
-        )
-    print("==========================\n")
+        lines.append(f"- {symbol}: qty {qty} | price ${price} | value ${value} | PnL ${pnl} ({pnl_pct:.2f}%)")
+    lines.append("==========================")
+    return lines
 
 
+@traced(cat="console")
+def print_dashboard(dashboard: Dict[str, Any], sell_overview: Dict[str, Any]) -> None:
+    print("\n" + "\n".join(dashboard_lines(dashboard, sell_overview)) + "\n")
+
+
+def preview_lines(preview: Dict[str, Any]) -> List[str]:
+    return [
+        ">>> Sell preview",
+        f"Asset: {preview.get('name')} ({preview.get('symbol')}) | Source: {preview.get('price_source')}",
+        f"Quantity: {format_quantity(preview.get('quantity'))} "
+        f"of {format_quantity(preview.get('available_quantity'))} available",
+        f"Unit price: ${format_money(preview.get('unit_price'))} | Proceeds: ${format_money(preview.get('proceeds'))}",
+    ]
+
+
+def sell_result_lines(result: Dict[str, Any]) -> List[str]:
+    lines = [
+        "*** Sell executed ***",
+        f"Sold {format_quantity(result.get('quantity'))} {result.get('symbol')} @ ${format_money(result.get('price'))}",
+        f"Received ${format_money(result.get('received'))} | Cash balance: ${format_money(result.get('cash_balance'))}",
+        f"Total balance: ${format_money(result.get('total_balance'))}",
+    ]
+    pnl = result.get("realized_pnl")
+    if pnl is not None:
+        lines.append(f"Realized PnL: ${format_money(pnl)}")
+    lines.append("*************************")
+    return lines
+
+
+# Each block goes out in one write so concurrent command workers cannot interleave their lines.
+@traced(cat="console")
 def print_preview(preview: Dict[str, Any]) -> None:
-    print("\n>>> Sell preview")
-    print(
-        f"Asset: {preview.get('name')} ({preview.get('symbol')}) | Source: {preview.get('price_source')}"
-    )
-    print(
-        f"Quantity: {format_quantity(preview.get('quantity'))} of {format_quantity(preview.get('available_quantity'))} available"
-    )
-    print(
-        f"Unit price: ${format_money(preview.get('unit_price'))} | Proceeds: ${format_money(preview.get('proceeds'))}"
-    )
+    print("\n" + "\n".join(preview_lines(preview)))
 
 
+@traced(cat="console")
 def print_sell_result(result: Dict[str, Any]) -> None:
-    print("\n*** Sell executed ***")
-    print(
-        f"Sold {format_quantity(result.get('quantity'))} {result.get('symbol')} @ ${format_money(result.get('price'))}"
-    )
-    print(
-        f"Received ${format_money(result.get('received'))} | Cash balance: ${format_money(result.get('cash_balance'))}"
-    )
-    print(f"Total balance: ${format_money(result.get('total_balance'))}")
-    pnl = result.get("realized_pnl")
-    if pnl is not None:
-        print(f"Realized PnL: ${format_money(pnl)}")
-    print("*************************\n")
+    print("\n" + "\n".join(sell_result_lines(result)) + "\n")
 
 
 __all__ = [
     "CommandError",
     "DeviceCommandDispatcher",
+    "dashboard_lines",
     "format_money",
     "format_quantity",
+    "preview_lines",
     "print_dashboard",
     "print_preview",
     "print_sell_result",
+    "sell_result_lines",
 ]
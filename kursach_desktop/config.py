@@ -2,13 +2,16 @@ from __future__ import annotations
 
 import json
 import os
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, field
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, List
 
 ROOT_DIR = Path(__file__).resolve().parent.parent
 DEFAULT_CONFIG_PATH = ROOT_DIR / "config.json"
 DEFAULT_STATE_PATH = ROOT_DIR / "device_state.json"
+DEFAULT_JOURNAL_PATH = ROOT_DIR / "command_journal.jsonl"
+DEFAULT_TRANSACTIONS_DB_PATH = ROOT_DIR / "transactions.sqlite3"
+DEFAULT_HISTORY_DIR = ROOT_DIR / "history_cache"
 
 
 @dataclass
@@ -17,8 +20,45 @@ class AppConfig:
     target_device: str = "desktop"
     device_id: str = "desktop-cli"
     poll_interval_seconds: int = 5
+    poll_min_interval_seconds: float = 1.0
+    # 0 keeps idle polls at poll_interval_seconds; set it higher to let an idle poller back off.
+    poll_max_interval_seconds: float = 0.0
+    command_workers: int = 4
+    ack_workers: int = 4
+    ack_max_attempts: int = 8
+    state_flush_interval_seconds: float = 5.0
     auto_confirm_sales: bool = False
+    default_price_source: str = "coincap"
+    best_quote_max_age_seconds: float = 10.0
     verify_ssl: bool = False
+    response_cache_enabled: bool = False
+    response_cache_max_entries: int = 128
+    response_cache_ttls: Dict[str, float] = field(default_factory=dict)
+    history_cache_enabled: bool = True
+    history_cache_dir: str = ""
+    metrics_host: str = "127.0.0.1"
+    metrics_port: int = 0
+    metrics_file: str = ""
+    daemon_enabled: bool = True
+    daemon_socket: str = ""
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry_seconds: float = 5.0
+    http2: bool = False
+    http_accept_encoding: str = ""
+    http_connect_timeout_seconds: float = 5.0
+    http_read_timeout_seconds: float = 20.0
+    http_pool_timeout_seconds: float = 20.0
+    retry_max_attempts: int = 3
+    retry_base_delay_seconds: float = 0.2
+    retry_max_delay_seconds: float = 5.0
+    backend_idempotency: bool = False
+    circuit_failure_threshold: int = 5
+    circuit_reset_seconds: float = 10.0
+    rate_limit_per_second: float = 0.0
+    rate_limit_burst: int = 10
+    rate_limit_routes: Dict[str, float] = field(default_factory=dict)
+    rate_limit_adaptive: bool = True
 
     def normalized_base_url(self) -> str:
         base = self.api_base_url.strip().rstrip("/")
@@ -29,6 +69,29 @@ class AppConfig:
     def to_dict(self) -> Dict[str, Any]:
         return asdict(self)
 
+    def daemon_socket_path(self) -> Path:
+        if self.daemon_socket:
+            return Path(self.daemon_socket).expanduser()
+        user = os.getuid() if hasattr(os, "getuid") else os.getenv("USERNAME", "user")
+        return Path(os.getenv("XDG_RUNTIME_DIR") or "/tmp") / f"kursach-desktop-{user}.sock"
+
+
+@dataclass
+class DeviceProfile:
+    device_id: str
+    target_device: str = "desktop"
+    state_path: Path | None = None
+    access_token: str | None = None
+
+    def resolved_state_path(self) -> Path:
+        if self.state_path is not None:
+            return self.state_path
+        return ROOT_DIR / f"device_state.{self.device_id}.json"
+
+    def resolved_journal_path(self) -> Path:
+        state_path = self.resolved_state_path()
+        return state_path.with_name(f"{state_path.stem}.journal.jsonl")
+
 
 def _read_json_config(path: Path) -> Dict[str, Any]:
     if not path.exists():
@@ -58,8 +121,66 @@ def load_config(path: Path | None = None) -> AppConfig:
         "target_device": raw.get("target_device", AppConfig.target_device),
         "device_id": raw.get("device_id", AppConfig.device_id),
         "poll_interval_seconds": int(raw.get("poll_interval_seconds", AppConfig.poll_interval_seconds)),
+        "poll_min_interval_seconds": float(
+            raw.get("poll_min_interval_seconds", AppConfig.poll_min_interval_seconds)
+        ),
+        "poll_max_interval_seconds": float(
+            raw.get("poll_max_interval_seconds", AppConfig.poll_max_interval_seconds)
+        ),
+        "command_workers": int(raw.get("command_workers", AppConfig.command_workers)),
+        "ack_workers": int(raw.get("ack_workers", AppConfig.ack_workers)),
+        "ack_max_attempts": int(raw.get("ack_max_attempts", AppConfig.ack_max_attempts)),
+        "state_flush_interval_seconds": float(
+            raw.get("state_flush_interval_seconds", AppConfig.state_flush_interval_seconds)
+        ),
         "auto_confirm_sales": bool(raw.get("auto_confirm_sales", AppConfig.auto_confirm_sales)),
+        "default_price_source": str(
+            raw.get("default_price_source", AppConfig.default_price_source)
+        ).strip().lower(),
+        "best_quote_max_age_seconds": float(
+            raw.get("best_quote_max_age_seconds", AppConfig.best_quote_max_age_seconds)
+        ),
         "verify_ssl": bool(raw.get("verify_ssl", AppConfig.verify_ssl)),
+        "response_cache_enabled": bool(raw.get("response_cache_enabled", AppConfig.response_cache_enabled)),
+        "response_cache_max_entries": int(
+            raw.get("response_cache_max_entries", AppConfig.response_cache_max_entries)
+        ),
+        "response_cache_ttls": {
+            str(route): float(ttl) for route, ttl in (raw.get("response_cache_ttls") or {}).items()
+        },
+        "history_cache_enabled": bool(raw.get("history_cache_enabled", AppConfig.history_cache_enabled)),
+        "history_cache_dir": str(raw.get("history_cache_dir") or AppConfig.history_cache_dir),
+        "metrics_host": str(raw.get("metrics_host") or AppConfig.metrics_host),
+        "metrics_port": int(raw.get("metrics_port", AppConfig.metrics_port)),
+        "metrics_file": str(raw.get("metrics_file") or AppConfig.metrics_file),
+        "daemon_enabled": bool(raw.get("daemon_enabled", AppConfig.daemon_enabled)),
+        "daemon_socket": str(raw.get("daemon_socket") or AppConfig.daemon_socket),
+        "http_max_connections": int(raw.get("http_max_connections", AppConfig.http_max_connections)),
+        "http_max_keepalive_connections": int(
+            raw.get("http_max_keepalive_connections", AppConfig.http_max_keepalive_connections)
+        ),
+        "http_keepalive_expiry_seconds": float(
+            raw.get("http_keepalive_expiry_seconds", AppConfig.http_keepalive_expiry_seconds)
+        ),
+        "http2": bool(raw.get("http2", AppConfig.http2)),
+        "http_accept_encoding": str(raw.get("http_accept_encoding") or AppConfig.http_accept_encoding).strip(),
+        "http_connect_timeout_seconds": float(
+            raw.get("http_connect_timeout_seconds", AppConfig.http_connect_timeout_seconds)
+        ),
+        "http_read_timeout_seconds": float(raw.get("http_read_timeout_seconds", AppConfig.http_read_timeout_seconds)),
+        "http_pool_timeout_seconds": float(raw.get("http_pool_timeout_seconds", AppConfig.http_pool_timeout_seconds)),
+        "retry_max_attempts": int(raw.get("retry_max_attempts", AppConfig.retry_max_attempts)),
+        "retry_base_delay_seconds": float(raw.get("retry_base_delay_seconds", AppConfig.retry_base_delay_seconds)),
+        "retry_max_delay_seconds": float(raw.get("retry_max_delay_seconds", AppConfig.retry_max_delay_seconds)),
+        "backend_idempotency": bool(raw.get("backend_idempotency", AppConfig.backend_idempotency)),
+        "circuit_failure_threshold": int(raw.get("circuit_failure_threshold", AppConfig.circuit_failure_threshold)),
+        "circuit_reset_seconds": float(raw.get("circuit_reset_seconds", AppConfig.circuit_reset_seconds)),
+        "rate_limit_per_second": float(raw.get("rate_limit_per_second", AppConfig.rate_limit_per_second)),
+        "rate_limit_burst": int(raw.get("rate_limit_burst", AppConfig.rate_limit_burst)),
+        "rate_limit_routes": {
+            str(route): float(limit) for route, limit in (raw.get("rate_limit_routes") or {}).items()
+        },
+        "rate_limit_adaptive": bool(raw.get("rate_limit_adaptive", AppConfig.rate_limit_adaptive)),
     }
 
     env_overrides = {
@@ -67,8 +188,33 @@ def load_config(path: Path | None = None) -> AppConfig:
         "target_device": os.getenv("KURSACH_TARGET_DEVICE"),
         "device_id": os.getenv("KURSACH_DEVICE_ID"),
         "poll_interval_seconds": os.getenv("KURSACH_POLL_INTERVAL"),
+        "poll_min_interval_seconds": os.getenv("KURSACH_POLL_MIN_INTERVAL"),
+        "poll_max_interval_seconds": os.getenv("KURSACH_POLL_MAX_INTERVAL"),
+        "command_workers": os.getenv("KURSACH_COMMAND_WORKERS"),
         "auto_confirm_sales": os.getenv("KURSACH_AUTO_CONFIRM"),
+        "default_price_source": os.getenv("KURSACH_PRICE_SOURCE"),
         "verify_ssl": os.getenv("KURSACH_VERIFY_SSL"),
+        "response_cache_enabled": os.getenv("KURSACH_RESPONSE_CACHE"),
+        "history_cache_enabled": os.getenv("KURSACH_HISTORY_CACHE"),
+        "metrics_port": os.getenv("KURSACH_METRICS_PORT"),
+        "metrics_file": os.getenv("KURSACH_METRICS_FILE"),
+        "daemon_enabled": os.getenv("KURSACH_DAEMON"),
+        "daemon_socket": os.getenv("KURSACH_DAEMON_SOCKET"),
+        "http_max_connections": os.getenv("KURSACH_HTTP_MAX_CONNECTIONS"),
+        "http_max_keepalive_connections": os.getenv("KURSACH_HTTP_MAX_KEEPALIVE"),
+        "http_keepalive_expiry_seconds": os.getenv("KURSACH_HTTP_KEEPALIVE_EXPIRY"),
+        "http2": os.getenv("KURSACH_HTTP2"),
+        "http_accept_encoding": os.getenv("KURSACH_HTTP_ACCEPT_ENCODING"),
+        "http_connect_timeout_seconds": os.getenv("KURSACH_HTTP_CONNECT_TIMEOUT"),
+        "http_read_timeout_seconds": os.getenv("KURSACH_HTTP_READ_TIMEOUT"),
+        "http_pool_timeout_seconds": os.getenv("KURSACH_HTTP_POOL_TIMEOUT"),
+        "retry_max_attempts": os.getenv("KURSACH_RETRY_MAX_ATTEMPTS"),
+        "backend_idempotency": os.getenv("KURSACH_BACKEND_IDEMPOTENCY"),
+        "circuit_failure_threshold": os.getenv("KURSACH_CIRCUIT_FAILURE_THRESHOLD"),
+        "circuit_reset_seconds": os.getenv("KURSACH_CIRCUIT_RESET"),
+        "rate_limit_per_second": os.getenv("KURSACH_RATE_LIMIT"),
+        "rate_limit_burst": os.getenv("KURSACH_RATE_LIMIT_BURST"),
+        "rate_limit_adaptive": os.getenv("KURSACH_RATE_LIMIT_ADAPTIVE"),
     }
 
     if env_overrides["api_base_url"]:
@@ -79,6 +225,42 @@ def load_config(path: Path | None = None) -> AppConfig:
         data["device_id"] = env_overrides["device_id"].strip()
     if env_overrides["poll_interval_seconds"]:
         data["poll_interval_seconds"] = int(env_overrides["poll_interval_seconds"])
+    if env_overrides["poll_min_interval_seconds"]:
+        data["poll_min_interval_seconds"] = float(env_overrides["poll_min_interval_seconds"])
+    if env_overrides["poll_max_interval_seconds"]:
+        data["poll_max_interval_seconds"] = float(env_overrides["poll_max_interval_seconds"])
+    if env_overrides["command_workers"]:
+        data["command_workers"] = int(env_overrides["command_workers"])
+    if env_overrides["metrics_port"]:
+        data["metrics_port"] = int(env_overrides["metrics_port"])
+    if env_overrides["metrics_file"]:
+        data["metrics_file"] = env_overrides["metrics_file"].strip()
+    if env_overrides["daemon_socket"]:
+        data["daemon_socket"] = env_overrides["daemon_socket"].strip()
+    for name in (
+        "http_max_connections",
+        "http_max_keepalive_connections",
+        "retry_max_attempts",
+        "circuit_failure_threshold",
+        "rate_limit_burst",
+    ):
+        if env_overrides[name]:
+            data[name] = int(env_overrides[name])
+    for name in (
+        "http_keepalive_expiry_seconds",
+        "http_connect_timeout_seconds",
+        "http_read_timeout_seconds",
+        "http_pool_timeout_seconds",
+        "circuit_reset_seconds",
+        "rate_limit_per_second",
+    ):
+        if env_overrides[name]:
+            data[name] = float(env_overrides[name])
+    if env_overrides["http_accept_encoding"]:
+        data["http_accept_encoding"] = env_overrides["http_accept_encoding"].strip()
+
+    if env_overrides["default_price_source"]:
+        data["default_price_source"] = env_overrides["default_price_source"].strip().lower()
 
     auto_confirm_env = _bool_from_env(env_overrides["auto_confirm_sales"])
     if auto_confirm_env is not None:
@@ -88,14 +270,72 @@ def load_config(path: Path | None = None) -> AppConfig:
     if verify_ssl_env is not None:
         data["verify_ssl"] = verify_ssl_env
 
+    response_cache_env = _bool_from_env(env_overrides["response_cache_enabled"])
+    if response_cache_env is not None:
+        data["response_cache_enabled"] = response_cache_env
+
+    history_cache_env = _bool_from_env(env_overrides["history_cache_enabled"])
+    if history_cache_env is not None:
+        data["history_cache_enabled"] = history_cache_env
+
+    http2_env = _bool_from_env(env_overrides["http2"])
+    if http2_env is not None:
+        data["http2"] = http2_env
+
+    daemon_env = _bool_from_env(env_overrides["daemon_enabled"])
+    if daemon_env is not None:
+        data["daemon_enabled"] = daemon_env
+
+    backend_idempotency_env = _bool_from_env(env_overrides["backend_idempotency"])
+    if backend_idempotency_env is not None:
+        data["backend_idempotency"] = backend_idempotency_env
+
+    rate_limit_adaptive_env = _bool_from_env(env_overrides["rate_limit_adaptive"])
+    if rate_limit_adaptive_env is not None:
+        data["rate_limit_adaptive"] = rate_limit_adaptive_env
+
     config = AppConfig(**data)
     return config
 
 
+def load_device_profiles(path: Path, config: AppConfig) -> List[DeviceProfile]:
+    if not path.exists():
+        raise ValueError(f"Device profiles file {path} does not exist")
+    raw = _read_json_config(path)
+    entries = raw.get("devices", []) if isinstance(raw, dict) else raw
+    if not isinstance(entries, list):
+        raise ValueError(f"Device profiles file {path} must contain a list of devices")
+
+    profiles: List[DeviceProfile] = []
+    seen: set[str] = set()
+    for entry in entries:
+        device_id = str(entry.get("device_id") or "").strip()
+        if not device_id:
+            raise ValueError(f"Device profile without device_id in {path}")
+        if device_id in seen:
+            raise ValueError(f"Duplicate device_id {device_id!r} in {path}")
+        seen.add(device_id)
+        state_path = entry.get("state_path")
+        profiles.append(
+            DeviceProfile(
+                device_id=device_id,
+                target_device=entry.get("target_device") or config.target_device,
+                state_path=(path.parent / state_path) if state_path else None,
+                access_token=entry.get("access_token"),
+            )
+        )
+    return profiles
+
+
 __all__ = [
     "AppConfig",
+    "DeviceProfile",
     "DEFAULT_CONFIG_PATH",
+    "DEFAULT_HISTORY_DIR",
+    "DEFAULT_JOURNAL_PATH",
     "DEFAULT_STATE_PATH",
+    "DEFAULT_TRANSACTIONS_DB_PATH",
     "ROOT_DIR",
     "load_config",
+    "load_device_profiles",
 ]
@@ -0,0 +1,358 @@
+"""Warm background process that runs CLI commands sent over a Unix socket."""
+
+from __future__ import annotations
+
+import io
+import json
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+from contextlib import redirect_stderr, redirect_stdout
+from pathlib import Path
+from typing import IO, TYPE_CHECKING, Any, Dict, List, Sequence
+
+from .config import AppConfig, load_config
+
+if TYPE_CHECKING:
+    from .cli import AppContext
+
+
+LOG = logging.getLogger(__name__)
+
+# Top-level commands the daemon may run. Long-running loops, `login` (getpass reads
+# the controlling terminal) and `daemon` itself always run in-process.
+DAEMON_COMMANDS = frozenset({"status", "dashboard", "analytics", "portfolio", "sell", "transactions"})
+IN_PROCESS_FLAGS = frozenset({"--watch"})
+# Settings that may legitimately differ between the daemon and its clients.
+_LOCAL_SETTINGS = ("metrics_host", "metrics_port", "metrics_file", "daemon_enabled", "daemon_socket")
+
+
+class DaemonError(RuntimeError):
+    """Raised when the daemon cannot start or cannot be reached."""
+
+
+def config_fingerprint(config: AppConfig) -> str:
+    settings = config.to_dict()
+    for name in _LOCAL_SETTINGS:
+        settings.pop(name, None)
+    return json.dumps(settings, sort_keys=True)
+
+
+def is_forwardable(argv: Sequence[str]) -> bool:
+    return bool(argv) and argv[0] in DAEMON_COMMANDS and not IN_PROCESS_FLAGS.intersection(argv)
+
+
+def forward(argv: Sequence[str]) -> int | None:
+    """Run ``argv`` in a running daemon; ``None`` means run it in-process instead."""
+    if not hasattr(socket, "AF_UNIX") or not is_forwardable(argv):
+        return None
+    config = load_config()
+    if not config.daemon_enabled:
+        return None
+    path = config.daemon_socket_path()
+    if not path.exists():
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(str(path))
+    except OSError:
+        sock.close()
+        return None
+    request = {
+        "argv": list(argv),
+        "cwd": os.getcwd(),
+        "tty": sys.stdout.isatty(),
+        "config": config_fingerprint(config),
+    }
+    with sock, sock.makefile("rb") as replies:
+        try:
+            _send(sock, request)
+            for raw in replies:
+                message = json.loads(raw)
+                if "out" in message:
+                    sys.stdout.write(message["out"])
+                    sys.stdout.flush()
+                elif "err" in message:
+                    sys.stderr.write(message["err"])
+                    sys.stderr.flush()
+                elif "read" in message:
+                    _send(sock, {"line": sys.stdin.readline()})
+                elif "fallback" in message:
+                    return None
+                elif "exit" in message:
+                    return int(message["exit"])
+        except KeyboardInterrupt:
+            return 130
+        except OSError as exc:
+            sys.stderr.write(f"Lost connection to the daemon: {exc}\n")
+            return 1
+    # The command may have had side effects already, so it is not retried in-process.
+    sys.stderr.write("The daemon closed the connection before the command finished\n")
+    return 1
+
+
+def request_daemon(config: AppConfig, op: str, *, timeout: float = 5.0) -> Dict[str, Any]:
+    """Send a control request (``ping``/``stop``) and return the reply."""
+    path = config.daemon_socket_path()
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(str(path))
+            _send(sock, {"op": op})
+            with sock.makefile("rb") as replies:
+                raw = replies.readline()
+    except OSError as exc:
+        raise DaemonError(f"No daemon is listening on {path}: {exc}") from exc
+    if not raw:
+        raise DaemonError(f"The daemon on {path} closed the connection")
+    return json.loads(raw)
+
+
+class _Connection:
+    def __init__(self, sock: socket.socket, replies: IO[bytes]) -> None:
+        self.sock = sock
+        self.replies = replies
+        self.closed = False
+
+    def send(self, message: Dict[str, Any]) -> None:
+        if self.closed:
+            return
+        try:
+            _send(self.sock, message)
+        except OSError:
+            # The client went away (Ctrl+C); let the command finish without an audience.
+            self.closed = True
+
+    def read_line(self) -> str:
+        self.send({"read": True})
+        if self.closed:
+            return ""
+        raw = self.replies.readline()
+        if not raw:
+            self.closed = True
+            return ""
+        return str(json.loads(raw).get("line") or "")
+
+
+class _RemoteOutput(io.TextIOBase):
+    """stdout/stderr replacement that ships text to the client on every flush."""
+
+    def __init__(self, connection: _Connection, key: str, tty: bool) -> None:
+        self._connection = connection
+        self._key = key
+        self._tty = tty
+        self._parts: List[str] = []
+
+    @property
+    def encoding(self) -> str:  # type: ignore[override]
+        return "utf-8"
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        # click probes streams with write(b"") and wraps anything that accepts bytes.
+        if not isinstance(text, str):
+            raise TypeError(f"write() argument must be str, not {type(text).__name__}")
+        self._parts.append(text)
+        return len(text)
+
+    def flush(self) -> None:
+        if self._parts:
+            text = "".join(self._parts)
+            self._parts.clear()
+            self._connection.send({self._key: text})
+
+    def isatty(self) -> bool:
+        return self._tty
+
+
+class _RemoteInput(io.TextIOBase):
+    def __init__(self, connection: _Connection, outputs: Sequence[_RemoteOutput], tty: bool) -> None:
+        self._connection = connection
+        self._outputs = outputs
+        self._tty = tty
+
+    def readable(self) -> bool:
+        return True
+
+    def readline(self, size: int | None = -1) -> str:  # type: ignore[override]
+        for output in self._outputs:
+            output.flush()
+        return self._connection.read_line()
+
+    def isatty(self) -> bool:
+        return self._tty
+
+
+class DesktopDaemon:
+    """Serves forwarded CLI commands one at a time: they share ``sys.stdout``, the cwd and the device state."""
+
+    def __init__(self, context: "AppContext", path: Path) -> None:
+        self.context = context
+        self.path = path
+        self.started = time.time()
+        self.requests = 0
+        self._command_lock = threading.Lock()
+        self._fingerprint = config_fingerprint(context.config)
+        self._server: Any = None
+        self._command: Any = None
+
+    def serve_forever(self) -> None:
+        import socketserver
+
+        from typer.main import get_command
+
+        from .cli import app
+
+        if not hasattr(socket, "AF_UNIX"):
+            raise DaemonError("Unix domain sockets are not available on this platform")
+        # Building the click command tree from the typer app is itself a noticeable cost per call.
+        self._command = get_command(app)
+        self._remove_stale_socket()
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self) -> None:
+                daemon._handle(self.request, self.rfile)
+
+        class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+            daemon_threads = True
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        umask = os.umask(0o077)
+        try:
+            self._server = Server(str(self.path), Handler)
+        finally:
+            os.umask(umask)
+        LOG.info("Daemon %s listening on %s", os.getpid(), self.path)
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            self.path.unlink(missing_ok=True)
+            LOG.info("Daemon stopped after %s command(s)", self.requests)
+
+    def stop(self) -> None:
+        if self._server is not None:
+            # shutdown() waits for serve_forever(), so it must not run on the serving thread.
+            threading.Thread(target=self._server.shutdown, daemon=True).start()
+
+    def _remove_stale_socket(self) -> None:
+        if not self.path.exists():
+            return
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                probe.connect(str(self.path))
+        except OSError:
+            self.path.unlink()
+            return
+        raise DaemonError(f"A daemon is already listening on {self.path}")
+
+    def _handle(self, sock: socket.socket, replies: IO[bytes]) -> None:
+        raw = replies.readline()
+        if not raw:
+            return
+        request = json.loads(raw)
+        connection = _Connection(sock, replies)
+        op = request.get("op")
+        if op == "ping":
+            connection.send(self.describe())
+        elif op == "stop":
+            connection.send({"stopping": True, "pid": os.getpid()})
+            self.stop()
+        elif request.get("config") != self._fingerprint:
+            connection.send({"fallback": "configuration differs from the daemon's"})
+        else:
+            code = self._run(request, connection)
+            connection.send({"exit": code})
+
+    def describe(self) -> Dict[str, Any]:
+        context = self.context
+        cache = context.__dict__.get("cache")
+        return {
+            "pid": os.getpid(),
+            "socket": str(self.path),
+            "uptime_seconds": round(time.time() - self.started, 1),
+            "commands": self.requests,
+            "api_base_url": context.config.normalized_base_url(),
+            "client_warm": "api" in context.__dict__,
+            "async_client_warm": "async_client" in context.__dict__,
+            "cache": cache.stats() if cache is not None else None,
+        }
+
+    def _run(self, request: Dict[str, Any], connection: _Connection) -> int:
+        import click
+
+        tty = bool(request.get("tty"))
+        stdout = _RemoteOutput(connection, "out", tty)
+        stderr = _RemoteOutput(connection, "err", tty)
+        stdin = _RemoteInput(connection, (stdout, stderr), tty)
+        argv = [str(arg) for arg in request.get("argv") or []]
+        with self._command_lock:
+            self.requests += 1
+            self._sync_state()
+            started = time.perf_counter()
+            previous_cwd = os.getcwd()
+            previous_stdin = sys.stdin
+            sys.stdin = stdin  # type: ignore[assignment]
+            try:
+                with redirect_stdout(stdout), redirect_stderr(stderr):  # type: ignore[type-var]
+                    os.chdir(request.get("cwd") or previous_cwd)
+                    code = self._invoke(argv, click)
+                    stdout.flush()
+                    stderr.flush()
+            finally:
+                sys.stdin = previous_stdin
+                os.chdir(previous_cwd)
+                self.context.state_store.flush()
+        LOG.info("Served %r -> %s in %.1f ms", " ".join(argv), code, (time.perf_counter() - started) * 1000)
+        return code
+
+    def _invoke(self, argv: List[str], click: Any) -> int:
+        try:
+            result = self._command.main(
+                args=argv, prog_name="python -m kursach_desktop", obj=self.context, standalone_mode=False
+            )
+        except click.exceptions.Exit as exc:
+            return exc.exit_code
+        except click.ClickException as exc:
+            exc.show()
+            return exc.exit_code
+        except click.Abort:
+            click.echo("Aborted!", err=True)
+            return 1
+        except Exception as exc:  # noqa: BLE001 - report to the client, keep serving
+            LOG.exception("Command %r failed in the daemon", " ".join(argv))
+            click.echo(f"Error: {exc}", err=True)
+            return 1
+        return result if isinstance(result, int) else 0
+
+    def _sync_state(self) -> None:
+        """Follow `login`/`logout` and pollers that ran in other processes."""
+        store = self.context.state_store
+        if store.reload_if_changed():
+            for name in ("api", "async_api"):
+                api = self.context.__dict__.get(name)
+                if api is not None:
+                    api.set_token(store.state.access_token)
+
+
+# Newline-delimited JSON. The client sends {"argv", "cwd", "tty", "config"}; the daemon answers with
+# "out"/"err" chunks, "read" requests for a line of the client's stdin and finally "exit" or "fallback".
+def _send(sock: socket.socket, message: Dict[str, Any]) -> None:
+    sock.sendall(json.dumps(message).encode("utf-8") + b"\n")
+
+
+__all__ = [
+    "DAEMON_COMMANDS",
+    "DaemonError",
+    "DesktopDaemon",
+    "config_fingerprint",
+    "forward",
+    "is_forwardable",
+    "request_daemon",
+]
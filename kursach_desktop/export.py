@@ -0,0 +1,361 @@
+from __future__ import annotations
+
+import codecs
+import csv
+import io
+import json
+import logging
+import os
+import re
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, BinaryIO, Dict, Iterable, List, Tuple
+
+from .state import atomic_write
+from .transactions import ITEM_KEYS, TRANSACTIONS_URL
+
+if TYPE_CHECKING:
+    from .api import KursachApi
+
+
+LOG = logging.getLogger(__name__)
+
+EXPORT_FORMATS: Tuple[str, ...] = ("csv", "ndjson")
+CSV_FIELDS: Tuple[str, ...] = (
+    "id",
+    "asset_id",
+    "symbol",
+    "type",
+    "quantity",
+    "price",
+    "total",
+    "realized_pnl",
+    "created_at",
+)
+
+_STRUCTURAL = re.compile(r'[\\"{}\[\]]')
+
+
+class JsonArrayStream:
+    """Incremental parser yielding the object elements of a JSON array as they complete.
+
+    The array may be the whole document or sit under one of ``keys`` in a
+    wrapping object; the rest of that object (pagination cursors and such) is
+    returned by :meth:`close`. Only the element being parsed is buffered.
+    """
+
+    def __init__(self, keys: Iterable[str] = ITEM_KEYS) -> None:
+        self.keys = frozenset(keys)
+        self._stack: List[str] = []
+        self._in_string = False
+        self._skip_first = False
+        self._wrapped = False
+        self._item_depth: int | None = None
+        self._items_done = False
+        self._sink: List[str] | None = None
+        self._item: List[str] = []
+        self._meta: List[str] = []
+        self._key: List[str] | None = None
+        self._last_key = ""
+
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        items: List[Dict[str, Any]] = []
+        start = 0
+        key_start = 0
+        skip_until = 1 if self._skip_first else 0
+        self._skip_first = False
+        for match in _STRUCTURAL.finditer(text):
+            index = match.start()
+            if index < skip_until:
+                continue
+            char = match.group()
+            if self._in_string:
+                if char == "\\":
+                    skip_until = index + 2
+                    self._skip_first = skip_until > len(text)
+                elif char == '"':
+                    self._in_string = False
+                    if self._key is not None:
+                        self._last_key = "".join(self._key) + text[key_start:index]
+                        self._key = None
+                continue
+            if char == '"':
+                self._in_string = True
+                if self._wrapped and len(self._stack) == 1:
+                    self._key = []
+                    key_start = index + 1
+                continue
+
+            depth = len(self._stack)
+            if char in "{[":
+                if depth == 0:
+                    self._wrapped = char == "{"
+                    self._item_depth = None if self._wrapped else 1
+                    self._sink = self._meta if self._wrapped else None
+                    start = index
+                elif (
+                    char == "["
+                    and depth == 1
+                    and self._wrapped
+                    and self._item_depth is None
+                    and not self._items_done
+                    and self._last_key in self.keys
+                ):
+                    # Keep `"items":[` in the metadata so it still parses as an empty list.
+                    start = self._flush(text, start, index + 1)
+                    self._sink = None
+                    self._item_depth = 2
+                elif char == "{" and depth == self._item_depth:
+                    start = self._flush(text, start, index)
+                    self._sink = self._item
+                self._stack.append(char)
+                continue
+
+            if not self._stack:
+                raise ValueError("Unbalanced JSON: unexpected closing bracket")
+            self._stack.pop()
+            depth = len(self._stack)
+            if char == "}" and depth == self._item_depth and self._sink is self._item:
+                start = self._flush(text, start, index + 1)
+                items.append(json.loads("".join(self._item)))
+                self._item.clear()
+                self._sink = None
+            elif char == "]" and self._item_depth is not None and depth == self._item_depth - 1:
+                self._flush(text, start, index)
+                start = index
+                self._item_depth = None
+                self._items_done = True
+                self._sink = self._meta if self._wrapped else None
+
+        self._flush(text, start, len(text))
+        if self._key is not None:
+            self._key.append(text[key_start:])
+        return items
+
+    def close(self) -> Dict[str, Any]:
+        if self._in_string or self._stack:
+            raise ValueError("JSON document ended before it was complete")
+        if not self._wrapped:
+            return {}
+        meta = json.loads("".join(self._meta))
+        return meta if isinstance(meta, dict) else {}
+
+    def _flush(self, text: str, start: int, end: int) -> int:
+        if self._sink is not None and end > start:
+            self._sink.append(text[start:end])
+        return end
+
+
+@dataclass
+class ExportCheckpoint:
+    format: str
+    page_url: str = TRANSACTIONS_URL
+    page_params: Dict[str, Any] = field(default_factory=dict)
+    page_rows: int = 0
+    rows: int = 0
+    offset: int = 0
+
+    @classmethod
+    def load(cls, path: Path) -> "ExportCheckpoint | None":
+        try:
+            raw = json.loads(path.read_text(encoding="utf-8"))
+            return cls(**raw)
+        except FileNotFoundError:
+            return None
+        except (OSError, TypeError, ValueError) as exc:
+            LOG.warning("Ignoring unreadable export checkpoint %s: %s", path, exc)
+            return None
+
+    def save(self, path: Path) -> None:
+        atomic_write(path, json.dumps(asdict(self), ensure_ascii=False))
+
+
+@dataclass
+class ExportReport:
+    rows: int
+    pages: int
+    bytes_read: int
+    resumed: bool
+    seconds: float
+
+
+def checkpoint_path(output: Path) -> Path:
+    return output.with_name(output.name + ".checkpoint")
+
+
+def infer_format(output: Path) -> str:
+    return "ndjson" if output.suffix.lower() in {".ndjson", ".jsonl"} else "csv"
+
+
+class _RowWriter:
+    """Appends rows to ``handle`` as bytes and tracks the committed file offset."""
+
+    def __init__(self, handle: BinaryIO, fmt: str, offset: int) -> None:
+        self.handle = handle
+        self.fmt = fmt
+        self.offset = offset
+        self._buffer = io.StringIO()
+        self._csv = csv.DictWriter(self._buffer, fieldnames=CSV_FIELDS, extrasaction="ignore")
+
+    def header(self) -> None:
+        if self.fmt == "csv":
+            self._csv.writeheader()
+            self._emit()
+
+    def write(self, item: Dict[str, Any]) -> None:
+        if self.fmt == "csv":
+            self._csv.writerow(item)
+        else:
+            self._buffer.write(json.dumps(item, ensure_ascii=False, separators=(",", ":")))
+            self._buffer.write("\n")
+        self._emit()
+
+    def sync(self) -> None:
+        self.handle.flush()
+        os.fsync(self.handle.fileno())
+
+    def _emit(self) -> None:
+        data = self._buffer.getvalue().encode("utf-8")
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        self.handle.write(data)
+        self.offset += len(data)
+
+
+def export_transactions(
+    api: KursachApi,
+    output: Path,
+    *,
+    fmt: str | None = None,
+    page_size: int | None = 500,
+    checkpoint_every: int = 1000,
+    restart: bool = False,
+) -> ExportReport:
+    """Stream ``/crypto/transactions`` into ``output`` one row at a time.
+
+    Progress is checkpointed next to the output file; a later call resumes from
+    the page that was in flight, skipping the rows it had already written.
+    """
+    fmt = (fmt or infer_format(output)).lower()
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r}; use one of {', '.join(EXPORT_FORMATS)}")
+    started = time.perf_counter()
+    marker = checkpoint_path(output)
+    checkpoint = None if restart else ExportCheckpoint.load(marker)
+    if checkpoint is not None and (checkpoint.format != fmt or not output.exists()):
+        LOG.warning("Export checkpoint %s does not match %s; starting over", marker, output)
+        checkpoint = None
+    resumed = checkpoint is not None
+    if checkpoint is None:
+        params: Dict[str, Any] = {"limit": page_size} if page_size else {}
+        checkpoint = ExportCheckpoint(format=fmt, page_params=params)
+    else:
+        LOG.info("Resuming export at row %s (page %s)", checkpoint.rows, checkpoint.page_params)
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    pages = 0
+    bytes_read = 0
+    with open(output, "r+b" if resumed else "wb") as handle:
+        # Rows written after the last checkpoint may be torn; drop them and re-fetch.
+        handle.truncate(checkpoint.offset)
+        handle.seek(checkpoint.offset)
+        writer = _RowWriter(handle, fmt, checkpoint.offset)
+        if not resumed:
+            writer.header()
+            _commit(writer, checkpoint, marker)
+
+        try:
+            while True:
+                pages += 1
+                page_bytes, next_page = _export_page(api, writer, checkpoint, marker, checkpoint_every)
+                bytes_read += page_bytes
+                if next_page is None or next_page == (checkpoint.page_url, checkpoint.page_params):
+                    break
+                checkpoint.page_url, checkpoint.page_params = next_page
+                checkpoint.page_rows = 0
+                _commit(writer, checkpoint, marker)
+        except BaseException:
+            # Every row in the file is complete, so record them before bailing out.
+            _commit(writer, checkpoint, marker)
+            raise
+        writer.sync()
+    marker.unlink(missing_ok=True)
+    report = ExportReport(
+        rows=checkpoint.rows,
+        pages=pages,
+        bytes_read=bytes_read,
+        resumed=resumed,
+        seconds=time.perf_counter() - started,
+    )
+    LOG.info(
+        "Exported %s transactions to %s in %s page(s), %s bytes (%.2fs)",
+        report.rows,
+        output,
+        report.pages,
+        report.bytes_read,
+        report.seconds,
+    )
+    return report
+
+
+def _export_page(
+    api: KursachApi,
+    writer: _RowWriter,
+    checkpoint: ExportCheckpoint,
+    marker: Path,
+    checkpoint_every: int,
+) -> Tuple[int, Tuple[str, Dict[str, Any]] | None]:
+    skip = checkpoint.page_rows
+    bytes_read = 0
+    parser = JsonArrayStream()
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    with api.stream_transactions(url=checkpoint.page_url, params=checkpoint.page_params) as response:
+        link_next = response.links.get("next", {}).get("url")
+        for chunk in response.iter_bytes():
+            bytes_read += len(chunk)
+            for item in parser.feed(decoder.decode(chunk)):
+                if skip:
+                    skip -= 1
+                    continue
+                writer.write(item)
+                checkpoint.page_rows += 1
+                checkpoint.rows += 1
+                if checkpoint.rows % checkpoint_every == 0:
+                    _commit(writer, checkpoint, marker)
+    parser.feed(decoder.decode(b"", final=True))
+    return bytes_read, _next_page(parser.close(), link_next, checkpoint.page_params)
+
+
+def _commit(writer: _RowWriter, checkpoint: ExportCheckpoint, marker: Path) -> None:
+    writer.sync()
+    checkpoint.offset = writer.offset
+    checkpoint.save(marker)
+
+
+def _next_page(
+    meta: Dict[str, Any],
+    link_next: str | None,
+    params: Dict[str, Any],
+) -> Tuple[str, Dict[str, Any]] | None:
+    if link_next:
+        return link_next, {}
+    next_url = meta.get("next")
+    if isinstance(next_url, str) and next_url:
+        return next_url, {}
+    cursor = meta.get("next_cursor")
+    if cursor not in (None, ""):
+        return TRANSACTIONS_URL, {**params, "cursor": cursor}
+    return None
+
+
+__all__ = [
+    "CSV_FIELDS",
+    "EXPORT_FORMATS",
+    "ExportCheckpoint",
+    "ExportReport",
+    "JsonArrayStream",
+    "checkpoint_path",
+    "export_transactions",
+    "infer_format",
+]
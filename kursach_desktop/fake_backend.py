@@ -0,0 +1,604 @@
+"""In-process stand-in for the kursach FastAPI backend.
+
+Implements the routes the desktop client talks to with configurable latency,
+error rate and device-command backlog; POSTs carrying an ``Idempotency-Key``
+are answered once and replayed afterwards. It plugs into ``httpx`` as a transport
+(``FakeBackend.transport()`` / ``FakeBackend.async_transport()``) or can be
+served over HTTP for the real CLI::
+
+    python -m kursach_desktop.fake_backend --port 8001 --backlog 50
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+import httpx
+
+
+DEFAULT_PRICES: Dict[str, Tuple[str, str, float]] = {
+    "bitcoin": ("BTC", "Bitcoin", 64000.0),
+    "ethereum": ("ETH", "Ethereum", 3100.0),
+    "solana": ("SOL", "Solana", 145.0),
+    "cardano": ("ADA", "Cardano", 0.45),
+    "dogecoin": ("DOGE", "Dogecoin", 0.12),
+}
+
+# coingecko quotes drift slightly from coincap so source selection has something to compare.
+SOURCE_SKEW = {"coincap": 1.0, "coingecko": 1.0015}
+
+_ACK_ROUTE = re.compile(r"^/crypto/device-commands/(\d+)/ack$")
+_HISTORY_ROUTE = re.compile(r"^/crypto/history/([^/]+)$")
+
+
+@dataclass
+class FakeBackendConfig:
+    latency_seconds: float = 0.0
+    latency_jitter_seconds: float = 0.0
+    error_rate: float = 0.0
+    backlog: int = 0
+    redelivery_seconds: float = 30.0
+    email: str = "demo@example.com"
+    password: str = "demo"
+    cash_balance: float = 10_000.0
+    holdings: Dict[str, float] = field(
+        default_factory=lambda: {asset_id: 1_000.0 for asset_id in DEFAULT_PRICES}
+    )
+    seed: Optional[int] = None
+    # Synthetic trades added to the transaction history, for export/sync load tests.
+    history: int = 0
+    # Page /crypto/transactions even when the client sends no limit, like a backend with a default page size.
+    transactions_page_size: int = 0
+    # `serve` gzips bodies at least this large when the client accepts gzip (0 disables).
+    gzip_min_bytes: int = 0
+    # Requests per second across all clients before answering 429 (0 disables).
+    rate_limit: int = 0
+
+
+@dataclass
+class FakeCommand:
+    id: int
+    action: str
+    payload: Dict[str, Any]
+    target_device: str
+    target_device_id: str | None
+    created_at: float
+    delivered_at: float | None = None
+    acked_at: float | None = None
+    status: str = "PENDING"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "action": self.action,
+            "payload": self.payload,
+            "target_device": self.target_device,
+            "target_device_id": self.target_device_id,
+            "status": self.status,
+        }
+
+
+class FakeBackend:
+    def __init__(self, config: FakeBackendConfig | None = None) -> None:
+        self.config = config or FakeBackendConfig()
+        self._random = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self._tokens: set[str] = set()
+        self._commands: Dict[int, FakeCommand] = {}
+        self._next_command_id = 1
+        self._transactions: List[Dict[str, Any]] = []
+        self.cash_balance = self.config.cash_balance
+        self.holdings = dict(self.config.holdings)
+        self.request_counts: Dict[str, int] = {}
+        self.injected_errors = 0
+        self.idempotent_replays = 0
+        self.throttled = 0
+        self._quota_window = 0
+        self._quota_used = 0
+        self._idempotent: Dict[Tuple[str, str, str], httpx.Response] = {}
+        opened = time.time() - 90 * 86400
+        for asset_id, quantity in self.holdings.items():
+            symbol, _, price = DEFAULT_PRICES[asset_id]
+            self._transactions.append(
+                {
+                    "id": len(self._transactions) + 1,
+                    "asset_id": asset_id,
+                    "symbol": symbol,
+                    "type": "BUY",
+                    "quantity": quantity,
+                    "price": price * 0.9,
+                    "total": quantity * price * 0.9,
+                    "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(opened)),
+                }
+            )
+        for index in range(self.config.history):
+            asset_id = list(DEFAULT_PRICES)[index % len(DEFAULT_PRICES)]
+            symbol, _, price = DEFAULT_PRICES[asset_id]
+            side = "BUY" if index % 3 else "SELL"
+            quantity = round(self._random.uniform(0.001, 1.0), 6)
+            self._transactions.append(
+                {
+                    "id": len(self._transactions) + 1,
+                    "asset_id": asset_id,
+                    "symbol": symbol,
+                    "type": side,
+                    "quantity": quantity,
+                    "price": price,
+                    "total": quantity * price,
+                    "created_at": time.strftime(
+                        "%Y-%m-%dT%H:%M:%SZ", time.gmtime(opened + index * 60)
+                    ),
+                }
+            )
+        for index in range(self.config.backlog):
+            asset_id = list(DEFAULT_PRICES)[index % len(DEFAULT_PRICES)]
+            self.enqueue_command("EXECUTE_DESKTOP_SELL", {"asset_id": asset_id, "quantity": 0.001})
+
+    # Test/benchmark helpers
+    def issue_token(self) -> str:
+        token = f"fake-{len(self._tokens) + 1}-{self._random.getrandbits(32):08x}"
+        self._tokens.add(token)
+        return token
+
+    def enqueue_command(
+        self,
+        action: str,
+        payload: Dict[str, Any] | None = None,
+        *,
+        target_device: str = "desktop",
+        target_device_id: str | None = None,
+    ) -> int:
+        with self._lock:
+            command_id = self._next_command_id
+            self._next_command_id += 1
+            self._commands[command_id] = FakeCommand(
+                id=command_id,
+                action=action,
+                payload=payload or {},
+                target_device=target_device,
+                target_device_id=target_device_id,
+                created_at=time.perf_counter(),
+            )
+            return command_id
+
+    @property
+    def total_requests(self) -> int:
+        return sum(self.request_counts.values())
+
+    def commands(self) -> List[FakeCommand]:
+        with self._lock:
+            return list(self._commands.values())
+
+    def pending_commands(self) -> int:
+        with self._lock:
+            return sum(1 for command in self._commands.values() if command.acked_at is None)
+
+    def ack_latencies(self) -> List[float]:
+        with self._lock:
+            return [
+                command.acked_at - command.created_at
+                for command in self._commands.values()
+                if command.acked_at is not None
+            ]
+
+    # Transports
+    def transport(self) -> httpx.MockTransport:
+        def handler(request: httpx.Request) -> httpx.Response:
+            delay = self._delay()
+            if delay:
+                time.sleep(delay)
+            return self.handle(request)
+
+        return httpx.MockTransport(handler)
+
+    def async_transport(self) -> httpx.MockTransport:
+        async def handler(request: httpx.Request) -> httpx.Response:
+            delay = self._delay()
+            if delay:
+                await asyncio.sleep(delay)
+            return self.handle(request)
+
+        return httpx.MockTransport(handler)
+
+    def _delay(self) -> float:
+        jitter = self.config.latency_jitter_seconds
+        return max(0.0, self.config.latency_seconds + (self._random.uniform(-jitter, jitter) if jitter else 0.0))
+
+    # Routing
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        method = request.method.upper()
+        route = _HISTORY_ROUTE.sub("/crypto/history/{asset_id}", _ACK_ROUTE.sub("/crypto/device-commands/{id}/ack", path))
+        with self._lock:
+            self.request_counts[f"{method} {route}"] = self.request_counts.get(f"{method} {route}", 0) + 1
+            if self.config.error_rate and self._random.random() < self.config.error_rate:
+                self.injected_errors += 1
+                return _json(503, {"detail": "Injected failure"})
+            quota = self._take_quota() if self.config.rate_limit else None
+
+        if quota is None:
+            return self._idempotent_route(request, method, path)
+        remaining, reset = quota
+        headers = {
+            "ratelimit-limit": str(self.config.rate_limit),
+            "ratelimit-remaining": str(max(0, remaining)),
+            "ratelimit-reset": str(reset),
+        }
+        if remaining < 0:
+            response = _json(429, {"detail": "Rate limit exceeded"})
+            headers["retry-after"] = str(reset)
+        else:
+            response = self._idempotent_route(request, method, path)
+        response.headers.update(headers)
+        return response
+
+    def _take_quota(self) -> Tuple[int, int]:
+        """Fixed one-second window shared by all clients; returns (remaining, seconds to reset)."""
+        now = time.time()
+        window = int(now)
+        if window != self._quota_window:
+            self._quota_window, self._quota_used = window, 0
+        self._quota_used += 1
+        remaining = self.config.rate_limit - self._quota_used
+        if remaining < 0:
+            self.throttled += 1
+        return remaining, 1
+
+    def _idempotent_route(self, request: httpx.Request, method: str, path: str) -> httpx.Response:
+        key = request.headers.get("idempotency-key")
+        if method != "POST" or not key:
+            return self._route(request, method, path)
+        replay_key = (path, _bearer(request) or "", key)
+        with self._lock:
+            stored = self._idempotent.get(replay_key)
+            if stored is not None:
+                self.idempotent_replays += 1
+        if stored is not None:
+            headers = {**stored.headers, "idempotent-replayed": "true"}
+            return httpx.Response(stored.status_code, headers=headers, content=stored.content)
+        response = self._route(request, method, path)
+        # Server errors are not final, so a retry with the same key runs the request again.
+        if response.status_code < 500:
+            with self._lock:
+                self._idempotent[replay_key] = response
+        return response
+
+    def _route(self, request: httpx.Request, method: str, path: str) -> httpx.Response:
+        body = _body(request)
+        if method == "POST" and path == "/auth/login":
+            return self._login(body)
+        if not self._authorized(request):
+            return _json(401, {"detail": "Not authenticated"})
+        if method == "POST" and path == "/auth/logout":
+            self._tokens.discard(_bearer(request) or "")
+            return httpx.Response(204)
+        if method == "GET" and path == "/crypto/dashboard":
+            return self._conditional(request, self._dashboard())
+        if method == "GET" and path == "/crypto/sell/overview":
+            return self._conditional(request, self._sell_overview())
+        if method == "POST" and path == "/crypto/sell/preview":
+            return self._preview(body)
+        if method == "POST" and path == "/crypto/sell":
+            return self._sell(body)
+        if method == "GET" and path == "/crypto/transactions":
+            return self._transactions_page(dict(request.url.params))
+        if method == "GET" and path == "/crypto/device-commands/poll":
+            return self._poll(dict(request.url.params))
+        match = _HISTORY_ROUTE.match(path)
+        if method == "GET" and match:
+            return self._history(match.group(1), int(request.url.params.get("days", 1)))
+        match = _ACK_ROUTE.match(path)
+        if method == "POST" and match:
+            return self._ack(int(match.group(1)), body)
+        return _json(404, {"detail": f"No route for {method} {path}"})
+
+    def _transactions_page(self, params: Dict[str, str]) -> httpx.Response:
+        after_id = int(params.get("after_id", 0))
+        with self._lock:
+            items = [item for item in self._transactions if item["id"] > after_id]
+        limit = int(params.get("limit") or self.config.transactions_page_size)
+        if limit <= 0:
+            return _json(200, items)
+        # Cursor pagination is only used when the client (or transactions_page_size) asks for pages.
+        offset = int(params.get("cursor", 0))
+        page = items[offset : offset + limit]
+        next_cursor = str(offset + limit) if offset + limit < len(items) else None
+        return _json(200, {"items": page, "next_cursor": next_cursor, "total": len(items)})
+
+    def _history(self, asset_id: str, days: int) -> httpx.Response:
+        if asset_id not in DEFAULT_PRICES:
+            return _json(404, {"detail": f"Unknown asset {asset_id}"})
+        step = 300 if days <= 1 else 3600 if days <= 30 else 86400
+        end = int(time.time()) // step * step
+        start = end - max(1, days) * 86400
+        points = [
+            {"timestamp": timestamp * 1000, "price": history_price(asset_id, timestamp)}
+            for timestamp in range(start + step, end + 1, step)
+        ]
+        return _json(200, points)
+
+    def _authorized(self, request: httpx.Request) -> bool:
+        return _bearer(request) in self._tokens
+
+    def _login(self, body: Dict[str, Any]) -> httpx.Response:
+        if body.get("email") != self.config.email or body.get("password") != self.config.password:
+            return _json(401, {"detail": "Invalid credentials"})
+        return _json(200, {"access_token": self.issue_token(), "token_type": "bearer"})
+
+    def _price(self, asset_id: str, source: str) -> float:
+        return DEFAULT_PRICES[asset_id][2] * SOURCE_SKEW.get(source, 1.0)
+
+    def _holding(self, asset_id: str) -> Dict[str, Any]:
+        symbol, name, _ = DEFAULT_PRICES[asset_id]
+        quantity = self.holdings.get(asset_id, 0.0)
+        price = self._price(asset_id, "coincap")
+        cost_basis = price * 0.9
+        value = quantity * price
+        pnl = (price - cost_basis) * quantity
+        return {
+            "id": asset_id,
+            "symbol": symbol,
+            "name": name,
+            "quantity": quantity,
+            "current_price": price,
+            "current_value": value,
+            "avg_buy_price": cost_basis,
+            "unrealized_pnl": pnl,
+            "unrealized_pnl_pct": (pnl / (cost_basis * quantity) * 100) if quantity else 0.0,
+        }
+
+    def _sell_overview(self) -> Dict[str, Any]:
+        with self._lock:
+            holdings = [self._holding(asset_id) for asset_id, qty in self.holdings.items() if qty > 0]
+        return {"holdings": holdings, "cash_balance": self.cash_balance}
+
+    def _dashboard(self) -> Dict[str, Any]:
+        overview = self._sell_overview()
+        holdings_value = sum(item["current_value"] for item in overview["holdings"])
+        movers = [
+            {"id": asset_id, "symbol": symbol, "price": price, "change_24h": 0.0}
+            for asset_id, (symbol, _, price) in DEFAULT_PRICES.items()
+        ]
+        return {
+            "currency": "USD",
+            "portfolio_balance": holdings_value + self.cash_balance,
+            "cash_balance": self.cash_balance,
+            "market_movers": movers,
+        }
+
+    def _conditional(self, request: httpx.Request, payload: Dict[str, Any]) -> httpx.Response:
+        raw = json.dumps(payload, sort_keys=True).encode()
+        etag = '"' + hashlib.sha1(raw).hexdigest() + '"'
+        if request.headers.get("if-none-match") == etag:
+            return httpx.Response(304, headers={"etag": etag})
+        return httpx.Response(200, content=raw, headers={"content-type": "application/json", "etag": etag})
+
+    def _quote(self, body: Dict[str, Any]) -> Tuple[Dict[str, Any] | None, httpx.Response | None]:
+        asset_id = str(body.get("asset_id") or "")
+        source = str(body.get("source") or "coincap")
+        if asset_id not in DEFAULT_PRICES:
+            return None, _json(404, {"detail": f"Unknown asset {asset_id}"})
+        if source not in SOURCE_SKEW:
+            return None, _json(400, {"detail": f"Unknown price source {source}"})
+        price = self._price(asset_id, source)
+        available = self.holdings.get(asset_id, 0.0)
+        quantity = body.get("quantity")
+        if quantity is None and body.get("amount_usd") is not None:
+            quantity = float(body["amount_usd"]) / price
+        if quantity is None or float(quantity) <= 0:
+            return None, _json(422, {"detail": "quantity or amount_usd is required"})
+        quantity = float(quantity)
+        if quantity > available + 1e-12:
+            return None, _json(400, {"detail": "Insufficient quantity"})
+        symbol, name, _ = DEFAULT_PRICES[asset_id]
+        return {
+            "asset_id": asset_id,
+            "symbol": symbol,
+            "name": name,
+            "price_source": source,
+            "quantity": quantity,
+            "available_quantity": available,
+            "unit_price": price,
+            "proceeds": quantity * price,
+        }, None
+
+    def _preview(self, body: Dict[str, Any]) -> httpx.Response:
+        with self._lock:
+            quote, error = self._quote(body)
+        return error or _json(200, quote)
+
+    def _sell(self, body: Dict[str, Any]) -> httpx.Response:
+        with self._lock:
+            quote, error = self._quote(body)
+            if error is not None or quote is None:
+                return error or _json(500, {"detail": "Quote failed"})
+            asset_id = quote["asset_id"]
+            self.holdings[asset_id] -= quote["quantity"]
+            self.cash_balance += quote["proceeds"]
+            holdings_value = sum(
+                self.holdings[item] * self._price(item, "coincap") for item in self.holdings
+            )
+            transaction = {
+                "id": len(self._transactions) + 1,
+                "asset_id": asset_id,
+                "symbol": quote["symbol"],
+                "type": "SELL",
+                "quantity": quote["quantity"],
+                "price": quote["unit_price"],
+                "total": quote["proceeds"],
+                "realized_pnl": quote["proceeds"] * 0.1,
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            }
+            self._transactions.append(transaction)
+            return _json(
+                200,
+                {
+                    "asset_id": asset_id,
+                    "symbol": quote["symbol"],
+                    "quantity": quote["quantity"],
+                    "price": quote["unit_price"],
+                    "received": quote["proceeds"],
+                    "cash_balance": self.cash_balance,
+                    "total_balance": self.cash_balance + holdings_value,
+                    "realized_pnl": transaction["realized_pnl"],
+                },
+            )
+
+    def _poll(self, params: Dict[str, str]) -> httpx.Response:
+        target_device = params.get("target_device", "desktop")
+        device_id = params.get("target_device_id")
+        limit = int(params.get("limit", 10))
+        now = time.perf_counter()
+        with self._lock:
+            ready: List[Dict[str, Any]] = []
+            for command in self._commands.values():
+                if len(ready) >= limit:
+                    break
+                if command.acked_at is not None or command.target_device != target_device:
+                    continue
+                if command.target_device_id not in (None, device_id):
+                    continue
+                if command.delivered_at is not None and now - command.delivered_at < self.config.redelivery_seconds:
+                    continue
+                command.delivered_at = now
+                command.status = "DELIVERED"
+                ready.append(command.to_dict())
+        return _json(200, {"commands": ready, "polled_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())})
+
+    def _ack(self, command_id: int, body: Dict[str, Any]) -> httpx.Response:
+        with self._lock:
+            command = self._commands.get(command_id)
+            if command is None:
+                return _json(404, {"detail": "Command not found"})
+            if command.acked_at is None:
+                command.acked_at = time.perf_counter()
+            command.status = str(body.get("status") or "ACKNOWLEDGED")
+            return _json(200, command.to_dict())
+
+
+def history_price(asset_id: str, timestamp: int) -> float:
+    """Deterministic price for ``asset_id`` at ``timestamp``, so repeated history calls agree."""
+    base = DEFAULT_PRICES[asset_id][2]
+    phase = int(hashlib.sha1(asset_id.encode()).hexdigest()[:4], 16) / 0xFFFF * 2 * math.pi
+    digest = hashlib.sha1(f"{asset_id}:{timestamp}".encode()).digest()
+    noise = int.from_bytes(digest[:4], "big") / 0xFFFFFFFF - 0.5
+    day = timestamp / 86400
+    market = 0.06 * math.sin(day / 45 * 2 * math.pi)
+    own = 0.05 * math.sin(day / 12 * 2 * math.pi + phase)
+    return base * (1 + market + own + 0.04 * noise)
+
+
+def _json(status_code: int, payload: Any) -> httpx.Response:
+    return httpx.Response(status_code, json=payload)
+
+
+def _body(request: httpx.Request) -> Dict[str, Any]:
+    if not request.content:
+        return {}
+    try:
+        data = json.loads(request.content)
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _bearer(request: httpx.Request) -> str | None:
+    header = request.headers.get("authorization") or ""
+    if header.lower().startswith("bearer "):
+        return header[7:]
+    return None
+
+
+def serve(backend: FakeBackend, host: str = "127.0.0.1", port: int = 8001) -> ThreadingHTTPServer:
+    """Expose ``backend`` over plain HTTP so the real CLI can talk to it."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _dispatch(self) -> None:
+            length = int(self.headers.get("content-length") or 0)
+            content = self.rfile.read(length) if length else b""
+            parts = urlsplit(self.path)
+            request = httpx.Request(
+                self.command,
+                httpx.URL(f"http://{host}:{port}{parts.path}", params=parse_qsl(parts.query)),
+                headers=dict(self.headers.items()),
+                content=content,
+            )
+            delay = backend._delay()
+            if delay:
+                time.sleep(delay)
+            response = backend.handle(request)
+            body = response.content
+            encoding = None
+            min_bytes = backend.config.gzip_min_bytes
+            if min_bytes and len(body) >= min_bytes and "gzip" in (self.headers.get("accept-encoding") or ""):
+                body, encoding = gzip.compress(body, compresslevel=6), "gzip"
+            self.send_response(response.status_code)
+            for name, value in response.headers.items():
+                if name.lower() not in {"content-length", "transfer-encoding"}:
+                    self.send_header(name, value)
+            if encoding:
+                self.send_header("content-encoding", encoding)
+                self.send_header("vary", "accept-encoding")
+            self.send_header("content-length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        do_GET = do_POST = _dispatch
+
+        def log_message(self, format: str, *args: Any) -> None:
+            return
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Run the fake kursach backend over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.0, help="Per-request latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument("--backlog", type=int, default=0, help="EXECUTE_DESKTOP_SELL commands to pre-queue")
+    parser.add_argument("--history", type=int, default=0, help="Synthetic trades to add to /crypto/transactions")
+    parser.add_argument("--rate-limit", type=int, default=0, help="Requests per second before answering 429")
+    parser.add_argument("--gzip-min-bytes", type=int, default=0, help="Gzip response bodies of at least this size")
+    args = parser.parse_args(argv)
+    backend = FakeBackend(
+        FakeBackendConfig(
+            latency_seconds=args.latency,
+            error_rate=args.error_rate,
+            backlog=args.backlog,
+            history=args.history,
+            gzip_min_bytes=args.gzip_min_bytes,
+            rate_limit=args.rate_limit,
+        )
+    )
+    server = serve(backend, args.host, args.port)
+    print(f"Fake backend on http://{args.host}:{args.port} (login {backend.config.email} / {backend.config.password})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+__all__ = ["FakeBackend", "FakeBackendConfig", "FakeCommand", "serve"]
+
+
+if __name__ == "__main__":
+    main()
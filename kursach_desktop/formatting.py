@@ -0,0 +1,22 @@
+from __future__ import annotations
+
+from typing import Any
+
+
+def format_money(value: Any) -> str:
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return str(value)
+    return f"{number:,.2f}"
+
+
+def format_quantity(value: Any) -> str:
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return str(value)
+    return f"{number:,.6f}".rstrip("0").rstrip(".")
+
+
+__all__ = ["format_money", "format_quantity"]
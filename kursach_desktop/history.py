@@ -0,0 +1,315 @@
+"""Memory-mapped on-disk cache for ``/crypto/history/{asset_id}``."""
+
+from __future__ import annotations
+
+import bisect
+import logging
+import math
+import mmap
+import os
+import re
+import struct
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Iterator, List, Sequence, Tuple
+
+from .config import DEFAULT_HISTORY_DIR, AppConfig
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+LOG = logging.getLogger(__name__)
+
+MAGIC = b"KPH1"
+VERSION = 1
+HEADER = struct.Struct("<4sHxxqqq")  # magic, version, step_ms, covered_from_ms, count
+RECORD = struct.Struct("<qd")  # timestamp_ms, price; one file per asset and resolution
+DAY_MS = 86_400_000
+
+# memoryview casts below use native byte order; the file format is little-endian.
+_NATIVE_LE = sys.byteorder == "little"
+_SAFE_NAME = re.compile(r"[^A-Za-z0-9_.-]")
+
+
+def history_resolution(days: int) -> int:
+    """Sampling step (seconds) the backend uses for a ``days`` range, mirroring CoinGecko."""
+    if days <= 1:
+        return 300
+    if days <= 30:
+        return 3600
+    return 86400
+
+
+class PriceHistory:
+    """Read-only view of ``count`` records starting at ``start`` in a mapped file or a bytes buffer."""
+
+    def __init__(self, asset_id: str, buffer: Any, start: int, count: int, *, step_ms: int = 0) -> None:
+        self.asset_id = asset_id
+        self.step_ms = step_ms
+        self._buffer = buffer
+        self._start = start
+        self._count = count
+
+    @classmethod
+    def from_points(cls, asset_id: str, points: Any) -> "PriceHistory":
+        records = normalize_points(points)
+        return cls(asset_id, _pack(records), 0, len(records))
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator[Tuple[int, float]]:
+        offset = self._offset
+        for index in range(self._count):
+            yield RECORD.unpack_from(self._buffer, offset + index * RECORD.size)
+
+    @property
+    def _offset(self) -> int:
+        return (HEADER.size if isinstance(self._buffer, mmap.mmap) else 0) + self._start * RECORD.size
+
+    @property
+    def first_timestamp(self) -> int | None:
+        return RECORD.unpack_from(self._buffer, self._offset)[0] if self._count else None
+
+    @property
+    def last(self) -> Tuple[int, float] | None:
+        return RECORD.unpack_from(self._buffer, self._offset + (self._count - 1) * RECORD.size) if self._count else None
+
+    def to_points(self) -> List[dict]:
+        """Same shape as the API response: ``[{"timestamp": ms, "price": ...}, ...]``."""
+        return [{"timestamp": timestamp, "price": price} for timestamp, price in self]
+
+    def arrays(self) -> Tuple["np.ndarray", "np.ndarray"]:
+        """Zero-copy NumPy views ``(timestamps_ms, prices)`` over the mapped records."""
+        import numpy as np
+
+        records = np.frombuffer(
+            self._buffer,
+            dtype=np.dtype([("timestamp", "<i8"), ("price", "<f8")]),
+            count=self._count,
+            offset=self._offset,
+        )
+        return records["timestamp"], records["price"]
+
+    def close(self) -> None:
+        if isinstance(self._buffer, mmap.mmap):
+            try:
+                self._buffer.close()
+            except BufferError:
+                # NumPy views still reference the map; it is released with them.
+                pass
+
+
+class HistoryStore:
+    def __init__(self, directory: Path) -> None:
+        self.directory = directory
+        self.fetches = 0
+        self.fetched_points = 0
+        self._lock = threading.Lock()
+
+    def path_for(self, asset_id: str, days: int) -> Path:
+        return self.directory / f"{_SAFE_NAME.sub('_', asset_id)}-{history_resolution(days)}s.bin"
+
+    def missing_days(self, asset_id: str, days: int, *, now: float | None = None) -> int:
+        """Days of history to request so the stored series covers ``days`` up to now (0 = up to date)."""
+        now_ms = int((time.time() if now is None else now) * 1000)
+        header = self._read_header(self.path_for(asset_id, days))
+        if header is None:
+            return days
+        step_ms, covered_from, count, last_ts = header
+        if not count or covered_from > now_ms - days * DAY_MS + step_ms:
+            # The head of the requested range was never fetched; start over.
+            return days
+        behind = now_ms - last_ts
+        if behind < step_ms:
+            return 0
+        return min(days, max(1, math.ceil(behind / DAY_MS)))
+
+    def merge(self, asset_id: str, days: int, points: Any, *, fetched_days: int, now: float | None = None) -> int:
+        """Store ``points`` fetched for ``fetched_days``; returns how many records were added."""
+        now_ms = int((time.time() if now is None else now) * 1000)
+        records = normalize_points(points)
+        self.fetches += 1
+        self.fetched_points += len(records)
+        path = self.path_for(asset_id, days)
+        with self._lock:
+            header = self._read_header(path)
+            if header is None or fetched_days >= days:
+                step_ms = _median_step(records) or history_resolution(days) * 1000
+                covered_from = now_ms - fetched_days * DAY_MS
+                if header is not None:
+                    covered_from = min(covered_from, header[1])
+                _write_file(path, step_ms, covered_from, records)
+                return len(records)
+            step_ms, covered_from, count, last_ts = header
+            fresh = _thin(records, last_ts, step_ms)
+            if fresh:
+                _append(path, count, fresh)
+            return len(fresh)
+
+    def read(self, asset_id: str, days: int, *, now: float | None = None) -> PriceHistory:
+        now_ms = int((time.time() if now is None else now) * 1000)
+        path = self.path_for(asset_id, days)
+        with self._lock:
+            header = self._read_header(path)
+            if header is None or not header[2]:
+                return PriceHistory(asset_id, b"", 0, 0)
+            step_ms, _, count, _ = header
+            with open(path, "rb") as handle:
+                mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        start = bisect.bisect_left(_Timestamps(mapped, count), now_ms - days * DAY_MS)
+        return PriceHistory(asset_id, mapped, start, count - start, step_ms=step_ms)
+
+    def clear(self) -> None:
+        with self._lock:
+            for path in self.directory.glob("*.bin"):
+                path.unlink(missing_ok=True)
+
+    @staticmethod
+    def _read_header(path: Path) -> Tuple[int, int, int, int] | None:
+        try:
+            with open(path, "rb") as handle:
+                raw = handle.read(HEADER.size)
+                magic, version, step_ms, covered_from, count = HEADER.unpack(raw)
+                if magic != MAGIC or version != VERSION:
+                    raise ValueError(f"unsupported header {magic!r} v{version}")
+                size = os.fstat(handle.fileno()).st_size
+                count = min(count, (size - HEADER.size) // RECORD.size)
+                last_ts = 0
+                if count:
+                    handle.seek(HEADER.size + (count - 1) * RECORD.size)
+                    last_ts = RECORD.unpack(handle.read(RECORD.size))[0]
+                return step_ms, covered_from, count, last_ts
+        except FileNotFoundError:
+            return None
+        except (OSError, struct.error, ValueError) as exc:
+            LOG.warning("Discarding unreadable history file %s: %s", path, exc)
+            return None
+
+
+class _Timestamps(Sequence[int]):
+    """Timestamp column of a mapped file, indexable for ``bisect``."""
+
+    def __init__(self, mapped: mmap.mmap, count: int) -> None:
+        self._count = count
+        self._view = memoryview(mapped)[HEADER.size : HEADER.size + count * RECORD.size].cast("q") if _NATIVE_LE else None
+        self._mapped = mapped
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index: Any) -> Any:
+        if self._view is not None:
+            return self._view[index * 2]
+        return RECORD.unpack_from(self._mapped, HEADER.size + index * RECORD.size)[0]
+
+
+def parse_timestamp(value: Any) -> float | None:
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        # Millisecond epochs are common in JS backends.
+        return float(value) / 1000 if value > 1e11 else float(value)
+    try:
+        parsed = datetime.fromisoformat(str(value).strip().replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def normalize_points(points: Any) -> List[Tuple[int, float]]:
+    """Parse an API history payload into sorted, de-duplicated ``(timestamp_ms, price)`` records."""
+    if isinstance(points, dict):
+        points = points.get("prices") or points.get("history") or []
+    if not isinstance(points, list):
+        return []
+    records: dict[int, float] = {}
+    for point in points:
+        if isinstance(point, dict):
+            raw_time, raw_price = point.get("timestamp", point.get("time")), point.get("price")
+        elif isinstance(point, (list, tuple)) and len(point) >= 2:
+            raw_time, raw_price = point[0], point[1]
+        else:
+            continue
+        seconds = parse_timestamp(raw_time)
+        try:
+            price = float(raw_price)
+        except (TypeError, ValueError):
+            continue
+        if seconds is None or not price > 0:
+            continue
+        records[int(round(seconds * 1000))] = price
+    return sorted(records.items())
+
+
+def build_history_store(config: AppConfig) -> HistoryStore | None:
+    if not config.history_cache_enabled:
+        return None
+    return HistoryStore(Path(config.history_cache_dir) if config.history_cache_dir else DEFAULT_HISTORY_DIR)
+
+
+def _median_step(records: Sequence[Tuple[int, float]]) -> int:
+    if len(records) < 2:
+        return 0
+    gaps = sorted(b[0] - a[0] for a, b in zip(records, records[1:]))
+    return gaps[len(gaps) // 2]
+
+
+def _thin(records: Sequence[Tuple[int, float]], last_ts: int, step_ms: int) -> List[Tuple[int, float]]:
+    # A short tail request may come back at a finer resolution; keep the file's spacing.
+    kept: List[Tuple[int, float]] = []
+    for timestamp, price in records:
+        if timestamp - last_ts >= step_ms:
+            kept.append((timestamp, price))
+            last_ts = timestamp
+    return kept
+
+
+def _pack(records: Sequence[Tuple[int, float]]) -> bytes:
+    return b"".join(RECORD.pack(timestamp, price) for timestamp, price in records)
+
+
+def _write_file(path: Path, step_ms: int, covered_from: int, records: Sequence[Tuple[int, float]]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            handle.write(HEADER.pack(MAGIC, VERSION, step_ms, covered_from, len(records)))
+            handle.write(_pack(records))
+        os.replace(tmp_name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except OSError:
+            pass
+        raise
+
+
+def _append(path: Path, count: int, records: Sequence[Tuple[int, float]]) -> None:
+    with open(path, "r+b") as handle:
+        handle.seek(HEADER.size + count * RECORD.size)
+        handle.write(_pack(records))
+        handle.truncate()
+        handle.flush()
+        # Publish the new records only once they are in the file.
+        handle.seek(0)
+        magic, version, step_ms, covered_from, _ = HEADER.unpack(handle.read(HEADER.size))
+        handle.seek(0)
+        handle.write(HEADER.pack(magic, version, step_ms, covered_from, count + len(records)))
+
+
+__all__ = [
+    "HistoryStore",
+    "PriceHistory",
+    "build_history_store",
+    "history_resolution",
+    "normalize_points",
+    "parse_timestamp",
+]
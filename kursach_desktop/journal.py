@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from .config import DEFAULT_JOURNAL_PATH
+
+
+LOG = logging.getLogger(__name__)
+
+RECEIVED = "received"
+STARTED = "started"
+EXECUTED = "executed"
+ACKED = "acked"
+
+# Safe to run twice: they only read the portfolio or store a token.
+RERUNNABLE_ACTIONS = frozenset({"LOGIN_ON_DESKTOP", "OPEN_DESKTOP_DASHBOARD"})
+
+
+@dataclass
+class JournalRecord:
+    command_id: int
+    event: str
+    status: str | None = None
+    updated_at: float = 0.0
+    action: str | None = None
+
+    @property
+    def executed(self) -> bool:
+        return self.event in {EXECUTED, ACKED}
+
+    @property
+    def in_doubt(self) -> bool:
+        # Started but never finished: the side effects may or may not have happened.
+        return self.event == STARTED
+
+
+class CommandJournal:
+    """Append-only, fsync'd log of command lifecycle events.
+
+    Every event is one JSON line. The journal is replayed into an in-memory
+    index on open and rewritten with only the latest event per command once
+    it has grown past ``compact_after`` lines.
+    """
+
+    def __init__(
+        self,
+        path: Path | None = None,
+        *,
+        compact_after: int = 5000,
+        retain_acked: int = 1000,
+        rerun_sells: bool = False,
+    ) -> None:
+        self.path = Path(path) if path else DEFAULT_JOURNAL_PATH
+        # Only when the backend dedupes Idempotency-Key (AppConfig.backend_idempotency).
+        self.rerun_sells = rerun_sells
+        self.compact_after = compact_after
+        self.retain_acked = retain_acked
+        self._lock = threading.Lock()
+        self._index: Dict[int, JournalRecord] = {}
+        self._lines = 0
+        self._replay()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._handle = open(self.path, "a", encoding="utf-8")
+
+    def _replay(self) -> None:
+        if not self.path.exists():
+            return
+        good_bytes = 0
+        with open(self.path, "rb") as handle:
+            for raw_line in handle:
+                if not raw_line.endswith(b"\n"):
+                    # Torn final write from a crash: drop it so the next append starts clean.
+                    LOG.warning("Discarding incomplete trailing entry in %s", self.path)
+                    break
+                good_bytes += len(raw_line)
+                self._lines += 1
+                try:
+                    entry = json.loads(raw_line)
+                    command_id = int(entry["id"])
+                except (ValueError, KeyError, TypeError):
+                    LOG.warning("Skipping malformed journal line in %s", self.path)
+                    continue
+                self._apply(
+                    command_id, entry.get("event"), entry.get("status"), entry.get("ts", 0.0), entry.get("action")
+                )
+        if good_bytes != self.path.stat().st_size:
+            with open(self.path, "r+b") as handle:
+                handle.truncate(good_bytes)
+        LOG.debug("Replayed %s journal entries for %s commands", self._lines, len(self._index))
+
+    def _apply(
+        self, command_id: int, event: str | None, status: str | None, ts: float, action: str | None = None
+    ) -> None:
+        record = self._index.get(command_id)
+        if record is None:
+            record = JournalRecord(command_id, event or RECEIVED)
+            self._index[command_id] = record
+        elif event == RECEIVED and record.event != RECEIVED:
+            # Redelivery of a command we already know about must not reset its progress.
+            return
+        record.event = event or record.event
+        record.status = status or record.status
+        record.action = action or record.action
+        record.updated_at = ts
+
+    def get(self, command_id: Any) -> JournalRecord | None:
+        try:
+            return self._index.get(int(command_id))
+        except (TypeError, ValueError):
+            return None
+
+    def record(self, command_id: Any, event: str, status: str | None = None, action: str | None = None) -> None:
+        try:
+            numeric_id = int(command_id)
+        except (TypeError, ValueError):
+            return
+        ts = time.time()
+        entry: Dict[str, Any] = {"id": numeric_id, "event": event, "ts": ts}
+        if status is not None:
+            entry["status"] = status
+        if action is not None:
+            entry["action"] = action
+        with self._lock:
+            self._handle.write(json.dumps(entry, separators=(",", ":")) + "\n")
+            self._handle.flush()
+            os.fsync(self._handle.fileno())
+            self._lines += 1
+            self._apply(numeric_id, event, status, ts, action)
+            # Compact only when it actually shrinks the file noticeably.
+            if self._lines >= max(self.compact_after, 2 * len(self._index)):
+                self._compact()
+
+    def admit(self, command_id: Any) -> str | None:
+        """Record receipt of ``command_id``.
+
+        Returns ``None`` when the command should be executed, or the ACK status
+        to re-send when it was already executed (or interrupted mid-way, which
+        is reported as FAILED rather than risking a second execution).
+        """
+        record = self.get(command_id)
+        if record is not None and record.in_doubt:
+            if self._rerunnable(record):
+                LOG.warning("Command %s was interrupted before it finished; executing it again", command_id)
+                return None
+            self.record(command_id, EXECUTED, "FAILED")
+            return "FAILED"
+        if record is not None and record.executed:
+            return record.status or "FAILED"
+        self.record(command_id, RECEIVED)
+        return None
+
+    def recover(self) -> List[Tuple[int, str]]:
+        """Return ``(command_id, status)`` for every command whose ACK never went out."""
+        with self._lock:
+            in_doubt = [
+                record.command_id
+                for record in self._index.values()
+                if record.in_doubt and not self._rerunnable(record)
+            ]
+        for command_id in in_doubt:
+            LOG.warning("Command %s was interrupted before it finished; reporting it as FAILED", command_id)
+            self.record(command_id, EXECUTED, "FAILED")
+        with self._lock:
+            return sorted(
+                (record.command_id, record.status or "FAILED")
+                for record in self._index.values()
+                if record.event == EXECUTED
+            )
+
+    def _rerunnable(self, record: JournalRecord) -> bool:
+        # Interactive sells are never re-run: the user could pick a different amount the second time.
+        action = (record.action or "").upper()
+        if action in RERUNNABLE_ACTIONS:
+            return True
+        return self.rerun_sells and action == "EXECUTE_DESKTOP_SELL"
+
+    def compact(self) -> None:
+        with self._lock:
+            self._compact()
+
+    def _compact(self) -> None:
+        acked = sorted(
+            (record for record in self._index.values() if record.event == ACKED),
+            key=lambda record: record.updated_at,
+        )
+        for record in acked[: max(0, len(acked) - self.retain_acked)]:
+            del self._index[record.command_id]
+
+        fd, tmp_name = tempfile.mkstemp(prefix=f".{self.path.name}.", suffix=".tmp", dir=self.path.parent)
+        with os.fdopen(fd, "w", encoding="utf-8") as handle:
+            for record in sorted(self._index.values(), key=lambda item: item.command_id):
+                entry: Dict[str, Any] = {"id": record.command_id, "event": record.event, "ts": record.updated_at}
+                if record.status is not None:
+                    entry["status"] = record.status
+                if record.action is not None:
+                    entry["action"] = record.action
+                handle.write(json.dumps(entry, separators=(",", ":")) + "\n")
+            handle.flush()
+            os.fsync(handle.fileno())
+        self._handle.close()
+        os.replace(tmp_name, self.path)
+        self._handle = open(self.path, "a", encoding="utf-8")
+        self._lines = len(self._index)
+        LOG.debug("Compacted command journal to %s entries", self._lines)
+
+    def close(self) -> None:
+        with self._lock:
+            self._handle.close()
+
+
+__all__ = [
+    "ACKED",
+    "CommandJournal",
+    "EXECUTED",
+    "JournalRecord",
+    "RECEIVED",
+    "RERUNNABLE_ACTIONS",
+    "STARTED",
+]
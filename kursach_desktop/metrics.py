@@ -0,0 +1,320 @@
+from __future__ import annotations
+
+import bisect
+import logging
+import re
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+from urllib.parse import urlsplit
+
+from .config import AppConfig
+from .state import atomic_write
+
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_LATENCY_BUCKETS: Tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Path parameters that are not plain numbers still need a template of their own.
+ROUTE_TEMPLATES: Tuple[Tuple["re.Pattern[str]", str], ...] = (
+    (re.compile(r"^/crypto/history/[^/]+$"), "/crypto/history/{asset_id}"),
+)
+_NUMERIC_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+Labels = Tuple[str, ...]
+
+
+@lru_cache(maxsize=1024)
+def route_template(url: str) -> str:
+    """``/crypto/device-commands/42/ack`` -> ``/crypto/device-commands/{id}/ack``; queries are dropped."""
+    path = urlsplit(url).path or "/"
+    for pattern, template in ROUTE_TEMPLATES:
+        if pattern.match(path):
+            return template
+    return _NUMERIC_SEGMENT.sub("/{id}", path)
+
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """Counters and latency histograms for backend calls and device commands, in Prometheus text format."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS) -> None:
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._latency: Dict[Labels, Histogram] = {}
+        self._responses: Dict[Labels, int] = {}
+        self._network_errors: Dict[Labels, int] = {}
+        self._sent: Dict[Labels, int] = {}
+        self._received: Dict[Labels, int] = {}
+        self._commands: Dict[Labels, int] = {}
+        self._connections: Dict[Labels, int] = {}
+        self._body_bytes: Dict[Labels, int] = {}
+        self._retries: Dict[Labels, int] = {}
+        self._circuit_rejections: Dict[Labels, int] = {}
+        self._coalesced: Dict[Labels, int] = {}
+        self._rate_limit_wait: Dict[Labels, Histogram] = {}
+
+    def observe_request(
+        self,
+        method: str,
+        url: str,
+        status: int,
+        seconds: float,
+        *,
+        sent: int = 0,
+        received: int = 0,
+    ) -> None:
+        key = (method.upper(), route_template(url))
+        with self._lock:
+            histogram = self._latency.get(key)
+            if histogram is None:
+                histogram = self._latency[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+            _increment(self._responses, (*key, str(status)))
+            _increment(self._sent, key, sent)
+            _increment(self._received, key, received)
+
+    def observe_network_error(self, method: str, url: str, error: BaseException) -> None:
+        with self._lock:
+            _increment(self._network_errors, (method.upper(), route_template(url), type(error).__name__))
+
+    def observe_connection(self, http_version: str, *, reused: bool) -> None:
+        with self._lock:
+            _increment(self._connections, (http_version, "reused" if reused else "new"))
+
+    def observe_body(self, encoding: str, wire: int, decoded: int) -> None:
+        """Response body size as transferred (``wire``) and after Content-Encoding was undone."""
+        with self._lock:
+            _increment(self._body_bytes, (encoding.lower(), "wire"), wire)
+            _increment(self._body_bytes, (encoding.lower(), "decoded"), decoded)
+
+    def observe_retry(self, method: str, url: str, status: int) -> None:
+        with self._lock:
+            _increment(self._retries, (method.upper(), route_template(url), str(status)))
+
+    def observe_circuit_rejection(self, method: str, url: str) -> None:
+        with self._lock:
+            _increment(self._circuit_rejections, (method.upper(), route_template(url)))
+
+    def observe_coalesced(self, method: str, url: str) -> None:
+        with self._lock:
+            _increment(self._coalesced, (method.upper(), route_template(url)))
+
+    def observe_rate_limit_wait(self, method: str, url: str, seconds: float) -> None:
+        key = (method.upper(), route_template(url))
+        with self._lock:
+            histogram = self._rate_limit_wait.get(key)
+            if histogram is None:
+                histogram = self._rate_limit_wait[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def observe_command(self, action: object, outcome: str) -> None:
+        with self._lock:
+            _increment(self._commands, (str(action or "UNKNOWN").upper(), outcome))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            _histogram_family(
+                lines,
+                "kursach_http_request_duration_seconds",
+                "Latency of backend HTTP requests by method and route template.",
+                self._latency,
+            )
+            _histogram_family(
+                lines,
+                "kursach_http_rate_limit_wait_seconds",
+                "Time backend requests waited in the client-side rate limiter before being sent.",
+                self._rate_limit_wait,
+            )
+            _counter_family(
+                lines,
+                "kursach_http_responses_total",
+                "Backend HTTP responses by status code.",
+                ("method", "route", "status"),
+                self._responses,
+            )
+            _counter_family(
+                lines,
+                "kursach_http_network_errors_total",
+                "Backend requests that failed without an HTTP response.",
+                ("method", "route", "error"),
+                self._network_errors,
+            )
+            _counter_family(
+                lines,
+                "kursach_http_request_bytes_total",
+                "Request body bytes sent to the backend.",
+                ("method", "route"),
+                self._sent,
+            )
+            _counter_family(
+                lines,
+                "kursach_http_response_bytes_total",
+                "Response bytes received from the backend, as sent on the wire.",
+                ("method", "route"),
+                self._received,
+            )
+            _counter_family(
+                lines,
+                "kursach_http_connections_total",
+                "Backend requests by HTTP version and whether they opened a connection or reused a pooled one.",
+                ("http_version", "connection"),
+                self._connections,
+            )
+            _counter_family(
+                lines,
+                "kursach_http_body_bytes_total",
+                "Response body bytes by Content-Encoding, as transferred and after decompression.",
+                ("encoding", "form"),
+                self._body_bytes,
+            )
+            _counter_family(
+                lines,
+                "kursach_http_retries_total",
+                "Backend requests sent again after a retryable failure, by the failed attempt's status.",
+                ("method", "route", "status"),
+                self._retries,
+            )
+            _counter_family(
+                lines,
+                "kursach_http_circuit_rejections_total",
+                "Backend requests refused locally because the circuit breaker was open.",
+                ("method", "route"),
+                self._circuit_rejections,
+            )
+            _counter_family(
+                lines,
+                "kursach_http_coalesced_total",
+                "Backend GETs answered by an identical request already in flight instead of a new one.",
+                ("method", "route"),
+                self._coalesced,
+            )
+            _counter_family(
+                lines,
+                "kursach_device_commands_total",
+                "Device commands handled by the poller by action and outcome.",
+                ("action", "outcome"),
+                self._commands,
+            )
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: Path) -> None:
+        atomic_write(path, self.render())
+        LOG.info("Wrote metrics to %s", path)
+
+
+class MetricsServer:
+    """Serves ``GET /metrics`` from a daemon thread."""
+
+    def __init__(self, registry: MetricsRegistry, host: str = "127.0.0.1", port: int = 9464) -> None:
+        from http.server import ThreadingHTTPServer
+
+        self._server = ThreadingHTTPServer((host, port), _metrics_handler(registry))
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics", daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/metrics"
+
+    def start(self) -> "MetricsServer":
+        self._thread.start()
+        LOG.info("Serving metrics on %s", self.url)
+        return self
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def _metrics_handler(registry: MetricsRegistry) -> type:
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:  # noqa: N802 - http.server naming
+            if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: object) -> None:
+            LOG.debug("metrics: " + format, *args)
+
+    return MetricsHandler
+
+
+def build_metrics(config: AppConfig) -> MetricsRegistry | None:
+    if not config.metrics_port and not config.metrics_file:
+        return None
+    return MetricsRegistry()
+
+
+def _increment(counters: Dict[Labels, int], key: Labels, amount: int = 1) -> None:
+    counters[key] = counters.get(key, 0) + amount
+
+
+def _label_set(names: Sequence[str], values: Sequence[str]) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _counter_family(
+    lines: List[str],
+    name: str,
+    help_text: str,
+    label_names: Sequence[str],
+    counters: Dict[Labels, int],
+) -> None:
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} counter")
+    for key in sorted(counters):
+        lines.append(f"{name}{{{_label_set(label_names, key)}}} {counters[key]}")
+
+
+def _histogram_family(lines: List[str], name: str, help_text: str, histograms: Dict[Labels, Histogram]) -> None:
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for key in sorted(histograms):
+        histogram = histograms[key]
+        labels = _label_set(("method", "route"), key)
+        cumulative = 0
+        for bound, count in zip((*histogram.buckets, float("inf")), histogram.counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f'{name}_bucket{{{labels},le="{le}"}} {cumulative}')
+        lines.append(f"{name}_sum{{{labels}}} {histogram.total!r}")
+        lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+
+
+__all__ = [
+    "DEFAULT_LATENCY_BUCKETS",
+    "MetricsRegistry",
+    "MetricsServer",
+    "build_metrics",
+    "route_template",
+]
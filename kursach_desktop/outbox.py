@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from typing import Callable, Dict, List, Set, Tuple
+
+from .api import ApiError, AsyncKursachApi, KursachApi
+from .journal import ACKED, CommandJournal
+
+
+LOG = logging.getLogger(__name__)
+
+
+def is_retryable(exc: ApiError) -> bool:
+    return exc.status_code in {-1, 408, 425, 429} or exc.status_code >= 500
+
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float) -> float:
+    delay = min(max_delay, base_delay * 2 ** (attempt - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+class AckOutbox:
+    """Background sender for command ACKs; unsent ones stay ``executed`` in the journal for the next start."""
+
+    def __init__(
+        self,
+        api: KursachApi,
+        *,
+        journal: CommandJournal | None = None,
+        workers: int = 4,
+        max_attempts: int = 8,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+        on_error: Callable[[int, ApiError], None] | None = None,
+    ) -> None:
+        self.api = api
+        self.journal = journal
+        self.workers = max(1, workers)
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.on_error = on_error
+        self.sent = 0
+        self.retries = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self._queue: List[Tuple[float, int, int, str, int]] = []
+        self._active: Set[Tuple[int, str]] = set()
+        self._sequence = itertools.count()
+        self._in_flight = 0
+        self._condition = threading.Condition()
+        self._closing = False
+        self._threads: List[threading.Thread] = []
+
+    @property
+    def pending(self) -> int:
+        with self._condition:
+            return len(self._queue) + self._in_flight
+
+    def start(self) -> None:
+        if self._threads:
+            return
+        self._closing = False
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"ack-outbox-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, command_id: int, status: str) -> None:
+        with self._condition:
+            if (command_id, status) in self._active:
+                self.coalesced += 1
+                return
+            self._active.add((command_id, status))
+        self._push(time.monotonic(), command_id, status, 1)
+
+    def _push(self, due: float, command_id: int, status: str, attempt: int) -> None:
+        with self._condition:
+            heapq.heappush(self._queue, (due, next(self._sequence), command_id, status, attempt))
+            self._condition.notify()
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Stop accepting retries and give queued ACKs up to ``timeout`` seconds to drain."""
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while (self._queue or self._in_flight) and time.monotonic() < deadline:
+                self._condition.wait(timeout=min(0.1, max(0.0, deadline - time.monotonic())))
+            self._closing = True
+            left = len(self._queue) + self._in_flight
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=1.0)
+        self._threads = []
+        if left:
+            LOG.warning("%s ACKs still pending at shutdown; they will be re-sent on next start", left)
+
+    def _worker(self) -> None:
+        while True:
+            with self._condition:
+                while not self._closing:
+                    if self._queue and self._queue[0][0] <= time.monotonic():
+                        break
+                    wait_for = self._queue[0][0] - time.monotonic() if self._queue else None
+                    self._condition.wait(timeout=wait_for)
+                if self._closing:
+                    return
+                _, _, command_id, status, attempt = heapq.heappop(self._queue)
+                self._in_flight += 1
+            try:
+                self._deliver(command_id, status, attempt)
+            except Exception:
+                LOG.exception("Unexpected error while sending ACK for command %s", command_id)
+            finally:
+                with self._condition:
+                    self._in_flight -= 1
+                    self._condition.notify_all()
+
+    def _deliver(self, command_id: int, status: str, attempt: int) -> None:
+        requeued = False
+        try:
+            self.api.acknowledge_command(command_id, status)
+        except ApiError as exc:
+            if is_retryable(exc) and attempt < self.max_attempts:
+                self.retries += 1
+                delay = backoff_delay(attempt, self.base_delay, self.max_delay)
+                LOG.warning("ACK for command %s failed (%s); retrying in %.1fs", command_id, exc, delay)
+                self._push(time.monotonic() + delay, command_id, status, attempt + 1)
+                requeued = True
+                return
+            self.dropped += 1
+            LOG.error("Giving up on ACK for command %s after %s attempts: %s", command_id, attempt, exc)
+            if self.on_error is not None:
+                self.on_error(command_id, exc)
+        else:
+            self.sent += 1
+            if self.journal is not None:
+                self.journal.record(command_id, ACKED, status)
+        finally:
+            # Unless it was queued again, a later submit for this ACK must not be coalesced away.
+            if not requeued:
+                self._settle(command_id, status)
+
+    def _settle(self, command_id: int, status: str) -> None:
+        with self._condition:
+            self._active.discard((command_id, status))
+
+
+class AsyncAckOutbox:
+    """Event-loop counterpart of :class:`AckOutbox`, with the same coalescing."""
+
+    def __init__(
+        self,
+        api: AsyncKursachApi,
+        *,
+        journal: CommandJournal | None = None,
+        workers: int = 4,
+        max_attempts: int = 8,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+        on_error: Callable[[int, ApiError], None] | None = None,
+    ) -> None:
+        self.api = api
+        self.journal = journal
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.on_error = on_error
+        self.sent = 0
+        self.retries = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.workers = max(1, workers)
+        # Created by the first submit, on the loop that delivers the ACKs.
+        self._workers: asyncio.Semaphore | None = None
+        self._tasks: Dict[Tuple[int, str], asyncio.Task[None]] = {}
+
+    @property
+    def pending(self) -> int:
+        return len(self._tasks)
+
+    def submit(self, command_id: int, status: str) -> None:
+        key = (command_id, status)
+        if key in self._tasks:
+            self.coalesced += 1
+            return
+        if self._workers is None:
+            self._workers = asyncio.Semaphore(self.workers)
+        task = asyncio.get_running_loop().create_task(self._deliver(command_id, status))
+        self._tasks[key] = task
+        task.add_done_callback(lambda _: self._tasks.pop(key, None))
+
+    async def close(self, timeout: float = 10.0) -> None:
+        if not self._tasks:
+            return
+        _, still_pending = await asyncio.wait(set(self._tasks.values()), timeout=timeout)
+        for task in still_pending:
+            task.cancel()
+        if still_pending:
+            LOG.warning("%s ACKs still pending at shutdown; they will be re-sent on next start", len(still_pending))
+
+    async def _deliver(self, command_id: int, status: str) -> None:
+        assert self._workers is not None
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                async with self._workers:
+                    await self.api.acknowledge_command(command_id, status)
+            except ApiError as exc:
+                if is_retryable(exc) and attempt < self.max_attempts:
+                    self.retries += 1
+                    delay = backoff_delay(attempt, self.base_delay, self.max_delay)
+                    LOG.warning("ACK for command %s failed (%s); retrying in %.1fs", command_id, exc, delay)
+                    await asyncio.sleep(delay)
+                    continue
+                self.dropped += 1
+                LOG.error("Giving up on ACK for command %s after %s attempts: %s", command_id, attempt, exc)
+                if self.on_error is not None:
+                    self.on_error(command_id, exc)
+                return
+            self.sent += 1
+            if self.journal is not None:
+                await asyncio.to_thread(self.journal.record, command_id, ACKED, status)
+            return
+
+
+__all__ = ["AckOutbox", "AsyncAckOutbox", "backoff_delay", "is_retryable"]
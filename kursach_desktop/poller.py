@@ -1,65 +1,219 @@
 from __future__ import annotations
 
+import asyncio
 import logging
+import random
+import threading
 import time
-from typing import Any, Dict, Iterable, Optional
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import asdict, dataclass, replace
+from typing import Any, Dict, Iterable, List, Optional, Sequence
 
-from .api import ApiError, KursachApi
+from .api import ApiError, AsyncKursachApi, HttpSettings, KursachApi, create_async_client, create_client
+from .cache import build_response_cache
 from .commands import CommandError, DeviceCommandDispatcher
-from .config import AppConfig
+from .config import AppConfig, DeviceProfile
+from .journal import ACKED, EXECUTED, STARTED, CommandJournal
+from .metrics import MetricsRegistry
+from .outbox import AckOutbox, AsyncAckOutbox
+from .ratelimit import build_rate_limiter
+from .resilience import build_circuit_breaker, build_retry_policy
+from .singleflight import AsyncSingleFlight, SingleFlight
 from .state import DesktopStateStore
 
 
 LOG = logging.getLogger(__name__)
 
 
+def is_barrier_command(command: Dict[str, Any], *, auto_confirm: bool) -> bool:
+    action = (command.get("action") or "").upper()
+    if action in {"LOGIN_ON_DESKTOP", "REQUEST_DESKTOP_SELL"}:
+        return True
+    # A sell that asks for confirmation reads stdin, so it cannot overlap other prompts.
+    return action == "EXECUTE_DESKTOP_SELL" and not auto_confirm
+
+
+def command_ordering_key(command: Dict[str, Any]) -> str:
+    payload = command.get("payload") or {}
+    asset_id = payload.get("asset_id") if isinstance(payload, dict) else None
+    if asset_id:
+        return f"asset:{str(asset_id).lower()}"
+    return f"command:{command.get('id')}"
+
+
+def plan_stages(
+    commands: Iterable[Dict[str, Any]], *, auto_confirm: bool
+) -> List[List[List[Dict[str, Any]]]]:
+    """Split a poll batch into stages that run one after another.
+
+    Each stage is a list of lanes that may run concurrently; commands inside a
+    lane keep their poll order. A barrier command forms a stage of its own.
+    """
+    stages: List[List[List[Dict[str, Any]]]] = []
+    lanes: Dict[str, List[Dict[str, Any]]] = {}
+    for command in commands:
+        if is_barrier_command(command, auto_confirm=auto_confirm):
+            if lanes:
+                stages.append(list(lanes.values()))
+                lanes = {}
+            stages.append([[command]])
+            continue
+        lanes.setdefault(command_ordering_key(command), []).append(command)
+    if lanes:
+        stages.append(list(lanes.values()))
+    return stages
+
+
+class PollScheduler:
+    """Chooses the delay before the next poll from the outcome of the last one.
+
+    A full page is drained immediately, any activity drops the interval to the
+    lower bound, and idle or failed cycles back off exponentially (with jitter)
+    up to the upper bound. The upper bound is never below ``base_interval``, so
+    by default an idle poller keeps polling at ``base_interval``.
+    """
+
+    def __init__(
+        self,
+        base_interval: float,
+        min_interval: float,
+        max_interval: float = 0.0,
+        *,
+        backoff: float = 2.0,
+        jitter: float = 0.2,
+    ) -> None:
+        self.min_interval = max(0.0, min(min_interval, base_interval))
+        self.max_interval = max(max_interval, base_interval)
+        self.backoff = backoff
+        self.jitter = jitter
+        self._current = float(base_interval)
+        self._failures = 0
+
+    def next_delay(self, *, received: int, limit: int, failed: bool = False) -> float:
+        if failed:
+            self._failures += 1
+            delay = self._current * self.backoff ** self._failures
+            return self._jittered(delay)
+        self._failures = 0
+        if received >= limit:
+            self._current = self.min_interval
+            return 0.0
+        if received:
+            self._current = self.min_interval
+            return self._current
+        self._current = min(self.max_interval, max(self._current, self.min_interval) * self.backoff)
+        return self._jittered(self._current)
+
+    def _jittered(self, delay: float) -> float:
+        delay = min(self.max_interval, delay)
+        return max(self.min_interval, delay * random.uniform(1.0 - self.jitter, 1.0))
+
+
 class CommandPoller:
+    poll_limit = 10
+
     def __init__(
         self,
         api: KursachApi,
         dispatcher: DeviceCommandDispatcher,
         state_store: DesktopStateStore,
         config: AppConfig,
+        *,
+        journal: CommandJournal | None = None,
+        outbox: AckOutbox | None = None,
     ) -> None:
         self.api = api
         self.dispatcher = dispatcher
         self.state_store = state_store
         self.config = config
+        self.journal = journal
+        self.outbox = outbox
+        self._executor: ThreadPoolExecutor | None = None
+        self._state_lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def stop(self) -> None:
+        """Ask a running :meth:`run` loop to exit after the current cycle."""
+        self._stop.set()
 
     def run(self, *, once: bool = False, interval: Optional[int] = None) -> None:
-        sleep_seconds = interval or self.config.poll_interval_seconds
+        self._stop.clear()
+        workers = max(1, self.config.command_workers)
+        if workers > 1:
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="command")
+        if self.outbox is not None:
+            self.outbox.start()
+        try:
+            self._recover()
+            self._run_loop(once=once, interval=interval)
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+            if self.outbox is not None:
+                self.outbox.close()
+            self.state_store.flush()
+
+    def _run_loop(self, *, once: bool, interval: Optional[int]) -> None:
+        base_interval = interval or self.config.poll_interval_seconds
+        scheduler = PollScheduler(
+            base_interval,
+            self.config.poll_min_interval_seconds,
+            self.config.poll_max_interval_seconds,
+        )
         LOG.info(
-            "Starting poll loop: target=%s device_id=%s interval=%ss",
+            "Starting poll loop: target=%s device_id=%s interval=%ss (min %ss, max %ss) workers=%s",
             self.config.target_device,
             self.config.device_id,
-            sleep_seconds,
+            base_interval,
+            scheduler.min_interval,
+            scheduler.max_interval,
+            self.config.command_workers,
         )
-        while True:
+        while not self._stop.is_set():
             try:
                 response = self.api.poll_commands(
                     target_device=self.config.target_device,
                     target_device_id=self.config.device_id,
-                    limit=10,
+                    limit=self.poll_limit,
                 )
             except ApiError as exc:
                 LOG.error("Failed to poll device commands: %s", exc)
                 if once:
                     break
-                time.sleep(sleep_seconds)
+                delay = scheduler.next_delay(received=0, limit=self.poll_limit, failed=True)
+                LOG.debug("Retrying poll in %.2fs", delay)
+                self._stop.wait(delay)
                 continue
 
             commands = response.get("commands") or []
             polled_at = response.get("polled_at")
             if polled_at:
-                self.state_store.state.last_polled_at = polled_at
-                self.state_store.save()
+                self.state_store.update(last_polled_at=polled_at)
             if not commands:
                 LOG.info("Polled at %s: no pending commands", polled_at)
-            for command in commands:
-                self._handle_command(command)
+            self._process_commands(commands)
             if once:
                 break
-            time.sleep(sleep_seconds)
+            delay = scheduler.next_delay(received=len(commands), limit=self.poll_limit)
+            LOG.debug("Next poll in %.2fs", delay)
+            if delay:
+                self._stop.wait(delay)
+
+    def _process_commands(self, commands: List[Dict[str, Any]]) -> None:
+        if self._executor is None:
+            for command in commands:
+                self._handle_command(command)
+            return
+        for lanes in plan_stages(commands, auto_confirm=self.dispatcher.auto_confirm):
+            if len(lanes) == 1:
+                self._run_lane(lanes[0])
+                continue
+            wait([self._executor.submit(self._run_lane, lane) for lane in lanes])
+
+    def _run_lane(self, lane: Iterable[Dict[str, Any]]) -> None:
+        for command in lane:
+            self._handle_command(command)
 
     def _handle_command(self, command: Dict[str, Any]) -> None:
         command_id = command.get("id")
@@ -67,26 +221,410 @@ class CommandPoller:
         payload = command.get("payload")
         LOG.info("Received command #%s action=%s", command_id, action)
         print(f"Received command #{command_id} -> {action} | payload={payload}")
+        replay_status = self.journal.admit(command_id) if self.journal is not None else None
+        if replay_status is not None:
+            LOG.warning("Command %s was already processed; re-sending %s ACK", command_id, replay_status)
+            _count_command(self.api, action, "replayed")
+            self._ack(command_id, replay_status)
+            return
+        self._journal(command_id, STARTED, action=action)
         try:
             result_text = self.dispatcher.handle(command)
         except (CommandError, ApiError) as exc:
             LOG.error("Command %s failed: %s", command_id, exc)
-            self._ack(command_id, "FAILED")
+            _count_command(self.api, action, "failed")
+            self._finish(command_id, "FAILED")
             return
         except Exception:
             LOG.exception("Unexpected error while handling command %s", command_id)
-            self._ack(command_id, "FAILED")
+            _count_command(self.api, action, "failed")
+            self._finish(command_id, "FAILED")
             return
 
         LOG.info("Command %s completed: %s", command_id, result_text)
-        self.state_store.state.last_command_id = command_id
-        self.state_store.save()
-        self._ack(command_id, "ACKNOWLEDGED")
+        _count_command(self.api, action, "succeeded")
+        with self._state_lock:
+            last_id = self.state_store.state.last_command_id
+            # Workers may finish out of order; never move the marker backwards.
+            if not (isinstance(last_id, int) and isinstance(command_id, int) and command_id < last_id):
+                self.state_store.update(last_command_id=command_id)
+        self._finish(command_id, "ACKNOWLEDGED")
+
+    def _recover(self) -> None:
+        if self.journal is None:
+            return
+        for command_id, status in self.journal.recover():
+            LOG.info("Re-sending missing %s ACK for command %s", status, command_id)
+            self._ack(command_id, status)
+
+    def _journal(self, command_id: Any, event: str, status: str | None = None, action: str | None = None) -> None:
+        if self.journal is not None:
+            self.journal.record(command_id, event, status, action)
+
+    def _finish(self, command_id: Any, status: str) -> None:
+        self._journal(command_id, EXECUTED, status)
+        self._ack(command_id, status)
 
     def _ack(self, command_id: Any, status: str) -> None:
         if command_id is None:
             return
         try:
-            self.api.acknowledge_command(int(command_id), status)
-        except (ApiError, ValueError) as exc:
+            numeric_id = int(command_id)
+        except ValueError as exc:
+            LOG.error("Failed to ACK command %s: %s", command_id, exc)
+            return
+        if self.outbox is not None:
+            self.outbox.submit(numeric_id, status)
+            return
+        try:
+            self.api.acknowledge_command(numeric_id, status)
+        except ApiError as exc:
             LOG.error("Failed to ACK command %s: %s", command_id, exc)
+            return
+        self._journal(command_id, ACKED, status)
+
+
+def _count_command(api: KursachApi | AsyncKursachApi, action: Any, outcome: str) -> None:
+    # Command counters live next to the HTTP ones in the client's registry.
+    if api.metrics is not None:
+        api.metrics.observe_command(action, outcome)
+
+
+@dataclass
+class DeviceMetrics:
+    device_id: str
+    polls: int = 0
+    poll_errors: int = 0
+    commands_received: int = 0
+    commands_succeeded: int = 0
+    commands_failed: int = 0
+    ack_errors: int = 0
+    poll_latency_total: float = 0.0
+
+    def record_ack_error(self, command_id: int, exc: Exception) -> None:
+        self.ack_errors += 1
+
+    @property
+    def avg_poll_latency(self) -> float:
+        return self.poll_latency_total / self.polls if self.polls else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["avg_poll_latency"] = round(self.avg_poll_latency, 4)
+        return data
+
+
+class AsyncCommandPoller:
+    """Event-loop counterpart of :class:`CommandPoller` for a single device."""
+
+    poll_limit = CommandPoller.poll_limit
+
+    def __init__(
+        self,
+        api: AsyncKursachApi,
+        dispatcher: DeviceCommandDispatcher,
+        state_store: DesktopStateStore,
+        config: AppConfig,
+        *,
+        metrics: DeviceMetrics | None = None,
+        journal: CommandJournal | None = None,
+        outbox: AsyncAckOutbox | None = None,
+    ) -> None:
+        self.api = api
+        self.dispatcher = dispatcher
+        self.state_store = state_store
+        self.config = config
+        self.journal = journal
+        self.outbox = outbox
+        self.metrics = metrics or DeviceMetrics(config.device_id)
+        self._workers: asyncio.Semaphore | None = None
+
+    async def run(self, *, once: bool = False, interval: Optional[int] = None) -> None:
+        # Built here rather than in __init__ so it belongs to the loop that runs the poller.
+        self._workers = asyncio.Semaphore(max(1, self.config.command_workers))
+        base_interval = interval or self.config.poll_interval_seconds
+        scheduler = PollScheduler(
+            base_interval,
+            self.config.poll_min_interval_seconds,
+            self.config.poll_max_interval_seconds,
+        )
+        try:
+            await self._recover()
+            await self._run_loop(once=once, scheduler=scheduler)
+        finally:
+            if self.outbox is not None:
+                await self.outbox.close()
+
+    async def _run_loop(self, *, once: bool, scheduler: PollScheduler) -> None:
+        while True:
+            started = time.perf_counter()
+            try:
+                response = await self.api.poll_commands(
+                    target_device=self.config.target_device,
+                    target_device_id=self.config.device_id,
+                    limit=self.poll_limit,
+                )
+            except ApiError as exc:
+                self.metrics.poll_errors += 1
+                LOG.error("[%s] Failed to poll device commands: %s", self.config.device_id, exc)
+                if once:
+                    break
+                await asyncio.sleep(scheduler.next_delay(received=0, limit=self.poll_limit, failed=True))
+                continue
+            self.metrics.polls += 1
+            self.metrics.poll_latency_total += time.perf_counter() - started
+
+            commands = response.get("commands") or []
+            polled_at = response.get("polled_at")
+            if polled_at:
+                await asyncio.to_thread(self.state_store.update, last_polled_at=polled_at)
+            self.metrics.commands_received += len(commands)
+            for lanes in plan_stages(commands, auto_confirm=self.dispatcher.auto_confirm):
+                await asyncio.gather(*(self._run_lane(lane) for lane in lanes))
+            if once:
+                break
+            delay = scheduler.next_delay(received=len(commands), limit=self.poll_limit)
+            if delay:
+                await asyncio.sleep(delay)
+
+    async def _run_lane(self, lane: Iterable[Dict[str, Any]]) -> None:
+        assert self._workers is not None
+        async with self._workers:
+            for command in lane:
+                await self._handle_command(command)
+
+    async def _handle_command(self, command: Dict[str, Any]) -> None:
+        command_id = command.get("id")
+        action = command.get("action")
+        LOG.info("[%s] Received command #%s action=%s", self.config.device_id, command_id, action)
+        # Journal and state writes fsync; keep them off the loop shared by every device.
+        replay_status = None
+        if self.journal is not None:
+            replay_status = await asyncio.to_thread(self.journal.admit, command_id)
+        if replay_status is not None:
+            LOG.warning(
+                "[%s] Command %s was already processed; re-sending %s ACK",
+                self.config.device_id,
+                command_id,
+                replay_status,
+            )
+            _count_command(self.api, action, "replayed")
+            await self._ack(command_id, replay_status)
+            return
+        await self._journal(command_id, STARTED, action=action)
+        try:
+            result_text = await self.dispatcher.handle_async(command)
+        except (CommandError, ApiError) as exc:
+            LOG.error("[%s] Command %s failed: %s", self.config.device_id, command_id, exc)
+            self.metrics.commands_failed += 1
+            _count_command(self.api, action, "failed")
+            await self._finish(command_id, "FAILED")
+            return
+        except Exception:
+            LOG.exception("[%s] Unexpected error while handling command %s", self.config.device_id, command_id)
+            self.metrics.commands_failed += 1
+            _count_command(self.api, action, "failed")
+            await self._finish(command_id, "FAILED")
+            return
+
+        LOG.info("[%s] Command %s completed: %s", self.config.device_id, command_id, result_text)
+        self.metrics.commands_succeeded += 1
+        _count_command(self.api, action, "succeeded")
+        last_id = self.state_store.state.last_command_id
+        if not (isinstance(last_id, int) and isinstance(command_id, int) and command_id < last_id):
+            await asyncio.to_thread(self.state_store.update, last_command_id=command_id)
+        await self._finish(command_id, "ACKNOWLEDGED")
+
+    async def _recover(self) -> None:
+        if self.journal is None:
+            return
+        for command_id, status in await asyncio.to_thread(self.journal.recover):
+            LOG.info("[%s] Re-sending missing %s ACK for command %s", self.config.device_id, status, command_id)
+            await self._ack(command_id, status)
+
+    async def _journal(
+        self, command_id: Any, event: str, status: str | None = None, action: str | None = None
+    ) -> None:
+        if self.journal is not None:
+            await asyncio.to_thread(self.journal.record, command_id, event, status, action)
+
+    async def _finish(self, command_id: Any, status: str) -> None:
+        await self._journal(command_id, EXECUTED, status)
+        await self._ack(command_id, status)
+
+    async def _ack(self, command_id: Any, status: str) -> None:
+        if command_id is None:
+            return
+        try:
+            numeric_id = int(command_id)
+        except ValueError as exc:
+            self.metrics.ack_errors += 1
+            LOG.error("[%s] Failed to ACK command %s: %s", self.config.device_id, command_id, exc)
+            return
+        if self.outbox is not None:
+            self.outbox.submit(numeric_id, status)
+            return
+        try:
+            await self.api.acknowledge_command(numeric_id, status)
+        except ApiError as exc:
+            self.metrics.ack_errors += 1
+            LOG.error("[%s] Failed to ACK command %s: %s", self.config.device_id, command_id, exc)
+            return
+        await self._journal(command_id, ACKED, status)
+
+
+class MultiDevicePoller:
+    """Polls many device profiles from one event loop over shared connection pools."""
+
+    def __init__(
+        self,
+        config: AppConfig,
+        profiles: Sequence[DeviceProfile],
+        *,
+        auto_confirm: bool | None = None,
+        metrics_interval: float = 60.0,
+        registry: MetricsRegistry | None = None,
+    ) -> None:
+        if not profiles:
+            raise ValueError("At least one device profile is required")
+        self.config = config
+        self.profiles = list(profiles)
+        self.auto_confirm = auto_confirm
+        self.metrics_interval = metrics_interval
+        self.registry = registry
+        self.metrics: Dict[str, DeviceMetrics] = {
+            profile.device_id: DeviceMetrics(profile.device_id) for profile in self.profiles
+        }
+        # Cache keys include the token, so one cache can serve every profile.
+        self.cache = build_response_cache(config)
+        # Every device talks to the same backend, so they share its health.
+        self.retry_policy = build_retry_policy(config)
+        self.breaker = build_circuit_breaker(config)
+        self.rate_limiter = build_rate_limiter(config)
+        # Profiles logged into the same account issue identical GETs; concurrent ones share a request.
+        self.coalescer = SingleFlight()
+        self.async_coalescer = AsyncSingleFlight()
+        # Every device prompts on the same terminal; created in _run, on the loop that uses it.
+        self.prompt_lock: asyncio.Lock | None = None
+
+    def run(self, *, once: bool = False, interval: Optional[int] = None) -> None:
+        asyncio.run(self._run(once=once, interval=interval))
+
+    async def _run(self, *, once: bool, interval: Optional[int]) -> None:
+        self.prompt_lock = asyncio.Lock()
+        base_url = self.config.normalized_base_url()
+        settings = HttpSettings.from_config(self.config)
+        if settings.max_connections < len(self.profiles):
+            LOG.warning(
+                "http_max_connections=%s is below the number of devices (%s); polls will queue for connections",
+                settings.max_connections,
+                len(self.profiles),
+            )
+        async_client = create_async_client(base_url, verify_ssl=self.config.verify_ssl, settings=settings)
+        # Interactive handlers fall back to the blocking client from a worker thread.
+        sync_client = create_client(base_url, verify_ssl=self.config.verify_ssl, settings=settings)
+        pollers: List[AsyncCommandPoller] = []
+        try:
+            for profile in self.profiles:
+                pollers.append(self._build_poller(profile, async_client, sync_client))
+            LOG.info("Starting multi-device poll loop for %s devices", len(pollers))
+            tasks = [asyncio.create_task(self._run_device(poller, once, interval)) for poller in pollers]
+            reporter = None if once else asyncio.create_task(self._report_metrics())
+            try:
+                await asyncio.gather(*tasks)
+            finally:
+                if reporter is not None:
+                    reporter.cancel()
+        finally:
+            for poller in pollers:
+                poller.state_store.close()
+                if poller.journal is not None:
+                    poller.journal.close()
+            await async_client.aclose()
+            sync_client.close()
+
+    def _build_poller(
+        self,
+        profile: DeviceProfile,
+        async_client: Any,
+        sync_client: Any,
+    ) -> AsyncCommandPoller:
+        device_config = replace(
+            self.config,
+            device_id=profile.device_id,
+            target_device=profile.target_device,
+        )
+        state_store = DesktopStateStore(
+            profile.resolved_state_path(),
+            flush_interval=self.config.state_flush_interval_seconds,
+        )
+        if profile.access_token and not state_store.state.access_token:
+            state_store.set_token(profile.access_token)
+        token = state_store.state.access_token
+        base_url = device_config.normalized_base_url()
+        resilience: Dict[str, Any] = {
+            "retry_policy": self.retry_policy,
+            "breaker": self.breaker,
+            "rate_limiter": self.rate_limiter,
+        }
+        api = KursachApi(
+            base_url,
+            token=token,
+            client=sync_client,
+            cache=self.cache,
+            metrics=self.registry,
+            coalescer=self.coalescer,
+            **resilience,
+        )
+        async_api = AsyncKursachApi(
+            base_url,
+            token=token,
+            client=async_client,
+            cache=self.cache,
+            metrics=self.registry,
+            coalescer=self.async_coalescer,
+            **resilience,
+        )
+        dispatcher = DeviceCommandDispatcher(
+            api,
+            state_store,
+            device_config,
+            auto_confirm=self.auto_confirm,
+            async_api=async_api,
+            prompt_lock=self.prompt_lock,
+        )
+        metrics = self.metrics[profile.device_id]
+        journal = CommandJournal(profile.resolved_journal_path(), rerun_sells=self.config.backend_idempotency)
+        outbox = AsyncAckOutbox(
+            async_api,
+            journal=journal,
+            workers=self.config.ack_workers,
+            max_attempts=self.config.ack_max_attempts,
+            on_error=metrics.record_ack_error,
+        )
+        return AsyncCommandPoller(
+            async_api,
+            dispatcher,
+            state_store,
+            device_config,
+            metrics=metrics,
+            journal=journal,
+            outbox=outbox,
+        )
+
+    async def _run_device(self, poller: AsyncCommandPoller, once: bool, interval: Optional[int]) -> None:
+        if not once:
+            # Spread the first polls so hundreds of devices do not hit the backend at once.
+            await asyncio.sleep(random.uniform(0, self.config.poll_min_interval_seconds))
+        await poller.run(once=once, interval=interval)
+
+    async def _report_metrics(self) -> None:
+        while True:
+            await asyncio.sleep(self.metrics_interval)
+            for metrics in self.metrics.values():
+                LOG.info("Device metrics: %s", metrics.to_dict())
+            if self.cache is not None:
+                LOG.info("Response cache stats: %s", self.cache.stats())
+            LOG.info("Coalesced GETs: %s", self.async_coalescer.stats())
+            if self.rate_limiter is not None:
+                LOG.info("Rate limiter: %s", self.rate_limiter.stats())
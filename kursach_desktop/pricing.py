@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, Tuple
+
+from .api import ApiError, AsyncKursachApi, KursachApi
+
+
+LOG = logging.getLogger(__name__)
+
+PRICE_SOURCES: Tuple[str, ...] = ("coincap", "coingecko")
+BEST_SOURCE = "best"
+
+
+@dataclass
+class BestQuote:
+    source: str
+    preview: Dict[str, Any]
+    quotes: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    quoted_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.quoted_at
+
+    @property
+    def spread_pct(self) -> float:
+        proceeds = [_as_float(quote.get("proceeds")) for quote in self.quotes.values()]
+        proceeds = [value for value in proceeds if value > 0]
+        if len(proceeds) < 2:
+            return 0.0
+        return (max(proceeds) - min(proceeds)) / min(proceeds) * 100
+
+
+def is_valid_source(source: str) -> bool:
+    return source.lower() in PRICE_SOURCES or source.lower() == BEST_SOURCE
+
+
+def select_best_quote(quotes: Dict[str, Dict[str, Any]]) -> BestQuote:
+    """Pick the source that yields the highest proceeds, then the highest unit price."""
+    if not quotes:
+        raise ApiError(502, "No price source returned a quote")
+    source = max(
+        quotes,
+        key=lambda name: (_as_float(quotes[name].get("proceeds")), _as_float(quotes[name].get("unit_price"))),
+    )
+    best = BestQuote(source=source, preview=quotes[source], quotes=dict(quotes))
+    LOG.info(
+        "Best price source for %s: %s (proceeds %s, spread %.3f%% across %s)",
+        best.preview.get("symbol") or best.preview.get("asset_id"),
+        source,
+        best.preview.get("proceeds"),
+        best.spread_pct,
+        ", ".join(f"{name}={quote.get('proceeds')}" for name, quote in sorted(quotes.items())),
+    )
+    return best
+
+
+def best_preview(
+    api: KursachApi,
+    *,
+    asset_id: str,
+    quantity: float | None,
+    amount_usd: float | None,
+) -> BestQuote:
+    def preview(source: str) -> Dict[str, Any]:
+        return api.preview_sell(asset_id=asset_id, quantity=quantity, amount_usd=amount_usd, price_source=source)
+
+    with ThreadPoolExecutor(max_workers=len(PRICE_SOURCES), thread_name_prefix="best-quote") as pool:
+        futures = {source: pool.submit(preview, source) for source in PRICE_SOURCES}
+        results: Dict[str, Any] = {}
+        for source, future in futures.items():
+            try:
+                results[source] = future.result()
+            except ApiError as exc:
+                results[source] = exc
+    return _collect(results)
+
+
+async def best_preview_async(
+    api: AsyncKursachApi,
+    *,
+    asset_id: str,
+    quantity: float | None,
+    amount_usd: float | None,
+) -> BestQuote:
+    previews = await asyncio.gather(
+        *(
+            api.preview_sell(asset_id=asset_id, quantity=quantity, amount_usd=amount_usd, price_source=source)
+            for source in PRICE_SOURCES
+        ),
+        return_exceptions=True,
+    )
+    results: Dict[str, Any] = {}
+    for source, preview in zip(PRICE_SOURCES, previews):
+        if isinstance(preview, BaseException) and not isinstance(preview, ApiError):
+            raise preview
+        results[source] = preview
+    return _collect(results)
+
+
+def _collect(results: Dict[str, Any]) -> BestQuote:
+    quotes: Dict[str, Dict[str, Any]] = {}
+    errors: Dict[str, ApiError] = {}
+    for source, result in results.items():
+        if isinstance(result, ApiError):
+            LOG.warning("Price source %s failed to quote: %s", source, result)
+            errors[source] = result
+        else:
+            quotes[source] = result
+    if not quotes:
+        # Every source failed; surface the first error as-is so callers see the real status.
+        raise next(iter(errors.values()))
+    return select_best_quote(quotes)
+
+
+def refresh_if_stale(
+    api: KursachApi,
+    best: BestQuote,
+    *,
+    asset_id: str,
+    quantity: float | None,
+    amount_usd: float | None,
+    max_age: float,
+) -> BestQuote:
+    if best.age <= max_age:
+        return best
+    LOG.info("Best quote is %.1fs old (limit %.1fs); re-quoting", best.age, max_age)
+    return best_preview(api, asset_id=asset_id, quantity=quantity, amount_usd=amount_usd)
+
+
+async def refresh_if_stale_async(
+    api: AsyncKursachApi,
+    best: BestQuote,
+    *,
+    asset_id: str,
+    quantity: float | None,
+    amount_usd: float | None,
+    max_age: float,
+) -> BestQuote:
+    if best.age <= max_age:
+        return best
+    LOG.info("Best quote is %.1fs old (limit %.1fs); re-quoting", best.age, max_age)
+    return await best_preview_async(api, asset_id=asset_id, quantity=quantity, amount_usd=amount_usd)
+
+
+def _as_float(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+__all__ = [
+    "BEST_SOURCE",
+    "BestQuote",
+    "PRICE_SOURCES",
+    "best_preview",
+    "best_preview_async",
+    "is_valid_source",
+    "refresh_if_stale",
+    "refresh_if_stale_async",
+    "select_best_quote",
+]
@@ -0,0 +1,209 @@
+"""Opt-in profiling (``--profile``) and Chrome trace-event spans (``--trace``) for CLI runs."""
+
+from __future__ import annotations
+
+import functools
+import io
+import itertools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, TypeVar
+
+
+LOG = logging.getLogger(__name__)
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+FOLDED_SUFFIXES = frozenset({".folded", ".collapsed", ".stacks"})
+
+_NULL_SPAN = nullcontext()
+_tracer: "Tracer | None" = None
+
+
+class Tracer:
+    """Collects finished spans: ``X`` events for blocking code, ``b``/``e`` pairs for coroutines."""
+
+    def __init__(self) -> None:
+        self.pid = os.getpid()
+        self._events: List[Dict[str, Any]] = []
+        self._threads: Dict[int, str] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, cat: str, args: Dict[str, Any], *, is_async: bool = False) -> Iterator[None]:
+        start = time.perf_counter_ns()
+        try:
+            yield
+        except BaseException as exc:
+            args = {**args, "error": type(exc).__name__}
+            raise
+        finally:
+            self._record(name, cat, args, start, time.perf_counter_ns(), is_async)
+
+    def _record(self, name: str, cat: str, args: Dict[str, Any], start: int, end: int, is_async: bool) -> None:
+        tid = threading.get_ident()
+        base = {"name": name, "cat": cat, "pid": self.pid, "tid": tid}
+        with self._lock:
+            if tid not in self._threads:
+                self._threads[tid] = threading.current_thread().name
+            if is_async:
+                span_id = next(self._ids)
+                self._events.append({**base, "ph": "b", "id": span_id, "ts": start / 1000, "args": args})
+                self._events.append({**base, "ph": "e", "id": span_id, "ts": end / 1000})
+            else:
+                self._events.append({**base, "ph": "X", "ts": start / 1000, "dur": (end - start) / 1000, "args": args})
+
+    def events(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            names = [
+                {"name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid, "args": {"name": name}}
+                for tid, name in self._threads.items()
+            ]
+            return names + list(self._events)
+
+    def write(self, path: Path) -> None:
+        events = self.events()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps({"traceEvents": events, "displayTimeUnit": "ms"}, default=str), encoding="utf-8")
+        LOG.info("Wrote %s trace event(s) to %s", len(events), path)
+
+
+def install_tracer(tracer: Tracer | None) -> None:
+    global _tracer
+    _tracer = tracer
+
+
+def span(name: str, cat: str = "app", **args: Any) -> AbstractContextManager[None]:
+    """Time a block of blocking code (no-op unless a tracer is installed)."""
+    tracer = _tracer
+    return _NULL_SPAN if tracer is None else tracer.span(name, cat, args)
+
+
+def async_span(name: str, cat: str = "app", **args: Any) -> AbstractContextManager[None]:
+    """Like :func:`span`, for blocks inside a coroutine that may interleave with other tasks."""
+    tracer = _tracer
+    return _NULL_SPAN if tracer is None else tracer.span(name, cat, args, is_async=True)
+
+
+def traced(name: str | None = None, cat: str = "app") -> Callable[[F], F]:
+    """Decorator form of :func:`span`/:func:`async_span`; defaults to the function's qualified name."""
+
+    def decorate(func: F) -> F:
+        import inspect
+
+        span_name = name or func.__qualname__
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                with async_span(span_name, cat):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper  # type: ignore[return-value]
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with span(span_name, cat):
+                return func(*args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorate
+
+
+class StackSampler:
+    """Samples every thread's Python stack into collapsed ``frame;frame count`` lines."""
+
+    def __init__(self, interval: float = 0.005) -> None:
+        self.interval = interval
+        self.samples: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for tid, frame in sys._current_frames().items():
+                if tid != own:
+                    self.samples[_collapse(names.get(tid, str(tid)), frame)] += 1
+
+    def render(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self.samples.items()))
+
+
+class ProfileSession:
+    """Profiles until :meth:`stop`; ``path``'s suffix picks collapsed stacks, a ``.txt`` report or raw pstats."""
+
+    def __init__(self, path: Path, *, interval: float = 0.005) -> None:
+        import cProfile
+
+        self.path = path
+        self.sampling = path.suffix.lower() in FOLDED_SUFFIXES
+        self._sampler = StackSampler(interval) if self.sampling else None
+        self._profile = None if self.sampling else cProfile.Profile()
+        self._started = 0.0
+
+    def start(self) -> "ProfileSession":
+        self._started = time.perf_counter()
+        if self._sampler is not None:
+            self._sampler.start()
+        else:
+            self._profile.enable()  # type: ignore[union-attr]
+        return self
+
+    def stop(self) -> None:
+        elapsed = time.perf_counter() - self._started
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self._sampler is not None:
+            self._sampler.stop()
+            self.path.write_text(self._sampler.render(), encoding="utf-8")
+        else:
+            profile = self._profile
+            assert profile is not None
+            profile.disable()
+            if self.path.suffix.lower() == ".txt":
+                import pstats
+
+                report = io.StringIO()
+                pstats.Stats(profile, stream=report).sort_stats("cumulative").print_stats(60)
+                self.path.write_text(report.getvalue(), encoding="utf-8")
+            else:
+                profile.dump_stats(str(self.path))
+        LOG.info("Wrote profile of %.2fs to %s", elapsed, self.path)
+
+
+def _collapse(thread_name: str, frame: Any) -> str:
+    stack: List[str] = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    stack.append(thread_name)
+    return ";".join(reversed(stack))
+
+
+__all__ = [
+    "ProfileSession",
+    "StackSampler",
+    "Tracer",
+    "async_span",
+    "install_tracer",
+    "span",
+    "traced",
+]
@@ -0,0 +1,185 @@
+"""Client-side rate limiting of backend requests, shared by sync and async clients."""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Mapping
+
+from .config import AppConfig
+from .metrics import route_template
+
+
+LOG = logging.getLogger(__name__)
+
+THROTTLE_STATUSES = frozenset({429, 503})
+# Pause after a 429 that came without Retry-After or rate-limit headers.
+DEFAULT_THROTTLE_PAUSE = 1.0
+# X-RateLimit-Reset is an epoch timestamp on some servers and a number of seconds on others.
+_EPOCH_THRESHOLD = 1_000_000_000
+
+
+class TokenBucket:
+    """``rate`` tokens per second up to ``capacity``; callers hold the limiter's lock."""
+
+    def __init__(self, rate: float, capacity: float, now: float) -> None:
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self._tokens = self.capacity
+        self._updated = now
+
+    def reserve(self, now: float) -> float:
+        # Overdrawing spaces queued requests ``1 / rate`` apart.
+        self._refill(now)
+        self._tokens -= 1
+        return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def set_rate(self, rate: float, now: float) -> None:
+        self._refill(now)
+        self.rate = rate
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+
+class RateLimiter:
+    """Global (``rate`` 0 = unlimited) and per-route token buckets plus ``adaptive`` server-driven pauses."""
+
+    def __init__(
+        self,
+        rate: float = 0.0,
+        burst: int = 10,
+        routes: Mapping[str, float] | None = None,
+        *,
+        adaptive: bool = True,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.burst = max(1, burst)
+        self.adaptive = adaptive
+        self._clock = clock
+        self._lock = threading.Lock()
+        now = clock()
+        self._global = TokenBucket(rate, self.burst, now) if rate > 0 else None
+        self._routes = {
+            route: TokenBucket(limit, self.burst, now) for route, limit in (routes or {}).items() if limit > 0
+        }
+        # Pacing derived from the server's rate-limit headers, valid until its window resets.
+        self._server: TokenBucket | None = None
+        self._server_until = 0.0
+        self._blocked_until = 0.0
+        self.throttled = 0
+
+    def reserve(self, url: str) -> float:
+        """Take a token for a request to ``url``; returns the seconds to wait before sending it."""
+        bucket = self._routes.get(route_template(url))
+        with self._lock:
+            now = self._clock()
+            wait = max(0.0, self._blocked_until - now)
+            if self._global is not None:
+                wait = max(wait, self._global.reserve(now))
+            if bucket is not None:
+                wait = max(wait, bucket.reserve(now))
+            if self._server is not None:
+                if now < self._server_until:
+                    wait = max(wait, self._server.reserve(now))
+                else:
+                    self._server = None
+            return wait
+
+    def observe(self, status: int, headers: Mapping[str, str]) -> None:
+        """Adjust to a response's throttling status and rate-limit headers."""
+        if not self.adaptive:
+            return
+        retry_after = parse_retry_after(headers.get("retry-after"))
+        remaining = _header_float(headers, "ratelimit-remaining", "x-ratelimit-remaining")
+        reset = _reset_seconds(_header_float(headers, "ratelimit-reset", "x-ratelimit-reset"))
+        with self._lock:
+            now = self._clock()
+            if status in THROTTLE_STATUSES:
+                if status == 429:
+                    self.throttled += 1
+                pause = retry_after
+                if pause is None and status == 429:
+                    pause = reset if remaining is not None and remaining <= 0 and reset else DEFAULT_THROTTLE_PAUSE
+                if pause:
+                    self._block(now + pause)
+            if remaining is None or not reset:
+                return
+            if remaining <= 0:
+                self._block(now + reset)
+            elif self._server is None:
+                self._server = TokenBucket(remaining / reset, min(remaining, self.burst), now)
+            else:
+                self._server.set_rate(remaining / reset, now)
+            self._server_until = now + reset
+
+    def _block(self, until: float) -> None:
+        if until > self._blocked_until:
+            LOG.warning("Backend asked to slow down; pausing requests for %.2fs", until - self._clock())
+            self._blocked_until = until
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "throttled": self.throttled,
+                "blocked_for": round(max(0.0, self._blocked_until - self._clock()), 3),
+                "server_rate": round(self._server.rate, 3) if self._server is not None else None,
+            }
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """``Retry-After`` as seconds from now; accepts delta-seconds and HTTP dates."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _header_float(headers: Mapping[str, str], *names: str) -> float | None:
+    for name in names:
+        value = headers.get(name)
+        if value:
+            try:
+                # The IETF draft allows "10, 10;w=60"-style lists; the first item is the effective one.
+                return float(value.split(",")[0].split(";")[0])
+            except ValueError:
+                return None
+    return None
+
+
+def _reset_seconds(reset: float | None) -> float | None:
+    if reset is None:
+        return None
+    if reset > _EPOCH_THRESHOLD:
+        reset -= time.time()
+    return reset if reset > 0 else None
+
+
+def build_rate_limiter(config: AppConfig) -> RateLimiter | None:
+    if config.rate_limit_per_second <= 0 and not config.rate_limit_routes and not config.rate_limit_adaptive:
+        return None
+    return RateLimiter(
+        config.rate_limit_per_second,
+        config.rate_limit_burst,
+        config.rate_limit_routes,
+        adaptive=config.rate_limit_adaptive,
+    )
+
+
+__all__ = [
+    "DEFAULT_THROTTLE_PAUSE",
+    "RateLimiter",
+    "THROTTLE_STATUSES",
+    "TokenBucket",
+    "build_rate_limiter",
+    "parse_retry_after",
+]
@@ -0,0 +1,208 @@
+"""Retry rules and a circuit breaker for backend requests.
+
+Both are opt-in collaborators of ``KursachApi``/``AsyncKursachApi`` (like the
+response cache and metrics) and are shared by every client talking to the
+same backend. Status ``-1`` stands for a request that got no HTTP response.
+"""
+
+from __future__ import annotations
+
+import random
+import threading
+import time
+from dataclasses import dataclass, replace
+from typing import Callable, Dict, FrozenSet, Mapping
+
+from .config import AppConfig
+
+
+RETRYABLE_STATUSES: FrozenSet[int] = frozenset({-1, 408, 425, 429, 500, 502, 503, 504})
+# Statuses that say the backend itself is unhealthy; 4xx answers (including 429) do not trip the breaker.
+BREAKER_FAILURE_STATUSES: FrozenSet[int] = frozenset({-1, 500, 502, 503, 504})
+SAFE_METHODS: FrozenSet[str] = frozenset({"GET", "HEAD", "OPTIONS"})
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+@dataclass(frozen=True)
+class RetryRule:
+    max_attempts: int = 3
+    base_delay: float = 0.2
+    max_delay: float = 5.0
+    statuses: FrozenSet[int] = RETRYABLE_STATUSES
+
+    def backoff(self, attempt: int) -> float:
+        """Capped exponential backoff with jitter before attempt ``attempt + 1``."""
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return delay * random.uniform(0.5, 1.0)
+
+
+# Per-route overrides, keyed by "METHOD route-template" (see metrics.route_template).
+DEFAULT_ROUTE_RULES: Dict[str, RetryRule] = {
+    # A failed poll otherwise costs a whole poll interval; keep the retries short.
+    "GET /crypto/device-commands/poll": RetryRule(max_attempts=3, base_delay=0.1, max_delay=1.0),
+    # Logging in again only issues another token.
+    "POST /auth/login": RetryRule(max_attempts=3, base_delay=0.2, max_delay=2.0),
+    # Preview is a read-only quote even though it is a POST.
+    "POST /crypto/sell/preview": RetryRule(max_attempts=3, base_delay=0.1, max_delay=1.0),
+    # The ACK outbox has its own, longer retry schedule; retrying here as well would multiply attempts.
+    "POST /crypto/device-commands/{id}/ack": RetryRule(max_attempts=1),
+}
+
+
+class RetryPolicy:
+    """Decides whether and when a failed request is sent again.
+
+    Safe methods use the default rule unless a route rule overrides it; any
+    other request is retried only when a route rule names it explicitly. An
+    ``Idempotency-Key`` header alone does not count: it only helps if the
+    backend dedupes it.
+    """
+
+    def __init__(self, default: RetryRule | None = None, rules: Mapping[str, RetryRule] | None = None) -> None:
+        self.default = default or RetryRule()
+        self.rules = dict(DEFAULT_ROUTE_RULES if rules is None else rules)
+
+    def rule_for(self, method: str, route: str) -> RetryRule | None:
+        rule = self.rules.get(f"{method.upper()} {route}")
+        if rule is not None:
+            return rule
+        if method.upper() in SAFE_METHODS:
+            return self.default
+        return None
+
+    def delay(self, rule: RetryRule, attempt: int, status: int, retry_after: float | None = None) -> float | None:
+        """Seconds to wait before the next attempt, or ``None`` to give up."""
+        if attempt >= rule.max_attempts or status not in rule.statuses:
+            return None
+        delay = rule.backoff(attempt)
+        if retry_after is not None:
+            # A server asking for a longer pause than the cap gets the error instead of a stalled caller.
+            if retry_after > rule.max_delay:
+                return None
+            delay = max(delay, retry_after)
+        return delay
+
+
+class CircuitBreaker:
+    """Fails fast while the backend is down.
+
+    After ``failure_threshold`` consecutive failures the breaker opens and
+    rejects requests for ``reset_timeout`` seconds. It then lets up to
+    ``half_open_probes`` requests through: a success closes it, a failure
+    opens it for another ``reset_timeout``.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout: float = 10.0,
+        *,
+        half_open_probes: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.half_open_probes = max(1, half_open_probes)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self.rejected = 0
+        self.trips = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+                return HALF_OPEN
+            return self._state
+
+    def retry_in(self) -> float:
+        with self._lock:
+            if self._state != OPEN:
+                return 0.0
+            return max(0.0, self.reset_timeout - (self._clock() - self._opened_at))
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self._state == OPEN:
+                if self._clock() - self._opened_at < self.reset_timeout:
+                    self.rejected += 1
+                    return False
+                self._state = HALF_OPEN
+                self._probes = 0
+            if self._state == HALF_OPEN:
+                if self._probes >= self.half_open_probes:
+                    self.rejected += 1
+                    return False
+                self._probes += 1
+            return True
+
+    def record(self, status: int) -> None:
+        if status in BREAKER_FAILURE_STATUSES:
+            self.record_failure()
+        else:
+            self.record_success()
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._probes = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    self.trips += 1
+                self._state = OPEN
+                self._opened_at = self._clock()
+                self._probes = 0
+
+    def stats(self) -> Dict[str, object]:
+        return {"state": self.state, "trips": self.trips, "rejected": self.rejected}
+
+
+def build_retry_policy(config: AppConfig) -> RetryPolicy | None:
+    if config.retry_max_attempts <= 1:
+        return None
+    default = RetryRule(
+        max_attempts=config.retry_max_attempts,
+        base_delay=config.retry_base_delay_seconds,
+        max_delay=config.retry_max_delay_seconds,
+    )
+    # Route rules keep their shape but never exceed the configured attempt budget.
+    rules = {
+        route: replace(rule, max_attempts=min(rule.max_attempts, config.retry_max_attempts))
+        for route, rule in DEFAULT_ROUTE_RULES.items()
+    }
+    if config.backend_idempotency:
+        # The backend replays a repeated Idempotency-Key, so a sell whose response was lost can be sent again.
+        rules["POST /crypto/sell"] = default
+    return RetryPolicy(default, rules)
+
+
+def build_circuit_breaker(config: AppConfig) -> CircuitBreaker | None:
+    if config.circuit_failure_threshold <= 0:
+        return None
+    return CircuitBreaker(config.circuit_failure_threshold, config.circuit_reset_seconds)
+
+
+__all__ = [
+    "BREAKER_FAILURE_STATUSES",
+    "CircuitBreaker",
+    "DEFAULT_ROUTE_RULES",
+    "IDEMPOTENCY_HEADER",
+    "RETRYABLE_STATUSES",
+    "RetryPolicy",
+    "RetryRule",
+    "build_circuit_breaker",
+    "build_retry_policy",
+]
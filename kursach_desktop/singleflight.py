@@ -0,0 +1,89 @@
+"""Coalescing of identical in-flight GET requests into one backend call."""
+
+from __future__ import annotations
+
+import asyncio
+import copy
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+
+class _Call:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight:
+    """Thread-safe: the first caller for a key runs ``fn``, concurrent callers wait for its result."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.leaders = 0
+        self.shared = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Return ``fn()``'s result and whether it came from another caller's request."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                self.shared += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            # Callers mutate response dicts; each waiter gets its own copy, as with cache hits.
+            return copy.deepcopy(call.value), True
+        try:
+            call.value = fn()
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.value, False
+
+    def stats(self) -> Dict[str, int]:
+        return {"leaders": self.leaders, "shared": self.shared}
+
+
+class AsyncSingleFlight:
+    """Coroutine counterpart of :class:`SingleFlight` for one event loop."""
+
+    def __init__(self) -> None:
+        self._tasks: Dict[Hashable, "asyncio.Task[Any]"] = {}
+        self.leaders = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        task = self._tasks.get(key)
+        if task is not None:
+            self.shared += 1
+            return copy.deepcopy(await asyncio.shield(task)), True
+        self.leaders += 1
+        # A task of its own, so a cancelled caller does not cancel it for the others.
+        task = self._tasks[key] = asyncio.ensure_future(fn())
+        task.add_done_callback(lambda done: self._forget(key, done))
+        return await asyncio.shield(task), False
+
+    def _forget(self, key: Hashable, task: "asyncio.Task[Any]") -> None:
+        self._tasks.pop(key, None)
+        if not task.cancelled():
+            # Marks the error as retrieved even if every caller was cancelled meanwhile.
+            task.exception()
+
+    def stats(self) -> Dict[str, int]:
+        return {"leaders": self.leaders, "shared": self.shared}
+
+
+__all__ = ["AsyncSingleFlight", "SingleFlight"]
@@ -1,11 +1,23 @@
 from __future__ import annotations
 
 import json
+import logging
+import os
+import tempfile
+import threading
+import time
 from dataclasses import asdict, dataclass
 from pathlib import Path
 from typing import Any, Dict
 
 from .config import DEFAULT_STATE_PATH
+from .profiling import span
+
+
+LOG = logging.getLogger(__name__)
+
+# Losing these on a crash means re-login or re-running commands, so they skip the debounce.
+CRITICAL_FIELDS = frozenset({"access_token", "last_command_id"})
 
 
 @dataclass
@@ -16,39 +28,141 @@ class DesktopState:
 
 
 class DesktopStateStore:
-    def __init__(self, path: Path | None = None) -> None:
+    def __init__(self, path: Path | None = None, *, flush_interval: float = 5.0) -> None:
         self.path = Path(path) if path else DEFAULT_STATE_PATH
+        self.flush_interval = flush_interval
+        self._lock = threading.RLock()
+        self._dirty = False
+        self._last_flush = 0.0
+        self._last_written: str | None = None
+        # Trailing flush for debounced updates, so the last one is written even if no other update follows.
+        self._timer: threading.Timer | None = None
         self._state = self._load()
 
     @property
     def state(self) -> DesktopState:
         return self._state
 
+    @property
+    def dirty(self) -> bool:
+        return self._dirty
+
     def _load(self) -> DesktopState:
         if not self.path.exists():
             return DesktopState()
         try:
-            data = json.loads(self.path.read_text(encoding="utf-8"))
-        except (json.JSONDecodeError, OSError):
+            raw = self.path.read_text(encoding="utf-8")
+            data = json.loads(raw)
+        except (json.JSONDecodeError, OSError) as exc:
+            LOG.warning("Ignoring unreadable state file %s: %s", self.path, exc)
             return DesktopState()
+        self._last_written = raw
         return DesktopState(
             access_token=data.get("access_token"),
             last_command_id=data.get("last_command_id"),
             last_polled_at=data.get("last_polled_at"),
         )
 
+    def update(self, **fields: Any) -> None:
+        """Apply ``fields`` and persist them: critical ones now, the rest debounced."""
+        with self._lock:
+            for name, value in fields.items():
+                if not hasattr(self._state, name):
+                    raise AttributeError(f"Unknown state field: {name}")
+                setattr(self._state, name, value)
+            self._dirty = True
+            remaining = self.flush_interval - (time.monotonic() - self._last_flush)
+            if CRITICAL_FIELDS.intersection(fields) or remaining <= 0:
+                self.save()
+            elif self._timer is None:
+                self._timer = threading.Timer(remaining, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def mark_dirty(self) -> None:
+        with self._lock:
+            self._dirty = True
+
+    def flush(self) -> None:
+        """Write pending changes, if any."""
+        with self._lock:
+            if self._dirty:
+                self.save()
+
     def save(self) -> None:
-        payload: Dict[str, Any] = asdict(self._state)
-        self.path.parent.mkdir(parents=True, exist_ok=True)
-        self.path.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+        with self._lock, span("DesktopStateStore.save", "state"):
+            payload: Dict[str, Any] = asdict(self._state)
+            text = json.dumps(payload, indent=2)
+            self._dirty = False
+            self._cancel_timer()
+            self._last_flush = time.monotonic()
+            if text == self._last_written:
+                return
+            atomic_write(self.path, text)
+            self._last_written = text
+
+    def close(self) -> None:
+        with self._lock:
+            self.flush()
+            self._cancel_timer()
+
+    def _cancel_timer(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def reload_if_changed(self) -> bool:
+        """Pick up a file rewritten by another process; pending local changes win."""
+        with self._lock:
+            if self._dirty:
+                return False
+            try:
+                raw = self.path.read_text(encoding="utf-8") if self.path.exists() else None
+            except OSError:
+                return False
+            if raw == self._last_written:
+                return False
+            self._last_written = None
+            self._state = self._load()
+            return True
 
     def clear_token(self) -> None:
-        self._state.access_token = None
-        self.save()
+        self.update(access_token=None)
 
     def set_token(self, token: str) -> None:
-        self._state.access_token = token
-        self.save()
+        self.update(access_token=token)
+
+
+def atomic_write(path: Path, text: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as handle:
+            handle.write(text)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(tmp_name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except OSError:
+            pass
+        raise
+    _fsync_directory(path.parent)
+
+
+def _fsync_directory(directory: Path) -> None:
+    # Makes the rename itself durable; not supported on Windows.
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
 
 
-__all__ = ["DesktopState", "DesktopStateStore"]
+__all__ = ["CRITICAL_FIELDS", "DesktopState", "DesktopStateStore", "atomic_write"]
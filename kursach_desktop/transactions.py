@@ -0,0 +1,342 @@
+from __future__ import annotations
+
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Sequence, Set, Tuple
+
+from .history import parse_timestamp
+
+if TYPE_CHECKING:
+    from .api import KursachApi
+
+
+LOG = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    id INTEGER PRIMARY KEY,
+    asset_id TEXT NOT NULL,
+    symbol TEXT,
+    type TEXT NOT NULL,
+    quantity REAL NOT NULL DEFAULT 0,
+    price REAL NOT NULL DEFAULT 0,
+    total REAL NOT NULL DEFAULT 0,
+    realized_pnl REAL,
+    created_at TEXT,
+    created_ts REAL NOT NULL DEFAULT 0,
+    raw TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_transactions_asset_time ON transactions (asset_id, created_ts);
+CREATE INDEX IF NOT EXISTS idx_transactions_time ON transactions (created_ts);
+CREATE INDEX IF NOT EXISTS idx_transactions_type_time ON transactions (type, created_ts);
+"""
+
+# Keys under which a backend may wrap the transaction list.
+ITEM_KEYS = ("transactions", "items", "results", "data")
+TRANSACTIONS_URL = "/crypto/transactions"
+
+_SINCE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([smhdw])\s*$", re.IGNORECASE)
+_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+
+
+@dataclass
+class TransactionRow:
+    id: int
+    asset_id: str
+    symbol: str | None
+    type: str
+    quantity: float
+    price: float
+    total: float
+    realized_pnl: float | None
+    created_at: str | None
+
+
+@dataclass
+class PnlRollup:
+    asset_id: str
+    symbol: str | None
+    buys: int = 0
+    sells: int = 0
+    bought_quantity: float = 0.0
+    sold_quantity: float = 0.0
+    proceeds: float = 0.0
+    realized_pnl: float = 0.0
+
+
+@dataclass
+class SyncReport:
+    fetched: int
+    inserted: int
+    last_id: int
+    pages: int
+    seconds: float
+
+
+def parse_since(value: str, *, now: float | None = None) -> float:
+    """Turn ``30d``/``12h``/``2w`` or an ISO date into a UNIX timestamp."""
+    now = time.time() if now is None else now
+    match = _SINCE.match(value)
+    if match:
+        return now - float(match.group(1)) * _UNITS[match.group(2).lower()]
+    timestamp = parse_timestamp(value)
+    if timestamp is None:
+        raise ValueError(f"Cannot parse {value!r}; use e.g. 30d, 12h, 2w or 2024-01-31")
+    return timestamp
+
+
+class TransactionStore:
+    """Local SQLite mirror of ``/crypto/transactions``.
+
+    Sync is incremental: only rows with an id above the highest stored one are
+    inserted, and the request carries ``after_id`` so a backend that supports
+    it can skip sending them at all. Paged responses are followed through
+    ``next``/``next_cursor`` like the export does.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self) -> "TransactionStore":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def last_id(self) -> int:
+        with self._lock:
+            row = self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM transactions").fetchone()
+        return int(row[0])
+
+    def count(self) -> int:
+        with self._lock:
+            return int(self._conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0])
+
+    def sync(self, api: KursachApi) -> SyncReport:
+        started = time.perf_counter()
+        last_id = self.last_id()
+        after_id: int | None = last_id or None
+        url, cursor = TRANSACTIONS_URL, None
+        fetched = inserted = pages = 0
+        seen: Set[Tuple[str, str | None]] = set()
+        while True:
+            payload = api.get_transactions(after_id=after_id, cursor=cursor, url=url)
+            items = _extract_items(payload)
+            pages += 1
+            fetched += len(items)
+            inserted += self.insert(item for item in items if _as_int(item.get("id")) > last_id)
+            following = _next_page(payload)
+            # A server that ignores the cursor would hand out the same page forever.
+            if following is None or not items or following in seen:
+                break
+            seen.add(following)
+            url, cursor = following
+            if cursor is None:
+                # A next link carries its own query.
+                after_id = None
+        report = SyncReport(
+            fetched=fetched,
+            inserted=inserted,
+            last_id=self.last_id(),
+            pages=pages,
+            seconds=time.perf_counter() - started,
+        )
+        LOG.info(
+            "Synced transactions: fetched %s in %s page(s), inserted %s, last id %s (%.3fs)",
+            report.fetched,
+            report.pages,
+            report.inserted,
+            report.last_id,
+            report.seconds,
+        )
+        return report
+
+    def insert(self, items: Iterable[Dict[str, Any]]) -> int:
+        rows = [row for row in (_to_row(item) for item in items) if row is not None]
+        if not rows:
+            return 0
+        with self._lock, self._conn:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO transactions "
+                "(id, asset_id, symbol, type, quantity, price, total, realized_pnl, created_at, created_ts, raw) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            return self._conn.total_changes - before
+
+    def query(
+        self,
+        *,
+        asset: str | None = None,
+        since: float | None = None,
+        side: str | None = None,
+        limit: int | None = None,
+    ) -> List[TransactionRow]:
+        where, params = _filters(asset=asset, since=since, side=side)
+        sql = (
+            "SELECT id, asset_id, symbol, type, quantity, price, total, realized_pnl, created_at "
+            f"FROM transactions{where} ORDER BY created_ts DESC, id DESC"
+        )
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [TransactionRow(**dict(row)) for row in rows]
+
+    def realized_pnl(self, *, asset: str | None = None, since: float | None = None) -> List[PnlRollup]:
+        """Per-asset realized PnL for sells inside the window.
+
+        Rows that carry ``realized_pnl`` from the server are summed as-is;
+        otherwise PnL is derived from the average cost of all earlier buys.
+        """
+        where, params = _filters(asset=asset)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT asset_id, symbol, type, quantity, price, total, realized_pnl, created_ts "
+                f"FROM transactions{where} ORDER BY asset_id, created_ts, id",
+                params,
+            ).fetchall()
+
+        rollups: Dict[str, PnlRollup] = {}
+        positions: Dict[str, List[float]] = {}
+        for row in rows:
+            asset_id = row["asset_id"]
+            quantity = row["quantity"] or 0.0
+            total = row["total"] or quantity * (row["price"] or 0.0)
+            held = positions.setdefault(asset_id, [0.0, 0.0])
+            in_window = since is None or row["created_ts"] >= since
+            rollup = rollups.get(asset_id)
+            if rollup is None and in_window:
+                rollup = rollups[asset_id] = PnlRollup(asset_id=asset_id, symbol=row["symbol"])
+            side = row["type"].upper()
+            if side == "BUY":
+                held[0] += quantity
+                held[1] += total
+                if in_window and rollup is not None:
+                    rollup.buys += 1
+                    rollup.bought_quantity += quantity
+            elif side == "SELL":
+                avg_cost = held[1] / held[0] if held[0] > 0 else 0.0
+                pnl = row["realized_pnl"] if row["realized_pnl"] is not None else total - avg_cost * quantity
+                sold = min(quantity, held[0])
+                held[0] -= sold
+                held[1] -= avg_cost * sold
+                if in_window and rollup is not None:
+                    rollup.sells += 1
+                    rollup.sold_quantity += quantity
+                    rollup.proceeds += total
+                    rollup.realized_pnl += pnl
+        return sorted(rollups.values(), key=lambda item: item.asset_id)
+
+
+def _filters(
+    *,
+    asset: str | None = None,
+    since: float | None = None,
+    side: str | None = None,
+) -> tuple[str, List[Any]]:
+    clauses: List[str] = []
+    params: List[Any] = []
+    if asset:
+        clauses.append("asset_id = ?")
+        params.append(asset.lower())
+    if since is not None:
+        clauses.append("created_ts >= ?")
+        params.append(since)
+    if side:
+        clauses.append("type = ?")
+        params.append(side.upper())
+    return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+
+def _extract_items(payload: Any) -> List[Dict[str, Any]]:
+    if isinstance(payload, dict):
+        for key in ITEM_KEYS:
+            if isinstance(payload.get(key), list):
+                payload = payload[key]
+                break
+        else:
+            return []
+    if not isinstance(payload, list):
+        return []
+    return [item for item in payload if isinstance(item, dict)]
+
+
+def _next_page(payload: Any) -> Tuple[str, str | None] | None:
+    """``(url, cursor)`` of the page after ``payload``; the body-only part of ``export._next_page``."""
+    if not isinstance(payload, dict):
+        return None
+    next_url = payload.get("next")
+    if isinstance(next_url, str) and next_url:
+        return next_url, None
+    cursor = payload.get("next_cursor")
+    if cursor not in (None, ""):
+        return TRANSACTIONS_URL, str(cursor)
+    return None
+
+
+def _to_row(item: Dict[str, Any]) -> Sequence[Any] | None:
+    transaction_id = _as_int(item.get("id"))
+    asset_id = item.get("asset_id") or item.get("asset") or item.get("coin_id")
+    if transaction_id <= 0 or not asset_id:
+        LOG.warning("Skipping transaction without id/asset: %s", item)
+        return None
+    created_at = item.get("created_at") or item.get("timestamp")
+    realized = item.get("realized_pnl")
+    return (
+        transaction_id,
+        str(asset_id).lower(),
+        item.get("symbol"),
+        str(item.get("type") or item.get("side") or "").upper(),
+        _as_float(item.get("quantity")),
+        _as_float(item.get("price")),
+        _as_float(item.get("total") if item.get("total") is not None else item.get("amount_usd")),
+        _as_float(realized) if realized is not None else None,
+        str(created_at) if created_at is not None else None,
+        parse_timestamp(created_at) or 0.0,
+        json.dumps(item, separators=(",", ":"), sort_keys=True),
+    )
+
+
+def _as_int(value: Any) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _as_float(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+__all__ = [
+    "ITEM_KEYS",
+    "PnlRollup",
+    "SyncReport",
+    "TRANSACTIONS_URL",
+    "TransactionRow",
+    "TransactionStore",
+    "parse_since",
+]
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import shutil
+import time
+from dataclasses import dataclass
+from typing import List, Sequence, TextIO
+
+from .api import ApiError, AsyncKursachApi, fetch_dashboard_bundle
+from .cache import DEFAULT_CACHE_TTLS, ResponseCache
+from .commands import dashboard_lines
+
+
+LOG = logging.getLogger(__name__)
+
+HIDE_CURSOR = "\x1b[?25l"
+SHOW_CURSOR = "\x1b[?25h"
+CLEAR_SCREEN = "\x1b[H\x1b[2J"
+CLEAR_LINE = "\x1b[K"
+CLEAR_BELOW = "\x1b[J"
+
+
+@dataclass
+class WatchStats:
+    frames: int = 0
+    writes: int = 0
+    rows_written: int = 0
+    bytes_written: int = 0
+    errors: int = 0
+
+
+def watch_cache(interval: float) -> ResponseCache:
+    """Cache for the watch loop: entries go stale before the next tick, so each refresh is conditional."""
+    return ResponseCache({url: interval / 2 for url in DEFAULT_CACHE_TTLS}, max_entries=2 * len(DEFAULT_CACHE_TTLS))
+
+
+class FrameRenderer:
+    """One ``write`` per frame: changed rows on a terminal, the whole frame (if changed) elsewhere."""
+
+    def __init__(self, stream: TextIO, *, ansi: bool | None = None) -> None:
+        self.stream = stream
+        self.ansi = stream.isatty() if ansi is None else ansi
+        self.stats = WatchStats()
+        self._previous: List[str] | None = None
+
+    def render(self, lines: Sequence[str], status: str = "") -> int:
+        """Draw ``lines`` plus a trailing status row; returns how many rows were rewritten."""
+        self.stats.frames += 1
+        if self.ansi:
+            width = shutil.get_terminal_size().columns
+            # Wrapped rows would shift everything below them; keep one screen row per line.
+            frame = [line[:width] for line in (*lines, "", status)]
+            payload, rows = self._diff(frame)
+        else:
+            frame = list(lines)
+            rows = len(frame) if frame != self._previous else 0
+            payload = "\n".join([*frame, status, ""]) if rows else ""
+        self._previous = frame
+        if payload:
+            self.stream.write(payload)
+            self.stream.flush()
+            self.stats.writes += 1
+            self.stats.rows_written += rows
+            self.stats.bytes_written += len(payload)
+        return rows
+
+    def close(self) -> None:
+        if self.ansi and self._previous is not None:
+            self.stream.write(f"\x1b[{len(self._previous) + 1};1H{SHOW_CURSOR}")
+            self.stream.flush()
+
+    def _diff(self, frame: List[str]) -> tuple[str, int]:
+        previous = self._previous
+        parts: List[str] = []
+        if previous is None:
+            parts.append(HIDE_CURSOR + CLEAR_SCREEN)
+            previous = []
+        changed = [index for index, line in enumerate(frame) if index >= len(previous) or previous[index] != line]
+        for index in changed:
+            parts.append(f"\x1b[{index + 1};1H{frame[index]}{CLEAR_LINE}")
+        if len(frame) < len(previous):
+            parts.append(f"\x1b[{len(frame) + 1};1H{CLEAR_BELOW}")
+        return "".join(parts), len(changed)
+
+
+async def watch_dashboard(
+    api: AsyncKursachApi,
+    renderer: FrameRenderer,
+    *,
+    interval: float,
+    iterations: int | None = None,
+) -> WatchStats:
+    """Refresh the dashboard every ``interval`` seconds; a failed refresh only updates the status row."""
+    frame: List[str] = []
+    refresh = 0
+    while iterations is None or refresh < iterations:
+        started = time.monotonic()
+        refresh += 1
+        try:
+            dashboard, sell_overview = await fetch_dashboard_bundle(api)
+        except ApiError as exc:
+            renderer.stats.errors += 1
+            LOG.debug("Dashboard refresh #%s failed: %s", refresh, exc)
+            status = f"Refresh failed at {time.strftime('%H:%M:%S')}: {exc} | retrying every {interval:g}s"
+        else:
+            frame = dashboard_lines(dashboard, sell_overview)
+            status = f"Updated {time.strftime('%H:%M:%S')} | every {interval:g}s | Ctrl+C to stop"
+        renderer.render(frame, status)
+        if iterations is None or refresh < iterations:
+            await asyncio.sleep(max(0.0, interval - (time.monotonic() - started)))
+    return renderer.stats
+
+
+__all__ = ["FrameRenderer", "WatchStats", "watch_cache", "watch_dashboard"]
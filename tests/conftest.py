@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+from typing import Callable, Dict, List
+
+import httpx
+import pytest
+
+from kursach_desktop.api import KursachApi
+from kursach_desktop.config import AppConfig
+from kursach_desktop.fake_backend import FakeBackend, FakeBackendConfig
+from kursach_desktop.state import DesktopStateStore
+
+
+BASE_URL = "http://fake-backend"
+
+
+class FlakyTransport(httpx.BaseTransport):
+    """Fails the first ``failures`` requests to ``route`` ("METHOD /path"), then serves them from ``backend``.
+
+    ``mode="status"`` answers 503 without touching the backend; ``mode="lost"``
+    lets the backend handle the request and then drops the response, like a
+    connection reset on the way back.
+    """
+
+    def __init__(self, backend: FakeBackend, route: str, failures: int, *, mode: str = "status") -> None:
+        self.backend = backend
+        self.route = route
+        self.failures = failures
+        self.mode = mode
+        self.calls: Dict[str, int] = {}
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        route = f"{request.method} {request.url.path}"
+        self.calls[route] = self.calls.get(route, 0) + 1
+        if route == self.route and self.failures > 0:
+            self.failures -= 1
+            if self.mode == "status":
+                return httpx.Response(503, json={"detail": "Injected failure"})
+            self.backend.handle(request)
+            raise httpx.ReadError("connection reset", request=request)
+        return self.backend.handle(request)
+
+
+class Clock:
+    """Manually advanced time source for ``clock=`` parameters."""
+
+    def __init__(self, now: float = 0.0) -> None:
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def backend() -> FakeBackend:
+    return FakeBackend(FakeBackendConfig(seed=7))
+
+
+@pytest.fixture
+def make_api(backend: FakeBackend) -> Callable[..., KursachApi]:
+    """Build a logged-in ``KursachApi`` on the fake backend; ``transport=`` overrides the in-memory one."""
+    clients: List[httpx.Client] = []
+
+    def make(*, transport: httpx.BaseTransport | None = None, **kwargs) -> KursachApi:
+        client = httpx.Client(base_url=BASE_URL, transport=transport or backend.transport())
+        clients.append(client)
+        return KursachApi(BASE_URL, token=backend.issue_token(), client=client, **kwargs)
+
+    yield make
+    for client in clients:
+        client.close()
+
+
+@pytest.fixture
+def config() -> AppConfig:
+    return AppConfig(api_base_url=BASE_URL, device_id="test-device", command_workers=4)
+
+
+@pytest.fixture
+def state_store(tmp_path, backend: FakeBackend) -> DesktopStateStore:
+    store = DesktopStateStore(tmp_path / "device_state.json")
+    store.set_token(backend.issue_token())
+    yield store
+    store.close()
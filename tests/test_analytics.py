@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import asyncio
+import math
+
+import httpx
+import numpy as np
+import pytest
+
+from kursach_desktop.analytics import (
+    align_histories,
+    compute_analytics,
+    fetch_histories,
+    history_arrays,
+    portfolio_value_curve,
+)
+from kursach_desktop.api import AsyncKursachApi
+from kursach_desktop.history import PriceHistory
+
+from .conftest import BASE_URL
+
+
+DAY = 86400
+START = 1_700_000_000 // DAY * DAY
+
+
+def _history(prices, start: int = START) -> list:
+    return [{"timestamp": (start + index * DAY) * 1000, "price": price} for index, price in enumerate(prices)]
+
+
+def _overview(*holdings) -> dict:
+    return {
+        "holdings": [
+            {"id": asset_id, "symbol": asset_id.upper(), "quantity": quantity, "current_price": price, "avg_buy_price": cost}
+            for asset_id, quantity, price, cost in holdings
+        ]
+    }
+
+
+def test_var_and_cvar_replay_historical_returns() -> None:
+    overview = _overview(("btc", 1, 100.0, 80.0), ("eth", 5, 20.0, 25.0))
+    histories = {
+        "btc": _history([100, 110, 99, 99]),
+        "eth": PriceHistory.from_points("eth", _history([20, 22, 19.8, 19.8])),
+    }
+
+    analytics = compute_analytics(overview, histories, step=DAY, confidence_levels=(0.95,))
+
+    assert analytics.total_value == pytest.approx(200.0)
+    assert analytics.total_pnl == pytest.approx(20.0 - 25.0)
+    assert analytics.weights.tolist() == pytest.approx([0.5, 0.5])
+    assert analytics.observations == 3
+    # Scenario PnL is [+20, -20, 0]; the 5% quantile interpolates to -18.
+    assert analytics.var[0.95] == pytest.approx(18.0)
+    assert analytics.cvar[0.95] == pytest.approx(20.0)
+    assert analytics.volatility[0] == pytest.approx(0.1 * math.sqrt(365))
+    assert analytics.top_correlations() == [("BTC", "ETH", pytest.approx(1.0))]
+
+
+def test_short_history_leaves_risk_figures_empty() -> None:
+    analytics = compute_analytics(_overview(("btc", 2, 50.0, 50.0)), {"btc": _history([50, 51])}, step=DAY)
+
+    assert analytics.observations == 1
+    assert analytics.var == {} and analytics.cvar == {}
+    assert np.isnan(analytics.volatility).all()
+    assert analytics.total_value == pytest.approx(100.0)
+
+
+def test_align_starts_at_the_latest_series_and_carries_prices_forward() -> None:
+    early = history_arrays(_history([1, 2, 3, 4]))
+    late = history_arrays([[START + 2 * DAY, 30], [START + 3.5 * DAY, 40]])
+
+    grid, matrix = align_histories([early, late], DAY)
+
+    assert grid.tolist() == [START + 2 * DAY, START + 3 * DAY, START + 3.5 * DAY]
+    assert matrix.tolist() == [[3, 30], [4, 30], [4, 40]]
+
+
+def test_history_arrays_sorts_and_drops_unusable_points() -> None:
+    times, prices = history_arrays(
+        [{"timestamp": "2024-01-02T00:00:00Z", "price": 2}, {"time": "2024-01-01T00:00:00Z", "price": "1"}, {"price": 3}]
+    )
+    assert prices.tolist() == [1.0, 2.0]
+    assert times[1] - times[0] == DAY
+
+
+def test_value_curve_prices_todays_quantities_and_skips_missing_assets() -> None:
+    overview = _overview(("btc", 2, 99.0, 80.0), ("eth", 10, 20.0, 25.0), ("doge", 100, 0.1, 0.1))
+    histories = {"btc": _history([100, 110, 99]), "eth": _history([20, 22, 19.8]), "doge": None}
+
+    curve = portfolio_value_curve(overview, histories, step=DAY)
+
+    assert curve.values.tolist() == pytest.approx([400.0, 440.0, 396.0])
+    assert curve.missing == ["DOGE"]
+    assert curve.change_pct == pytest.approx(-1.0)
+
+
+def test_histories_are_fetched_concurrently_and_unknown_assets_are_skipped(backend) -> None:
+    backend.config.latency_seconds = 0.05
+    asset_ids = ["bitcoin", "ethereum", "solana", "bitcoin", "no-such-coin"]
+
+    async def run(concurrency: int):
+        async with httpx.AsyncClient(base_url=BASE_URL, transport=backend.async_transport()) as client:
+            api = AsyncKursachApi(BASE_URL, token=backend.issue_token(), client=client)
+            loop = asyncio.get_running_loop()
+            started = loop.time()
+            histories = await fetch_histories(api, asset_ids, days=2, concurrency=concurrency)
+            return histories, loop.time() - started
+
+    histories, elapsed = asyncio.run(run(8))
+    assert list(histories) == ["bitcoin", "ethereum", "solana", "no-such-coin"]
+    assert histories["no-such-coin"] is None
+    assert len(histories["bitcoin"]) == 48
+    assert backend.request_counts["GET /crypto/history/{asset_id}"] == 4
+    assert elapsed < asyncio.run(run(1))[1] / 2
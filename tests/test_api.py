@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import asyncio
+
+import httpx
+import pytest
+
+from kursach_desktop.api import ApiError, AsyncKursachApi, KursachApi, fetch_dashboard_bundle, get_dashboard_bundle
+from kursach_desktop.metrics import MetricsRegistry
+
+from .conftest import BASE_URL
+
+
+class BrokenBody(httpx.SyncByteStream):
+    def __iter__(self):
+        yield b'{"items": [{"id": 1}'
+        raise httpx.ReadError("connection reset")
+
+
+def test_stream_broken_mid_body_is_recorded_once_as_a_network_error() -> None:
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, stream=BrokenBody()))
+    metrics = MetricsRegistry()
+    with httpx.Client(base_url=BASE_URL, transport=transport) as client:
+        api = KursachApi(BASE_URL, token="t", client=client, metrics=metrics)
+        with pytest.raises(ApiError) as excinfo:
+            with api.stream_transactions() as response:
+                for _ in response.iter_bytes():
+                    pass
+
+    assert excinfo.value.status_code == -1
+    text = metrics.render()
+    assert 'kursach_http_network_errors_total{method="GET",route="/crypto/transactions",error="ReadError"} 1' in text
+    assert 'status="200"' not in text
+
+
+def test_dashboard_bundle_fetches_both_endpoints(backend, make_api) -> None:
+    dashboard, overview = get_dashboard_bundle(make_api())
+
+    assert dashboard["cash_balance"] == overview["cash_balance"] == backend.cash_balance
+    assert backend.request_counts["GET /crypto/dashboard"] == backend.request_counts["GET /crypto/sell/overview"] == 1
+
+
+def test_async_dashboard_bundle_overlaps_the_requests(backend) -> None:
+    backend.config.latency_seconds = 0.05
+
+    async def run() -> float:
+        async with httpx.AsyncClient(base_url=BASE_URL, transport=backend.async_transport()) as client:
+            api = AsyncKursachApi(BASE_URL, token=backend.issue_token(), client=client)
+            loop = asyncio.get_running_loop()
+            started = loop.time()
+            dashboard, overview = await fetch_dashboard_bundle(api)
+            assert dashboard["portfolio_balance"] > overview["cash_balance"]
+            return loop.time() - started
+
+    assert asyncio.run(run()) < 0.09
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from typing import Any, List, Tuple
+
+import httpx
+import pytest
+
+from kursach_desktop.api import AsyncKursachApi
+from kursach_desktop.batch import OrderFileError, execute_orders, load_orders, preview_orders
+
+from .conftest import BASE_URL
+
+
+class RecordingApi(AsyncKursachApi):
+    """Logs every preview/sell and yields to the loop, so overlapping calls show up in ``calls``."""
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.calls: List[Tuple[str, str, float | None]] = []
+
+    async def preview_sell(self, **kwargs: Any) -> Any:
+        self.calls.append(("preview", kwargs["asset_id"], kwargs["quantity"]))
+        await asyncio.sleep(0.005)
+        return await super().preview_sell(**kwargs)
+
+    async def execute_sell(self, **kwargs: Any) -> Any:
+        self.calls.append(("sell", kwargs["asset_id"], kwargs["quantity"]))
+        await asyncio.sleep(0.005)
+        return await super().execute_sell(**kwargs)
+
+
+def _run(backend, orders, **kwargs) -> Tuple[list, RecordingApi]:
+    async def run():
+        async with httpx.AsyncClient(base_url=BASE_URL, transport=backend.async_transport()) as client:
+            api = RecordingApi(BASE_URL, token=backend.issue_token(), client=client)
+            outcomes = await preview_orders(api, orders)
+            api.calls.clear()
+            return await execute_orders(api, outcomes, **kwargs), api
+
+    return asyncio.run(run())
+
+
+def test_csv_orders_are_numbered_by_position_and_validated(tmp_path) -> None:
+    path = tmp_path / "orders.csv"
+    path.write_text("asset_id,quantity,amount_usd,source\nbitcoin,0.1,,\nethereum,,50,best\n", encoding="utf-8")
+
+    first, second = load_orders(path, default_source="coingecko")
+    assert (first.number, first.source, first.quantity) == (1, "coingecko", 0.1)
+    assert (second.number, second.source, second.amount_usd) == (2, "best", 50.0)
+
+    path.write_text("asset_id,quantity\nbitcoin,0.1\nethereum,\n", encoding="utf-8")
+    with pytest.raises(OrderFileError, match="Order #2 .*quantity or amount_usd"):
+        load_orders(path)
+
+
+def test_json_orders_accept_a_wrapper_object(tmp_path) -> None:
+    path = tmp_path / "orders.json"
+    path.write_text(json.dumps({"orders": [{"asset_id": "solana", "quantity": "2"}]}), encoding="utf-8")
+    (order,) = load_orders(path)
+    assert (order.asset_id, order.quantity, order.number) == ("solana", 2.0, 1)
+
+    path.write_text(json.dumps([{"asset_id": "solana", "quantity": 1, "source": "nowhere"}]), encoding="utf-8")
+    with pytest.raises(OrderFileError, match="unknown price source"):
+        load_orders(path)
+
+
+def test_orders_for_one_asset_execute_in_file_order(backend, tmp_path) -> None:
+    path = tmp_path / "orders.json"
+    rows = [
+        {"asset_id": "bitcoin", "quantity": 0.1},
+        {"asset_id": "ethereum", "quantity": 0.2},
+        {"asset_id": "bitcoin", "quantity": 0.3},
+        {"asset_id": "bitcoin", "quantity": 5000},
+        {"asset_id": "bitcoin", "quantity": 0.4},
+    ]
+    path.write_text(json.dumps(rows), encoding="utf-8")
+
+    outcomes, api = _run(backend, load_orders(path))
+
+    assert [call[2] for call in api.calls if call[1] == "bitcoin"] == [0.1, 0.3, 0.4]
+    # Sells of different assets overlap instead of queueing behind each other.
+    assert [call[1] for call in api.calls[:2]] == ["bitcoin", "ethereum"]
+    assert [outcome.ok for outcome in outcomes] == [True, True, True, False, True]
+    assert outcomes[3].result is None
+    assert backend.holdings["bitcoin"] == pytest.approx(1_000.0 - 0.8)
+
+
+def test_stale_best_quotes_are_refreshed_within_the_concurrency_limit(backend, tmp_path) -> None:
+    path = tmp_path / "orders.json"
+    assets = ["bitcoin", "ethereum", "solana"]
+    path.write_text(json.dumps([{"asset_id": a, "quantity": 0.1, "source": "best"} for a in assets]), encoding="utf-8")
+
+    outcomes, api = _run(backend, load_orders(path), concurrency=1, best_max_age=-1)
+
+    assert all(outcome.result is not None for outcome in outcomes)
+    # With one slot, each order's re-quote and sell finish before the next order starts.
+    order = [asset for _, asset, _ in api.calls]
+    assert order == sorted(order, key=order.index)
+    assert [kind for kind, asset, _ in api.calls if asset == "bitcoin"] == ["preview", "preview", "sell"]
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+from kursach_desktop.cache import ResponseCache
+
+from .conftest import Clock
+
+
+DASHBOARD = "GET /crypto/dashboard"
+
+
+def test_fresh_entries_are_served_from_memory(backend, make_api) -> None:
+    api = make_api(cache=ResponseCache(clock=Clock(1_000.0)))
+    first = api.get_dashboard()
+    first["cash_balance"] = -1
+    second = api.get_dashboard()
+
+    assert backend.request_counts[DASHBOARD] == 1
+    assert second["cash_balance"] == backend.cash_balance
+    assert api.cache.stats()["hits"] == 1
+
+
+def test_stale_entries_are_revalidated_with_etag(backend, make_api) -> None:
+    clock = Clock(1_000.0)
+    api = make_api(cache=ResponseCache(clock=clock))
+    first = api.get_dashboard()
+    clock.now += 60
+    second = api.get_dashboard()
+
+    assert backend.request_counts[DASHBOARD] == 2
+    assert api.cache.stats()["revalidations"] == 1
+    assert second == first
+    # A 304 renews the TTL, so the next call is a plain hit again.
+    api.get_dashboard()
+    assert backend.request_counts[DASHBOARD] == 2
+
+
+def test_changed_resource_is_refetched_after_expiry(backend, make_api) -> None:
+    clock = Clock(1_000.0)
+    api = make_api(cache=ResponseCache(clock=clock))
+    api.get_dashboard()
+    backend.cash_balance += 100
+    clock.now += 60
+
+    assert api.get_dashboard()["cash_balance"] == backend.cash_balance
+    assert api.cache.stats()["revalidations"] == 0
+
+
+def test_sell_invalidates_cached_reads(backend, make_api) -> None:
+    api = make_api(cache=ResponseCache(clock=Clock(1_000.0)))
+    before = api.get_sell_overview()
+    api.execute_sell(asset_id="bitcoin", quantity=1.0, amount_usd=None, price_source="coincap")
+    after = api.get_sell_overview()
+
+    assert backend.request_counts["GET /crypto/sell/overview"] == 2
+    assert after["cash_balance"] > before["cash_balance"]
+    assert api.cache.stats()["entries"] == 1
+
+
+def test_entries_are_scoped_to_the_token(backend, make_api) -> None:
+    cache = ResponseCache(clock=Clock(1_000.0))
+    make_api(cache=cache).get_dashboard()
+    make_api(cache=cache).get_dashboard()
+
+    assert backend.request_counts[DASHBOARD] == 2
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import replace
+
+import pytest
+
+from kursach_desktop.cli import AppContext
+from kursach_desktop.config import load_config
+from kursach_desktop.daemon import (
+    DaemonError,
+    DesktopDaemon,
+    config_fingerprint,
+    forward,
+    is_forwardable,
+    request_daemon,
+)
+
+from .conftest import BASE_URL
+
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="needs Unix domain sockets")
+
+
+@pytest.fixture
+def daemon(tmp_path, monkeypatch, backend, make_api, state_store):
+    monkeypatch.setenv("KURSACH_API_BASE_URL", BASE_URL)
+    monkeypatch.setenv("KURSACH_DAEMON", "1")
+    monkeypatch.setenv("KURSACH_DAEMON_SOCKET", str(tmp_path / "d.sock"))
+    context = AppContext(config=load_config(), state_store=state_store)
+    context.__dict__["api"] = make_api()
+    daemon = DesktopDaemon(context, context.config.daemon_socket_path())
+    thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 5
+    while True:
+        try:
+            request_daemon(context.config, "ping")
+            break
+        except DaemonError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.01)
+    yield daemon
+    if thread.is_alive():
+        request_daemon(context.config, "stop")
+        thread.join(5)
+
+
+def _exchange(daemon: DesktopDaemon, request: dict, answers=()) -> list:
+    answers = iter(answers)
+    messages = []
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(5)
+        sock.connect(str(daemon.path))
+        sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        with sock.makefile("rb") as replies:
+            for raw in replies:
+                message = json.loads(raw)
+                messages.append(message)
+                if "read" in message:
+                    sock.sendall(json.dumps({"line": next(answers)}).encode("utf-8") + b"\n")
+                if "exit" in message or "fallback" in message:
+                    break
+    return messages
+
+
+def _command(daemon: DesktopDaemon, argv: list) -> dict:
+    return {"argv": argv, "cwd": os.getcwd(), "tty": False, "config": config_fingerprint(daemon.context.config)}
+
+
+def _stdout(messages: list) -> str:
+    return "".join(message.get("out", "") for message in messages)
+
+
+def test_fingerprint_ignores_local_settings() -> None:
+    config = load_config()
+    assert config_fingerprint(config) == config_fingerprint(replace(config, metrics_port=9999, daemon_socket="/x"))
+    assert config_fingerprint(config) != config_fingerprint(replace(config, api_base_url="http://elsewhere"))
+
+
+def test_only_short_lived_commands_are_forwarded() -> None:
+    assert is_forwardable(["sell", "preview", "--asset-id", "bitcoin"])
+    assert not is_forwardable(["dashboard", "--watch"])
+    assert not is_forwardable(["poll"])
+    assert not is_forwardable(["--verbose", "status"])
+    assert not is_forwardable([])
+
+
+def test_command_output_and_exit_code_come_back(daemon) -> None:
+    messages = _exchange(daemon, _command(daemon, ["status"]))
+
+    assert messages[-1] == {"exit": 0}
+    assert "Token stored: yes" in _stdout(messages)
+    assert request_daemon(daemon.context.config, "ping")["commands"] == 1
+
+
+def test_prompts_are_answered_by_the_client(daemon, backend) -> None:
+    argv = ["sell", "execute", "--asset-id", "bitcoin", "--quantity", "1"]
+
+    declined = _exchange(daemon, _command(daemon, argv), answers=["n\n"])
+    assert "Cancelled." in _stdout(declined) and declined[-1] == {"exit": 0}
+    assert backend.holdings["bitcoin"] == pytest.approx(1000.0)
+
+    accepted = _exchange(daemon, _command(daemon, argv), answers=["y\n"])
+    assert accepted[-1] == {"exit": 0}
+    assert backend.holdings["bitcoin"] == pytest.approx(999.0)
+
+
+def test_a_different_configuration_falls_back_to_the_client(daemon) -> None:
+    request = {**_command(daemon, ["status"]), "config": "{}"}
+    assert list(_exchange(daemon, request)[0]) == ["fallback"]
+
+
+def test_cli_forwards_to_a_running_daemon(daemon, tmp_path) -> None:
+    result = subprocess.run(
+        [sys.executable, "-m", "kursach_desktop", "status"],
+        cwd=tmp_path,
+        env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)},
+        capture_output=True,
+        text=True,
+        timeout=30,
+    )
+
+    assert result.returncode == 0, result.stderr
+    # The token lives only in the daemon's state store.
+    assert "Token stored: yes" in result.stdout
+    assert daemon.requests == 1
+
+
+def test_no_daemon_means_run_in_process(tmp_path, monkeypatch) -> None:
+    monkeypatch.setenv("KURSACH_DAEMON_SOCKET", str(tmp_path / "missing.sock"))
+    assert forward(["status"]) is None
+    monkeypatch.setenv("KURSACH_DAEMON", "0")
+    assert forward(["status"]) is None
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from kursach_desktop.export import JsonArrayStream, export_transactions
+
+
+ITEMS = [
+    {"id": 1, "symbol": "BTC", "note": 'quote " and \\ backslash', "tags": ["a", "]"]},
+    {"id": 2, "symbol": "ETH", "nested": {"deep": [{"x": "}"}]}, "name": "Эфир"},
+    {"id": 3, "symbol": "SOL", "empty": {}},
+]
+
+
+def _feed_in_chunks(text: str, size: int, keys=None):
+    parser = JsonArrayStream() if keys is None else JsonArrayStream(keys)
+    items = []
+    for start in range(0, len(text), size):
+        items.extend(parser.feed(text[start : start + size]))
+    return items, parser.close()
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 7, 16, 64, 10_000])
+def test_wrapped_array_parses_identically_for_any_chunking(size: int) -> None:
+    document = json.dumps({"total": 3, "items": ITEMS, "next_cursor": "abc", "meta": {"items": [1]}}, ensure_ascii=False)
+
+    items, meta = _feed_in_chunks(document, size)
+
+    assert items == ITEMS
+    assert meta == {"total": 3, "items": [], "next_cursor": "abc", "meta": {"items": [1]}}
+
+
+@pytest.mark.parametrize("size", [1, 4, 9, 10_000])
+def test_bare_array(size: int) -> None:
+    items, meta = _feed_in_chunks(json.dumps(ITEMS), size)
+    assert items == ITEMS
+    assert meta == {}
+
+
+def test_items_are_yielded_as_soon_as_they_complete() -> None:
+    parser = JsonArrayStream()
+    first = json.dumps(ITEMS[0])
+    assert parser.feed('{"items": [' + first[:-1]) == []
+    assert parser.feed(first[-1] + ", ") == [ITEMS[0]]
+
+
+def test_only_the_configured_keys_hold_items() -> None:
+    document = json.dumps({"other": [{"id": 9}], "transactions": [{"id": 1}]})
+    items, meta = _feed_in_chunks(document, 5)
+    assert items == [{"id": 1}]
+    assert meta["other"] == [{"id": 9}]
+
+
+def test_truncated_document_is_rejected() -> None:
+    parser = JsonArrayStream()
+    parser.feed('{"items": [{"id": 1}, {"id"')
+    with pytest.raises(ValueError):
+        parser.close()
+
+
+def test_export_follows_pages_into_ndjson(backend, make_api, tmp_path) -> None:
+    api = make_api()
+    for _ in range(3):
+        api.execute_sell(asset_id="bitcoin", quantity=0.1, amount_usd=None, price_source="coincap")
+    output = tmp_path / "transactions.ndjson"
+
+    report = export_transactions(api, output, page_size=3)
+
+    rows = [json.loads(line) for line in output.read_text(encoding="utf-8").splitlines()]
+    assert report.rows == len(rows) == len(backend.config.holdings) + 3
+    assert report.pages == 3
+    assert len({row["id"] for row in rows}) == len(rows)
+    assert not (tmp_path / "transactions.ndjson.checkpoint").exists()
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import pytest
+
+from kursach_desktop.history import DAY_MS, HEADER, RECORD, HistoryStore, PriceHistory, normalize_points
+
+
+NOW = 1_700_000_000.0
+NOW_MS = int(NOW * 1000)
+HOUR_MS = 3_600_000
+
+
+def _points(start_ms: int, count: int, step_ms: int = HOUR_MS) -> list:
+    return [{"timestamp": start_ms + index * step_ms, "price": 100.0 + index} for index in range(count)]
+
+
+def test_refresh_appends_only_newer_points(tmp_path) -> None:
+    store = HistoryStore(tmp_path)
+    first = _points(NOW_MS - 7 * DAY_MS, 7 * 24)
+    assert store.merge("bitcoin", 7, first, fetched_days=7, now=NOW) == 168
+
+    later = NOW + 3 * 3600
+    assert store.missing_days("bitcoin", 7, now=later) == 1
+    tail = _points(NOW_MS - DAY_MS, 27)
+    assert store.merge("bitcoin", 7, tail, fetched_days=1, now=later) == 3
+
+    history = store.read("bitcoin", 7, now=later)
+    timestamps = [timestamp for timestamp, _ in history]
+    assert timestamps == sorted(set(timestamps))
+    assert history.last == (NOW_MS + 2 * HOUR_MS, 126.0)
+    assert store.missing_days("bitcoin", 7, now=NOW + 2.5 * 3600) == 0
+    history.close()
+
+
+def test_torn_append_is_ignored_and_overwritten(tmp_path) -> None:
+    store = HistoryStore(tmp_path)
+    store.merge("bitcoin", 7, _points(NOW_MS - DAY_MS, 24), fetched_days=7, now=NOW)
+    path = store.path_for("bitcoin", 7)
+    # Records written, header count not yet bumped, plus half a record.
+    with open(path, "ab") as handle:
+        handle.write(RECORD.pack(NOW_MS + HOUR_MS, 999.0))
+        handle.write(b"\x00" * (RECORD.size // 2))
+
+    history = store.read("bitcoin", 7, now=NOW)
+    assert len(history) == 24
+    assert history.last[1] == 123.0
+    history.close()
+
+    assert store.merge("bitcoin", 7, _points(NOW_MS, 2), fetched_days=1, now=NOW + 3600) == 2
+    assert path.stat().st_size == HEADER.size + 26 * RECORD.size
+    history = store.read("bitcoin", 7, now=NOW + 3600)
+    assert [price for _, price in history][-2:] == [100.0, 101.0]
+    history.close()
+
+
+def test_header_count_beyond_the_file_is_clamped(tmp_path) -> None:
+    store = HistoryStore(tmp_path)
+    store.merge("bitcoin", 7, _points(NOW_MS - DAY_MS, 24), fetched_days=7, now=NOW)
+    path = store.path_for("bitcoin", 7)
+    with open(path, "r+b") as handle:
+        handle.truncate(HEADER.size + 10 * RECORD.size)
+
+    history = store.read("bitcoin", 7, now=NOW)
+    assert len(history) == 10
+    history.close()
+
+
+def test_unreadable_file_is_refetched(tmp_path) -> None:
+    store = HistoryStore(tmp_path)
+    path = store.path_for("bitcoin", 7)
+    path.write_bytes(b"not a history file at all, definitely")
+
+    assert store.missing_days("bitcoin", 7, now=NOW) == 7
+    assert len(store.read("bitcoin", 7, now=NOW)) == 0
+
+
+def test_mapped_arrays_match_the_records(tmp_path) -> None:
+    np = pytest.importorskip("numpy")
+    store = HistoryStore(tmp_path)
+    points = _points(NOW_MS - 7 * DAY_MS, 7 * 24)
+    store.merge("bitcoin", 7, points, fetched_days=7, now=NOW)
+
+    history = store.read("bitcoin", 2, now=NOW)
+    timestamps, prices = history.arrays()
+    assert len(timestamps) == len(history) == 2 * 24
+    assert timestamps[0] >= NOW_MS - 2 * DAY_MS
+    assert np.array_equal(prices, [price for _, price in history])
+    assert history.to_points() == PriceHistory.from_points("bitcoin", history.to_points()).to_points()
+    del timestamps, prices
+    history.close()
+
+
+def test_normalize_points_sorts_dedupes_and_drops_bad_rows() -> None:
+    payload = {"prices": [[2_000_000_000_000, "2"], [1_000_000_000, 1.0], [1_000_000_000_000, 3.0], ["x", 1], [5, -1]]}
+    assert normalize_points(payload) == [(1_000_000_000_000, 3.0), (2_000_000_000_000, 2.0)]
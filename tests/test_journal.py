@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from kursach_desktop.commands import DeviceCommandDispatcher
+from kursach_desktop.journal import ACKED, EXECUTED, RECEIVED, STARTED, CommandJournal
+from kursach_desktop.poller import CommandPoller
+
+from .conftest import FlakyTransport
+
+
+def _events(path) -> list:
+    return [json.loads(line)["event"] for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_torn_trailing_line_is_discarded(tmp_path) -> None:
+    path = tmp_path / "journal.jsonl"
+    journal = CommandJournal(path)
+    journal.record(1, RECEIVED)
+    journal.record(1, STARTED)
+    journal.close()
+    with open(path, "a", encoding="utf-8") as handle:
+        handle.write('{"id":1,"event":"exec')
+
+    journal = CommandJournal(path)
+    assert journal.get(1).event == STARTED
+    journal.record(1, EXECUTED, "ACKNOWLEDGED")
+    journal.close()
+    assert _events(path) == [RECEIVED, STARTED, EXECUTED]
+
+
+def test_admit_replays_finished_commands_and_fails_interrupted_sells(tmp_path) -> None:
+    journal = CommandJournal(tmp_path / "journal.jsonl")
+    assert journal.admit(1) is None
+    journal.record(1, STARTED, action="EXECUTE_DESKTOP_SELL")
+    journal.record(1, EXECUTED, "FAILED")
+    journal.record(2, STARTED, action="EXECUTE_DESKTOP_SELL")
+    journal.record(3, STARTED, action="OPEN_DESKTOP_DASHBOARD")
+
+    assert journal.admit(1) == "FAILED"
+    # The sell may or may not have gone through: report it rather than sell twice.
+    assert journal.admit(2) == "FAILED"
+    assert journal.get(2).event == EXECUTED
+    # Rendering the dashboard again is harmless.
+    assert journal.admit(3) is None
+    journal.close()
+
+
+def test_interrupted_sells_rerun_only_when_the_backend_dedupes(tmp_path) -> None:
+    path = tmp_path / "journal.jsonl"
+    journal = CommandJournal(path)
+    journal.record(1, STARTED, action="EXECUTE_DESKTOP_SELL")
+    journal.record(2, STARTED, action="REQUEST_DESKTOP_SELL")
+    journal.close()
+
+    journal = CommandJournal(path, rerun_sells=True)
+    assert journal.get(1).action == "EXECUTE_DESKTOP_SELL"
+    assert journal.admit(1) is None
+    assert journal.admit(2) == "FAILED"
+    journal.close()
+
+
+def test_recover_returns_unacked_results_and_fails_interrupted_sells(tmp_path) -> None:
+    path = tmp_path / "journal.jsonl"
+    journal = CommandJournal(path)
+    journal.record(1, EXECUTED, "ACKNOWLEDGED")
+    journal.record(2, EXECUTED, "FAILED")
+    journal.record(2, ACKED, "FAILED")
+    journal.record(3, STARTED, action="EXECUTE_DESKTOP_SELL")
+    journal.record(4, STARTED, action="OPEN_DESKTOP_DASHBOARD")
+    journal.close()
+
+    journal = CommandJournal(path)
+    assert journal.recover() == [(1, "ACKNOWLEDGED"), (3, "FAILED")]
+    # Left for redelivery, which runs it again.
+    assert journal.get(4).in_doubt
+    journal.close()
+
+
+def test_compaction_keeps_latest_event_per_command(tmp_path) -> None:
+    path = tmp_path / "journal.jsonl"
+    journal = CommandJournal(path, compact_after=10)
+    for command_id in range(1, 5):
+        for event in (RECEIVED, STARTED, EXECUTED, ACKED):
+            journal.record(command_id, event, "ACKNOWLEDGED" if event in (EXECUTED, ACKED) else None)
+    journal.close()
+
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert len(lines) < 16
+    journal = CommandJournal(path)
+    assert [journal.get(command_id).event for command_id in range(1, 5)] == [ACKED] * 4
+    journal.close()
+
+
+def _poller(api, state_store, config, journal) -> CommandPoller:
+    dispatcher = DeviceCommandDispatcher(api, state_store, config, auto_confirm=True)
+    return CommandPoller(api, dispatcher, state_store, config, journal=journal)
+
+
+def test_restart_resends_lost_ack_without_executing_again(backend, make_api, state_store, config, tmp_path) -> None:
+    command_id = backend.enqueue_command("EXECUTE_DESKTOP_SELL", {"asset_id": "bitcoin", "quantity": 0.5})
+    ack_route = f"POST /crypto/device-commands/{command_id}/ack"
+    journal = CommandJournal(tmp_path / "journal.jsonl")
+    _poller(make_api(transport=FlakyTransport(backend, ack_route, 1)), state_store, config, journal).run(once=True)
+    journal.close()
+    assert backend.holdings["bitcoin"] == pytest.approx(999.5)
+    assert backend.pending_commands() == 1
+
+    journal = CommandJournal(tmp_path / "journal.jsonl")
+    _poller(make_api(), state_store, config, journal).run(once=True)
+
+    assert backend.holdings["bitcoin"] == pytest.approx(999.5)
+    assert backend.pending_commands() == 0
+    assert backend.commands()[0].status == "ACKNOWLEDGED"
+    assert journal.get(command_id).event == ACKED
+    journal.close()
+
+
+def _interrupted_sell(backend, api, state_store, config, journal) -> int:
+    backend.config.redelivery_seconds = 0
+    payload = {"asset_id": "bitcoin", "quantity": 0.5}
+    command_id = backend.enqueue_command("EXECUTE_DESKTOP_SELL", payload)
+    # The sell went through, then the process died before EXECUTED was written.
+    journal.admit(command_id)
+    journal.record(command_id, STARTED, action="EXECUTE_DESKTOP_SELL")
+    command = {"id": command_id, "action": "EXECUTE_DESKTOP_SELL", "payload": payload}
+    DeviceCommandDispatcher(api, state_store, config, auto_confirm=True).handle(command)
+    journal.close()
+    return command_id
+
+
+def test_interrupted_sell_is_acked_failed_not_sold_again(backend, make_api, state_store, config, tmp_path) -> None:
+    api = make_api()
+    command_id = _interrupted_sell(backend, api, state_store, config, CommandJournal(tmp_path / "journal.jsonl"))
+
+    journal = CommandJournal(tmp_path / "journal.jsonl")
+    _poller(api, state_store, config, journal).run(once=True)
+
+    assert backend.holdings["bitcoin"] == pytest.approx(999.5)
+    assert backend.request_counts["POST /crypto/sell"] == 1
+    assert backend.commands()[0].status == "FAILED"
+    assert journal.get(command_id).event == ACKED
+    journal.close()
+
+
+def test_interrupted_sell_is_rerun_with_the_same_idempotency_key_when_the_backend_dedupes(
+    backend, make_api, state_store, config, tmp_path
+) -> None:
+    api = make_api()
+    command_id = _interrupted_sell(backend, api, state_store, config, CommandJournal(tmp_path / "journal.jsonl"))
+
+    journal = CommandJournal(tmp_path / "journal.jsonl", rerun_sells=True)
+    _poller(api, state_store, config, journal).run(once=True)
+
+    assert backend.holdings["bitcoin"] == pytest.approx(999.5)
+    assert backend.idempotent_replays == 1
+    assert backend.commands()[0].status == "ACKNOWLEDGED"
+    assert journal.get(command_id).event == ACKED
+    journal.close()
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import urllib.error
+import urllib.request
+
+import pytest
+
+from kursach_desktop.api import ApiError
+from kursach_desktop.metrics import CONTENT_TYPE, MetricsRegistry, MetricsServer, route_template
+
+
+@pytest.mark.parametrize(
+    ("url", "template"),
+    [
+        ("/crypto/device-commands/42/ack", "/crypto/device-commands/{id}/ack"),
+        ("/crypto/history/bitcoin?days=7", "/crypto/history/{asset_id}"),
+        ("http://backend/crypto/transactions?after_id=10", "/crypto/transactions"),
+        ("", "/"),
+    ],
+)
+def test_route_template(url: str, template: str) -> None:
+    assert route_template(url) == template
+
+
+def test_histograms_render_cumulative_buckets() -> None:
+    registry = MetricsRegistry(buckets=(0.1, 0.01))
+    for seconds in (0.005, 0.05, 0.05, 3.0):
+        registry.observe_request("get", "/crypto/dashboard", 200, seconds)
+
+    text = registry.render()
+    labels = 'method="GET",route="/crypto/dashboard"'
+    assert f'kursach_http_request_duration_seconds_bucket{{{labels},le="0.01"}} 1' in text
+    assert f'kursach_http_request_duration_seconds_bucket{{{labels},le="0.1"}} 3' in text
+    assert f'kursach_http_request_duration_seconds_bucket{{{labels},le="+Inf"}} 4' in text
+    assert f"kursach_http_request_duration_seconds_count{{{labels}}} 4" in text
+    assert f"kursach_http_request_duration_seconds_sum{{{labels}}} 3.105" in text
+    assert "# TYPE kursach_http_responses_total counter" in text
+
+
+def test_label_values_are_escaped() -> None:
+    registry = MetricsRegistry()
+    registry.observe_command('SELL "ALL"\\\n', "failed")
+    assert 'kursach_device_commands_total{action="SELL \\"ALL\\"\\\\\\n",outcome="failed"} 1' in registry.render()
+
+
+def test_client_records_responses_by_route_and_status(backend, make_api) -> None:
+    registry = MetricsRegistry()
+    api = make_api(metrics=registry)
+    api.get_dashboard()
+    api.get_dashboard()
+    with pytest.raises(ApiError):
+        api.acknowledge_command(404, "ACKNOWLEDGED")
+
+    text = registry.render()
+    assert 'kursach_http_responses_total{method="GET",route="/crypto/dashboard",status="200"} 2' in text
+    assert 'kursach_http_responses_total{method="POST",route="/crypto/device-commands/{id}/ack",status="404"} 1' in text
+    assert 'kursach_http_request_duration_seconds_count{method="GET",route="/crypto/dashboard"} 2' in text
+
+
+def test_server_exposes_the_registry(tmp_path) -> None:
+    registry = MetricsRegistry()
+    registry.observe_command("OPEN_DESKTOP_DASHBOARD", "acknowledged")
+    server = MetricsServer(registry, port=0).start()
+    try:
+        with urllib.request.urlopen(server.url, timeout=5) as response:
+            assert response.headers["Content-Type"] == CONTENT_TYPE
+            assert response.read().decode("utf-8") == registry.render()
+        with pytest.raises(urllib.error.HTTPError) as excinfo:
+            urllib.request.urlopen(server.url.replace("/metrics", "/other"), timeout=5)
+        assert excinfo.value.code == 404
+    finally:
+        server.close()
+
+    path = tmp_path / "metrics.prom"
+    registry.write(path)
+    assert path.read_text(encoding="utf-8") == registry.render()
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import asyncio
+
+import httpx
+
+from kursach_desktop.api import AsyncKursachApi
+from kursach_desktop.journal import ACKED, EXECUTED, CommandJournal
+from kursach_desktop.outbox import AckOutbox, AsyncAckOutbox
+
+from .conftest import BASE_URL, FlakyTransport
+
+
+def test_outbox_retries_transient_failures(backend, make_api, tmp_path) -> None:
+    backend.config.error_rate = 0.4
+    command_ids = [backend.enqueue_command("OPEN_DESKTOP_DASHBOARD") for _ in range(20)]
+    journal = CommandJournal(tmp_path / "journal.jsonl")
+    for command_id in command_ids:
+        journal.record(command_id, EXECUTED, "ACKNOWLEDGED")
+    outbox = AckOutbox(make_api(), journal=journal, max_attempts=20, base_delay=0.001, max_delay=0.005)
+    outbox.start()
+    for command_id in command_ids:
+        outbox.submit(command_id, "ACKNOWLEDGED")
+    outbox.close()
+
+    assert backend.injected_errors > 0
+    assert outbox.retries == backend.injected_errors
+    assert (outbox.sent, outbox.dropped, outbox.pending) == (20, 0, 0)
+    assert backend.pending_commands() == 0
+    assert journal.recover() == []
+    assert {journal.get(command_id).event for command_id in command_ids} == {ACKED}
+    journal.close()
+
+
+def test_outbox_gives_up_on_permanent_errors(backend, make_api) -> None:
+    failures = []
+    outbox = AckOutbox(make_api(), base_delay=0.001, on_error=lambda command_id, exc: failures.append(command_id))
+    outbox.start()
+    outbox.submit(404, "ACKNOWLEDGED")
+    outbox.close()
+
+    assert (outbox.sent, outbox.retries, outbox.dropped) == (0, 0, 1)
+    assert failures == [404]
+
+
+def test_outbox_coalesces_a_second_ack_for_a_queued_command(backend, make_api) -> None:
+    command_id = backend.enqueue_command("OPEN_DESKTOP_DASHBOARD")
+    route = f"POST /crypto/device-commands/{command_id}/ack"
+    transport = FlakyTransport(backend, route, 2)
+    outbox = AckOutbox(make_api(transport=transport), base_delay=0.01)
+    outbox.start()
+    outbox.submit(command_id, "ACKNOWLEDGED")
+    outbox.submit(command_id, "ACKNOWLEDGED")
+    outbox.close()
+
+    assert (outbox.sent, outbox.retries, outbox.coalesced) == (1, 2, 1)
+    assert transport.calls[route] == 3
+
+
+def test_outbox_sends_an_ack_with_a_different_status(backend, make_api) -> None:
+    command_id = backend.enqueue_command("OPEN_DESKTOP_DASHBOARD")
+    route = f"POST /crypto/device-commands/{command_id}/ack"
+    transport = FlakyTransport(backend, route, 1)
+    outbox = AckOutbox(make_api(transport=transport), base_delay=0.05)
+    outbox.start()
+    outbox.submit(command_id, "FAILED")
+    outbox.submit(command_id, "ACKNOWLEDGED")
+    outbox.close()
+
+    assert (outbox.sent, outbox.coalesced) == (2, 0)
+
+
+def test_outbox_releases_the_command_when_delivery_blows_up(backend, make_api, tmp_path) -> None:
+    command_id = backend.enqueue_command("OPEN_DESKTOP_DASHBOARD")
+    journal = CommandJournal(tmp_path / "journal.jsonl")
+    outbox = AckOutbox(make_api(), journal=journal)
+    journal.close()
+    for _ in range(2):
+        outbox.start()
+        outbox.submit(command_id, "ACKNOWLEDGED")
+        outbox.close()
+    # The journal write failed after each send; neither left the command stuck as queued.
+    assert (outbox.sent, outbox.coalesced, outbox.pending) == (2, 0, 0)
+
+    def on_error(command_id: int, exc: Exception) -> None:
+        raise RuntimeError("broken callback")
+
+    outbox = AckOutbox(make_api(), on_error=on_error)
+    for _ in range(2):
+        outbox.start()
+        outbox.submit(404, "FAILED")
+        outbox.close()
+    assert (outbox.dropped, outbox.coalesced) == (2, 0)
+
+
+def test_async_outbox_retries_until_delivered(backend) -> None:
+    command_id = backend.enqueue_command("OPEN_DESKTOP_DASHBOARD")
+    route = f"POST /crypto/device-commands/{command_id}/ack"
+
+    async def run() -> AsyncAckOutbox:
+        transport = httpx.MockTransport(FlakyTransport(backend, route, 3).handle_request)
+        async with httpx.AsyncClient(base_url=BASE_URL, transport=transport) as client:
+            api = AsyncKursachApi(BASE_URL, token=backend.issue_token(), client=client)
+            outbox = AsyncAckOutbox(api, base_delay=0.001, max_delay=0.005)
+            outbox.submit(command_id, "FAILED")
+            outbox.submit(command_id, "FAILED")
+            await outbox.close()
+            return outbox
+
+    outbox = asyncio.run(run())
+    assert (outbox.sent, outbox.retries, outbox.coalesced, outbox.pending) == (1, 3, 1, 0)
+    assert backend.commands()[0].status == "FAILED"
@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from typing import Any, Dict, List, Tuple
+
+import httpx
+import pytest
+
+from kursach_desktop.api import AsyncKursachApi
+from kursach_desktop.commands import DeviceCommandDispatcher
+from kursach_desktop.config import DeviceProfile
+from kursach_desktop.outbox import AsyncAckOutbox
+from kursach_desktop.poller import AsyncCommandPoller, CommandPoller, MultiDevicePoller, PollScheduler, plan_stages
+
+from .conftest import BASE_URL
+
+
+def _sell(command_id: int, asset_id: str) -> Dict[str, Any]:
+    return {"id": command_id, "action": "EXECUTE_DESKTOP_SELL", "payload": {"asset_id": asset_id, "quantity": 0.001}}
+
+
+def _ids(stages: List[List[List[Dict[str, Any]]]]) -> List[List[List[int]]]:
+    return [[[command["id"] for command in lane] for lane in stage] for stage in stages]
+
+
+def test_plan_stages_groups_by_asset_and_isolates_barriers() -> None:
+    commands = [
+        _sell(1, "bitcoin"),
+        _sell(2, "ethereum"),
+        _sell(3, "Bitcoin"),
+        {"id": 4, "action": "OPEN_DESKTOP_DASHBOARD"},
+        {"id": 5, "action": "LOGIN_ON_DESKTOP", "payload": {"access_token": "t"}},
+        _sell(6, "ethereum"),
+    ]
+    assert _ids(plan_stages(commands, auto_confirm=True)) == [[[1, 3], [2], [4]], [[5]], [[6]]]
+
+
+def test_plan_stages_makes_confirmed_sells_barriers() -> None:
+    commands = [_sell(1, "bitcoin"), _sell(2, "ethereum"), _sell(3, "solana")]
+    assert _ids(plan_stages(commands, auto_confirm=False)) == [[[1]], [[2]], [[3]]]
+
+
+def _enqueue_mixed_batch(backend) -> str:
+    token = backend.issue_token()
+    backend.enqueue_command("EXECUTE_DESKTOP_SELL", {"asset_id": "bitcoin", "quantity": 0.001})
+    backend.enqueue_command("EXECUTE_DESKTOP_SELL", {"asset_id": "ethereum", "quantity": 0.001})
+    backend.enqueue_command("EXECUTE_DESKTOP_SELL", {"asset_id": "bitcoin", "quantity": 0.001})
+    backend.enqueue_command("OPEN_DESKTOP_DASHBOARD")
+    backend.enqueue_command("LOGIN_ON_DESKTOP", {"access_token": token})
+    backend.enqueue_command("EXECUTE_DESKTOP_SELL", {"asset_id": "ethereum", "quantity": 0.001})
+    backend.enqueue_command("EXECUTE_DESKTOP_SELL", {"asset_id": "bitcoin", "quantity": 0.001})
+    return token
+
+
+def _check_order(events: List[Tuple[str, int, float]]) -> None:
+    started = {command_id: at for kind, command_id, at in events if kind == "start"}
+    ended = {command_id: at for kind, command_id, at in events if kind == "end"}
+    assert sorted(started) == sorted(ended) == [1, 2, 3, 4, 5, 6, 7]
+    # Same asset: strictly in poll order.
+    assert ended[1] <= started[3] and ended[3] <= started[7]
+    assert ended[2] <= started[6]
+    # LOGIN_ON_DESKTOP waits for everything before it and holds back everything after it.
+    assert all(ended[command_id] <= started[5] for command_id in (1, 2, 3, 4))
+    assert all(ended[5] <= started[command_id] for command_id in (6, 7))
+    # Independent lanes of the first stage overlapped.
+    assert started[2] < ended[1] or started[1] < ended[2]
+
+
+class RecordingDispatcher(DeviceCommandDispatcher):
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.events: List[Tuple[str, int, float]] = []
+        self._events_lock = threading.Lock()
+
+    def _mark(self, kind: str, command: Dict[str, Any]) -> None:
+        with self._events_lock:
+            self.events.append((kind, command["id"], time.perf_counter()))
+
+    def handle(self, command: Dict[str, Any]) -> str:
+        self._mark("start", command)
+        time.sleep(0.02)
+        try:
+            return super().handle(command)
+        finally:
+            self._mark("end", command)
+
+    async def handle_async(self, command: Dict[str, Any]) -> str:
+        self._mark("start", command)
+        await asyncio.sleep(0.02)
+        try:
+            return await super().handle_async(command)
+        finally:
+            self._mark("end", command)
+
+
+def test_command_poller_keeps_lane_order_and_barriers(backend, make_api, state_store, config) -> None:
+    token = _enqueue_mixed_batch(backend)
+    api = make_api()
+    dispatcher = RecordingDispatcher(api, state_store, config, auto_confirm=True)
+
+    CommandPoller(api, dispatcher, state_store, config).run(once=True)
+
+    _check_order(dispatcher.events)
+    assert backend.pending_commands() == 0
+    assert {command.status for command in backend.commands()} == {"ACKNOWLEDGED"}
+    assert backend.holdings["bitcoin"] == pytest.approx(1_000.0 - 3 * 0.001)
+    assert state_store.state.last_command_id == 7
+    assert state_store.state.access_token == token
+
+
+def test_async_command_poller_keeps_lane_order_and_barriers(backend, make_api, state_store, config) -> None:
+    _enqueue_mixed_batch(backend)
+
+    async def run() -> List[Tuple[str, int, float]]:
+        async with httpx.AsyncClient(base_url=BASE_URL, transport=backend.async_transport()) as client:
+            async_api = AsyncKursachApi(BASE_URL, token=state_store.state.access_token, client=client)
+            dispatcher = RecordingDispatcher(make_api(), state_store, config, auto_confirm=True, async_api=async_api)
+            await AsyncCommandPoller(async_api, dispatcher, state_store, config).run(once=True)
+            return dispatcher.events
+
+    _check_order(asyncio.run(run()))
+    assert backend.pending_commands() == 0
+    assert {command.status for command in backend.commands()} == {"ACKNOWLEDGED"}
+
+
+def test_concurrent_sells_print_whole_blocks(backend, make_api, state_store, config, capsys) -> None:
+    for asset_id in ("bitcoin", "ethereum", "solana", "cardano"):
+        backend.enqueue_command("EXECUTE_DESKTOP_SELL", {"asset_id": asset_id, "quantity": 0.001})
+    api = make_api()
+    dispatcher = DeviceCommandDispatcher(api, state_store, config, auto_confirm=True)
+
+    CommandPoller(api, dispatcher, state_store, config).run(once=True)
+
+    lines = capsys.readouterr().out.splitlines()
+    previews = [index for index, line in enumerate(lines) if line == ">>> Sell preview"]
+    results = [index for index, line in enumerate(lines) if line == "*** Sell executed ***"]
+    assert len(previews) == len(results) == 4
+    for index in previews:
+        assert [line.split(":")[0] for line in lines[index + 1 : index + 4]] == ["Asset", "Quantity", "Unit price"]
+    for index in results:
+        assert lines[index + 1].startswith("Sold ") and lines[index + 5] == "*************************"
+
+
+def test_idle_backoff_stops_at_the_poll_interval_unless_configured(monkeypatch) -> None:
+    monkeypatch.setattr("kursach_desktop.poller.random.uniform", lambda low, high: high)
+    scheduler = PollScheduler(5, 1)
+    assert [scheduler.next_delay(received=0, limit=10) for _ in range(4)] == [5, 5, 5, 5]
+    assert scheduler.next_delay(received=0, limit=10, failed=True) == 5
+
+    scheduler = PollScheduler(5, 1, 30)
+    assert [scheduler.next_delay(received=0, limit=10) for _ in range(4)] == [10, 20, 30, 30]
+    # Activity drops to the lower bound; a full page is fetched again right away.
+    assert scheduler.next_delay(received=3, limit=10) == 1
+    assert scheduler.next_delay(received=10, limit=10) == 0.0
+
+
+def test_async_components_can_be_built_without_an_event_loop(backend, make_api, state_store, config) -> None:
+    client = httpx.AsyncClient(base_url=BASE_URL, transport=backend.async_transport())
+    async_api = AsyncKursachApi(BASE_URL, token="t", client=client)
+    dispatcher = DeviceCommandDispatcher(make_api(), state_store, config, async_api=async_api)
+    AsyncCommandPoller(async_api, dispatcher, state_store, config)
+    AsyncAckOutbox(async_api)
+    MultiDevicePoller(config, [DeviceProfile(device_id="pc-1")])
+
+    async def prompt_locks():
+        try:
+            return dispatcher.prompt_lock, dispatcher.prompt_lock
+        finally:
+            await client.aclose()
+
+    first, second = asyncio.run(prompt_locks())
+    assert first is second
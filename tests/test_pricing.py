@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+from kursach_desktop.api import ApiError, AsyncKursachApi
+from kursach_desktop.fake_backend import SOURCE_SKEW
+from kursach_desktop.pricing import (
+    best_preview,
+    best_preview_async,
+    refresh_if_stale,
+    select_best_quote,
+)
+
+from .conftest import BASE_URL
+
+
+PREVIEW = "POST /crypto/sell/preview"
+
+
+class SourceOutage(httpx.BaseTransport):
+    """Answers 503 to previews quoted from ``sources``; everything else goes to the backend."""
+
+    def __init__(self, backend, *sources: str) -> None:
+        self.backend = backend
+        self.sources = set(sources)
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/crypto/sell/preview" and json.loads(request.content).get("source") in self.sources:
+            return httpx.Response(503, json={"detail": "Source unavailable"})
+        return self.backend.handle(request)
+
+
+def test_best_preview_quotes_every_source_at_once(backend, make_api) -> None:
+    backend.config.latency_seconds = 0.05
+    api = make_api()
+
+    started = time.perf_counter()
+    best = best_preview(api, asset_id="bitcoin", quantity=1.0, amount_usd=None)
+
+    assert time.perf_counter() - started < 0.09
+    assert backend.request_counts[PREVIEW] == 2
+    assert best.source == max(SOURCE_SKEW, key=SOURCE_SKEW.get)
+    assert set(best.quotes) == set(SOURCE_SKEW)
+    assert best.spread_pct == pytest.approx((max(SOURCE_SKEW.values()) - 1) * 100)
+
+
+def test_a_failing_source_is_skipped(backend, make_api) -> None:
+    api = make_api(transport=SourceOutage(backend, "coingecko"))
+
+    best = best_preview(api, asset_id="bitcoin", quantity=1.0, amount_usd=None)
+
+    assert best.source == "coincap"
+    assert best.spread_pct == 0.0
+
+
+def test_all_sources_failing_raises_the_backend_error(backend, make_api) -> None:
+    api = make_api(transport=SourceOutage(backend, "coincap", "coingecko"))
+
+    with pytest.raises(ApiError) as excinfo:
+        best_preview(api, asset_id="bitcoin", quantity=1.0, amount_usd=None)
+    assert excinfo.value.status_code == 503
+
+
+def test_async_best_preview_matches_the_blocking_one(backend, make_api) -> None:
+    async def run():
+        async with httpx.AsyncClient(base_url=BASE_URL, transport=backend.async_transport()) as client:
+            api = AsyncKursachApi(BASE_URL, token=backend.issue_token(), client=client)
+            return await best_preview_async(api, asset_id="ethereum", quantity=None, amount_usd=500.0)
+
+    best = asyncio.run(run())
+    blocking = best_preview(make_api(), asset_id="ethereum", quantity=None, amount_usd=500.0)
+    assert best.source == blocking.source
+    assert best.preview["proceeds"] == pytest.approx(blocking.preview["proceeds"])
+
+
+def test_ties_on_proceeds_go_to_the_higher_unit_price() -> None:
+    best = select_best_quote(
+        {
+            "coincap": {"proceeds": 100.0, "unit_price": 10.0},
+            "coingecko": {"proceeds": 100.0, "unit_price": 10.5},
+            "broken": {"proceeds": "n/a"},
+        }
+    )
+    assert best.source == "coingecko"
+    with pytest.raises(ApiError):
+        select_best_quote({})
+
+
+def test_only_stale_quotes_are_refreshed(backend, make_api) -> None:
+    api = make_api()
+    best = best_preview(api, asset_id="bitcoin", quantity=1.0, amount_usd=None)
+
+    assert refresh_if_stale(api, best, asset_id="bitcoin", quantity=1.0, amount_usd=None, max_age=5) is best
+    best.quoted_at -= 10
+    fresh = refresh_if_stale(api, best, asset_id="bitcoin", quantity=1.0, amount_usd=None, max_age=5)
+    assert fresh is not best and fresh.age < 5
+    assert backend.request_counts[PREVIEW] == 4
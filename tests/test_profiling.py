@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+
+import pytest
+
+from kursach_desktop.profiling import ProfileSession, Tracer, async_span, install_tracer, span, traced
+
+
+@pytest.fixture
+def tracer() -> Tracer:
+    tracer = Tracer()
+    install_tracer(tracer)
+    yield tracer
+    install_tracer(None)
+
+
+def test_spans_are_no_ops_without_a_tracer() -> None:
+    assert span("a") is span("b", "http", route="/x")
+    assert async_span("a") is span("a")
+
+
+def test_blocking_spans_are_complete_events(tracer, tmp_path) -> None:
+    with span("refresh", "http", route="/crypto/dashboard"):
+        with span("parse"):
+            pass
+    with pytest.raises(ValueError):
+        with span("broken"):
+            raise ValueError("boom")
+
+    events = [event for event in tracer.events() if event["ph"] == "X"]
+    assert [event["name"] for event in events] == ["parse", "refresh", "broken"]
+    parse, refresh, broken = events
+    assert refresh["cat"] == "http" and refresh["args"] == {"route": "/crypto/dashboard"}
+    assert refresh["ts"] <= parse["ts"] and parse["ts"] + parse["dur"] <= refresh["ts"] + refresh["dur"]
+    assert broken["args"] == {"error": "ValueError"}
+
+    path = tmp_path / "trace.json"
+    tracer.write(path)
+    document = json.loads(path.read_text(encoding="utf-8"))
+    assert document["traceEvents"][0]["ph"] == "M"
+    assert len(document["traceEvents"]) == 4
+
+
+def test_traced_coroutines_produce_async_pairs(tracer) -> None:
+    @traced()
+    async def fetch(delay: float) -> float:
+        await asyncio.sleep(delay)
+        return delay
+
+    @traced("sum")
+    def add(a: int, b: int) -> int:
+        return a + b
+
+    async def run() -> list:
+        return await asyncio.gather(fetch(0.01), fetch(0.02))
+
+    assert asyncio.run(run()) == [0.01, 0.02]
+    assert add(1, 2) == 3
+
+    events = tracer.events()
+    begins = [event for event in events if event["ph"] == "b"]
+    ends = {event["id"]: event for event in events if event["ph"] == "e"}
+    assert {event["name"] for event in begins} == {fetch.__qualname__}
+    assert len(begins) == 2 and sorted(ends) == sorted(event["id"] for event in begins)
+    # The two fetches overlap on one thread.
+    first, second = sorted(begins, key=lambda event: event["ts"])
+    assert second["ts"] < ends[first["id"]]["ts"]
+    assert [event["name"] for event in events if event["ph"] == "X"] == ["sum"]
+
+
+def test_txt_profile_is_a_cumulative_report(tmp_path) -> None:
+    path = tmp_path / "profile.txt"
+    session = ProfileSession(path).start()
+    sum(range(10_000))
+    session.stop()
+
+    assert "cumulative" in path.read_text(encoding="utf-8")
+
+
+def test_folded_profile_samples_other_threads(tmp_path) -> None:
+    path = tmp_path / "profile.folded"
+    session = ProfileSession(path, interval=0.001).start()
+    time.sleep(0.05)
+    session.stop()
+
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert lines and all(int(line.rsplit(" ", 1)[1]) > 0 for line in lines)
+    assert any(line.startswith("MainThread;") for line in lines)
+    assert not any("stack-sampler" in line for line in lines)
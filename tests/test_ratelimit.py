@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import time
+from email.utils import formatdate
+
+import pytest
+
+from kursach_desktop.config import AppConfig
+from kursach_desktop.ratelimit import RateLimiter, build_rate_limiter, parse_retry_after
+
+from .conftest import Clock
+
+
+DASHBOARD = "/crypto/dashboard"
+
+
+def test_global_bucket_spaces_requests_after_the_burst() -> None:
+    clock = Clock()
+    limiter = RateLimiter(rate=10, burst=2, clock=clock)
+
+    assert [limiter.reserve(DASHBOARD) for _ in range(4)] == pytest.approx([0, 0, 0.1, 0.2])
+    clock.now += 1
+    assert limiter.reserve(DASHBOARD) == 0
+
+
+def test_route_buckets_use_the_route_template() -> None:
+    limiter = RateLimiter(burst=1, routes={"/crypto/history/{asset_id}": 2}, clock=Clock())
+
+    assert limiter.reserve("/crypto/history/bitcoin") == 0
+    assert limiter.reserve("/crypto/history/ethereum?days=7") == pytest.approx(0.5)
+    assert limiter.reserve(DASHBOARD) == 0
+
+
+def test_retry_after_pauses_every_route() -> None:
+    clock = Clock()
+    limiter = RateLimiter(clock=clock)
+    limiter.observe(429, {"retry-after": "2"})
+
+    assert limiter.reserve(DASHBOARD) == 2
+    assert limiter.reserve("/crypto/sell/overview") == 2
+    assert limiter.stats()["throttled"] == 1
+    clock.now += 2
+    assert limiter.reserve(DASHBOARD) == 0
+
+
+def test_rate_limit_headers_spread_the_remaining_budget() -> None:
+    clock = Clock()
+    limiter = RateLimiter(burst=1, clock=clock)
+    limiter.observe(200, {"ratelimit-remaining": "4", "ratelimit-reset": "2"})
+
+    assert limiter.stats()["server_rate"] == 2
+    assert [limiter.reserve(DASHBOARD) for _ in range(3)] == pytest.approx([0, 0.5, 1.0])
+    clock.now += 2
+    assert limiter.reserve(DASHBOARD) == 0
+
+    limiter.observe(200, {"x-ratelimit-remaining": "0", "x-ratelimit-reset": "3"})
+    assert limiter.reserve(DASHBOARD) == 3
+
+
+def test_throttling_without_hints_uses_the_default_pause_unless_disabled() -> None:
+    limiter = RateLimiter(clock=Clock())
+    limiter.observe(429, {})
+    assert limiter.reserve(DASHBOARD) == 1.0
+
+    passive = RateLimiter(adaptive=False, clock=Clock())
+    passive.observe(429, {"retry-after": "5"})
+    assert passive.reserve(DASHBOARD) == 0
+
+
+def test_retry_after_accepts_http_dates() -> None:
+    assert parse_retry_after("1.5") == 1.5
+    assert parse_retry_after(formatdate(time.time() + 30, usegmt=True)) == pytest.approx(30, abs=2)
+    assert parse_retry_after("soon") is None
+
+
+def test_limiter_is_built_only_when_configured() -> None:
+    assert build_rate_limiter(AppConfig(rate_limit_adaptive=False)) is None
+    assert build_rate_limiter(AppConfig(rate_limit_adaptive=False, rate_limit_per_second=5)) is not None
+
+
+def test_client_paces_itself_to_the_backend_budget(backend, make_api) -> None:
+    backend.config.rate_limit = 3
+    limiter = RateLimiter()
+    api = make_api(rate_limiter=limiter)
+
+    for _ in range(4):
+        api.get_dashboard()
+
+    assert backend.throttled == 0
+    assert limiter.stats()["throttled"] == 0
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import pytest
+
+from kursach_desktop.api import ApiError, CircuitOpenError
+from kursach_desktop.config import AppConfig
+from kursach_desktop.resilience import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    RetryPolicy,
+    RetryRule,
+    build_retry_policy,
+)
+
+from .conftest import Clock, FlakyTransport
+
+
+FAST = RetryRule(max_attempts=3, base_delay=0.001, max_delay=0.01)
+
+
+def test_reads_are_retried_on_transient_errors(backend, make_api) -> None:
+    transport = FlakyTransport(backend, "GET /crypto/dashboard", 2)
+    api = make_api(transport=transport, retry_policy=RetryPolicy(FAST, {}))
+
+    assert api.get_dashboard()["cash_balance"] == backend.cash_balance
+    assert transport.calls["GET /crypto/dashboard"] == 3
+
+
+def test_retries_stop_at_max_attempts(backend, make_api) -> None:
+    transport = FlakyTransport(backend, "GET /crypto/dashboard", 5)
+    api = make_api(transport=transport, retry_policy=RetryPolicy(FAST, {}))
+
+    with pytest.raises(ApiError) as excinfo:
+        api.get_dashboard()
+    assert excinfo.value.status_code == 503
+    assert transport.calls["GET /crypto/dashboard"] == 3
+
+
+def test_sells_are_not_retried_by_default(backend, make_api) -> None:
+    transport = FlakyTransport(backend, "POST /crypto/sell", 1, mode="lost")
+    api = make_api(transport=transport, retry_policy=RetryPolicy(FAST))
+
+    with pytest.raises(ApiError):
+        api.execute_sell(asset_id="bitcoin", quantity=2.0, amount_usd=None, price_source="coincap")
+    assert transport.calls["POST /crypto/sell"] == 1
+    assert backend.idempotent_replays == 0
+
+
+def test_sell_rule_is_added_only_for_a_deduplicating_backend() -> None:
+    assert build_retry_policy(AppConfig()).rule_for("POST", "/crypto/sell") is None
+    policy = build_retry_policy(AppConfig(backend_idempotency=True))
+    assert policy.rule_for("POST", "/crypto/sell") == policy.default
+
+
+def test_lost_sell_response_is_replayed_not_repeated(backend, make_api) -> None:
+    transport = FlakyTransport(backend, "POST /crypto/sell", 1, mode="lost")
+    api = make_api(transport=transport, retry_policy=RetryPolicy(FAST, {"POST /crypto/sell": FAST}))
+
+    result = api.execute_sell(asset_id="bitcoin", quantity=2.0, amount_usd=None, price_source="coincap")
+
+    assert result["quantity"] == 2.0
+    assert transport.calls["POST /crypto/sell"] == 2
+    assert backend.idempotent_replays == 1
+    assert backend.holdings["bitcoin"] == pytest.approx(998.0)
+
+
+def test_non_idempotent_posts_are_not_retried(backend, make_api) -> None:
+    transport = FlakyTransport(backend, "POST /auth/logout", 1)
+    api = make_api(transport=transport, retry_policy=RetryPolicy(FAST, {}))
+
+    with pytest.raises(ApiError):
+        api.logout()
+    assert transport.calls["POST /auth/logout"] == 1
+
+
+def test_retry_after_beyond_the_cap_gives_up() -> None:
+    policy = RetryPolicy(FAST, {})
+    assert policy.delay(FAST, 1, 429, retry_after=0.005) == pytest.approx(0.005, abs=0.005)
+    assert policy.delay(FAST, 1, 429, retry_after=60) is None
+    assert policy.delay(FAST, 1, 400) is None
+
+
+def test_breaker_opens_fails_fast_and_recovers(backend, make_api) -> None:
+    clock = Clock()
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=5, clock=clock)
+    transport = FlakyTransport(backend, "GET /crypto/dashboard", 2)
+    api = make_api(transport=transport, breaker=breaker)
+
+    for _ in range(2):
+        with pytest.raises(ApiError):
+            api.get_dashboard()
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        api.get_dashboard()
+    assert transport.calls["GET /crypto/dashboard"] == 2
+
+    clock.now += 5
+    assert breaker.state == HALF_OPEN
+    api.get_dashboard()
+    assert breaker.state == CLOSED
+    assert breaker.stats() == {"state": CLOSED, "trips": 1, "rejected": 1}
+
+
+def test_failed_half_open_probe_reopens_the_breaker() -> None:
+    clock = Clock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=5, clock=clock)
+    breaker.record(503)
+    clock.now += 5
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+    breaker.record(-1)
+
+    assert breaker.state == OPEN
+    assert breaker.retry_in() == 5
+    # Client errors say nothing about backend health.
+    clock.now += 5
+    breaker.allow_request()
+    breaker.record(429)
+    assert breaker.state == CLOSED
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import pytest
+
+from kursach_desktop.api import AsyncKursachApi
+from kursach_desktop.singleflight import AsyncSingleFlight, SingleFlight
+
+from .conftest import BASE_URL
+
+
+DASHBOARD = "GET /crypto/dashboard"
+
+
+def test_concurrent_identical_reads_share_one_request(backend, make_api) -> None:
+    backend.config.latency_seconds = 0.05
+    api = make_api()
+    start = threading.Barrier(8)
+
+    def read() -> dict:
+        start.wait()
+        return api.get_dashboard()
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: read(), range(8)))
+
+    assert backend.request_counts[DASHBOARD] == 1
+    assert api.coalescer.stats() == {"leaders": 1, "shared": 7}
+    results[0]["cash_balance"] = -1
+    assert all(result["cash_balance"] == backend.cash_balance for result in results[1:])
+    # Only overlapping calls are merged.
+    api.get_dashboard()
+    assert backend.request_counts[DASHBOARD] == 2
+
+
+def test_reads_with_different_tokens_are_not_merged(backend, make_api) -> None:
+    backend.config.latency_seconds = 0.05
+    coalescer = SingleFlight()
+    apis = [make_api(coalescer=coalescer), make_api(coalescer=coalescer)]
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        list(pool.map(lambda api: api.get_dashboard(), apis))
+
+    assert backend.request_counts[DASHBOARD] == 2
+    assert coalescer.stats()["shared"] == 0
+
+
+def test_waiters_see_the_leaders_error() -> None:
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def fail() -> None:
+        release.wait(1)
+        raise ValueError("backend down")
+
+    def call() -> str:
+        try:
+            flight.do("key", fail)
+        except ValueError as exc:
+            return str(exc)
+        return "no error"
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        futures = [pool.submit(call) for _ in range(3)]
+        while flight.leaders + flight.shared < 3:
+            time.sleep(0.001)
+        release.set()
+        assert [future.result() for future in futures] == ["backend down"] * 3
+    assert flight.stats() == {"leaders": 1, "shared": 2}
+
+
+def test_async_callers_share_a_request_that_survives_cancellation(backend) -> None:
+    backend.config.latency_seconds = 0.05
+
+    async def run() -> list:
+        async with httpx.AsyncClient(base_url=BASE_URL, transport=backend.async_transport()) as client:
+            api = AsyncKursachApi(BASE_URL, token=backend.issue_token(), client=client)
+            impatient = asyncio.ensure_future(api.get_dashboard())
+            others = [asyncio.ensure_future(api.get_dashboard()) for _ in range(3)]
+            await asyncio.sleep(0.01)
+            impatient.cancel()
+            results = await asyncio.gather(*others)
+            with pytest.raises(asyncio.CancelledError):
+                await impatient
+            assert api.coalescer.stats() == {"leaders": 1, "shared": 3}
+            return results
+
+    results = asyncio.run(run())
+    assert backend.request_counts[DASHBOARD] == 1
+    assert [result["cash_balance"] for result in results] == [backend.cash_balance] * 3
+
+
+def test_async_error_is_raised_to_every_caller() -> None:
+    flight = AsyncSingleFlight()
+
+    async def fail() -> None:
+        await asyncio.sleep(0.01)
+        raise ValueError("backend down")
+
+    async def run() -> list:
+        return await asyncio.gather(*(flight.do("key", fail) for _ in range(3)), return_exceptions=True)
+
+    assert [type(result) for result in asyncio.run(run())] == [ValueError] * 3
+    assert flight.stats() == {"leaders": 1, "shared": 2}
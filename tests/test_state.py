@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import json
+import os
+import time
+
+import pytest
+
+from kursach_desktop import state as state_module
+from kursach_desktop.state import DesktopStateStore, atomic_write
+
+
+def _on_disk(path) -> dict:
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def test_critical_fields_skip_the_debounce(tmp_path) -> None:
+    path = tmp_path / "device_state.json"
+    store = DesktopStateStore(path, flush_interval=60)
+    store.update(last_polled_at="t1")
+    store.update(last_polled_at="t2")
+    assert _on_disk(path)["last_polled_at"] == "t1"
+    assert store.dirty
+
+    store.update(last_command_id=42)
+    assert _on_disk(path) == {"access_token": None, "last_command_id": 42, "last_polled_at": "t2"}
+    assert not store.dirty
+    store.close()
+
+
+def test_debounced_update_is_written_by_the_trailing_flush(tmp_path) -> None:
+    path = tmp_path / "device_state.json"
+    store = DesktopStateStore(path, flush_interval=0.05)
+    store.update(last_polled_at="t1")
+    store.update(last_polled_at="t2")
+    assert _on_disk(path)["last_polled_at"] == "t1"
+
+    time.sleep(0.2)
+    assert _on_disk(path)["last_polled_at"] == "t2"
+    assert not store.dirty
+    store.close()
+
+
+def test_close_flushes_and_unchanged_state_is_not_rewritten(tmp_path, monkeypatch) -> None:
+    path = tmp_path / "device_state.json"
+    store = DesktopStateStore(path, flush_interval=60)
+    store.update(last_polled_at="t1")
+    store.update(last_polled_at="t2")
+    store.close()
+    assert _on_disk(path)["last_polled_at"] == "t2"
+
+    writes = []
+    monkeypatch.setattr(state_module, "atomic_write", lambda *args: writes.append(args))
+    store = DesktopStateStore(path, flush_interval=0)
+    store.update(last_polled_at="t2")
+    store.close()
+    assert writes == []
+
+
+def test_unreadable_file_is_ignored(tmp_path) -> None:
+    path = tmp_path / "device_state.json"
+    path.write_text("{not json", encoding="utf-8")
+
+    store = DesktopStateStore(path)
+    assert store.state.access_token is None
+    store.set_token("token")
+    assert _on_disk(path)["access_token"] == "token"
+    store.close()
+
+
+def test_reload_picks_up_another_writer_unless_changes_are_pending(tmp_path) -> None:
+    path = tmp_path / "device_state.json"
+    store = DesktopStateStore(path, flush_interval=60)
+    store.set_token("mine")
+    assert not store.reload_if_changed()
+
+    other = DesktopStateStore(path)
+    other.update(last_command_id=7)
+    other.close()
+    assert store.reload_if_changed()
+    assert (store.state.access_token, store.state.last_command_id) == ("mine", 7)
+
+    store.update(last_polled_at="t1")
+    store.update(last_polled_at="t2")
+    atomic_write(path, json.dumps({"access_token": "theirs"}))
+    assert not store.reload_if_changed()
+    assert store.state.access_token == "mine"
+    store.close()
+
+
+def test_failed_atomic_write_keeps_the_old_file(tmp_path, monkeypatch) -> None:
+    path = tmp_path / "device_state.json"
+    atomic_write(path, "old")
+
+    def fail(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(os, "replace", fail)
+    with pytest.raises(OSError):
+        atomic_write(path, "new")
+
+    assert path.read_text(encoding="utf-8") == "old"
+    assert [entry.name for entry in tmp_path.iterdir()] == ["device_state.json"]
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import httpx
+import pytest
+
+from kursach_desktop.api import KursachApi
+from kursach_desktop.fake_backend import FakeBackend, FakeBackendConfig
+from kursach_desktop.transactions import TransactionStore, parse_since
+
+from .conftest import BASE_URL
+
+
+def _trade(transaction_id: int, side: str, quantity: float, price: float, created_at: str, **extra) -> dict:
+    return {
+        "id": transaction_id,
+        "asset_id": "bitcoin",
+        "symbol": "BTC",
+        "type": side,
+        "quantity": quantity,
+        "price": price,
+        "total": quantity * price,
+        "created_at": created_at,
+        **extra,
+    }
+
+
+def test_sync_follows_pages_and_then_only_fetches_new_rows(tmp_path) -> None:
+    backend = FakeBackend(FakeBackendConfig(seed=7, history=20, transactions_page_size=10))
+    with httpx.Client(base_url=BASE_URL, transport=backend.transport()) as client:
+        api = KursachApi(BASE_URL, token=backend.issue_token(), client=client)
+        with TransactionStore(tmp_path / "tx.sqlite3") as store:
+            first = store.sync(api)
+            assert (first.pages, first.inserted, first.last_id) == (3, 25, 25)
+
+            api.execute_sell(asset_id="bitcoin", quantity=0.5, amount_usd=None, price_source="coincap")
+            second = store.sync(api)
+            assert (second.pages, second.fetched, second.inserted, store.count()) == (1, 1, 1, 26)
+
+
+def test_sync_stops_when_the_server_ignores_the_cursor(tmp_path) -> None:
+    page = {"items": [_trade(1, "BUY", 1.0, 100.0, "2024-01-01T00:00:00Z")], "next_cursor": "2"}
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(dict(request.url.params))
+        return httpx.Response(200, json=page)
+
+    with httpx.Client(base_url=BASE_URL, transport=httpx.MockTransport(handler)) as client:
+        with TransactionStore(tmp_path / "tx.sqlite3") as store:
+            report = store.sync(KursachApi(BASE_URL, token="t", client=client))
+
+    assert report.pages == 2
+    assert calls == [{}, {"cursor": "2"}]
+
+
+def test_realized_pnl_uses_server_values_or_average_cost(tmp_path) -> None:
+    with TransactionStore(tmp_path / "tx.sqlite3") as store:
+        store.insert(
+            [
+                _trade(1, "BUY", 2.0, 100.0, "2024-01-01T00:00:00Z"),
+                _trade(2, "BUY", 2.0, 200.0, "2024-01-02T00:00:00Z"),
+                # Average cost 150: 1 unit sold at 300 makes 150.
+                _trade(3, "SELL", 1.0, 300.0, "2024-01-03T00:00:00Z"),
+                _trade(4, "SELL", 1.0, 300.0, "2024-01-04T00:00:00Z", realized_pnl=42.0),
+                {**_trade(5, "SELL", 1.0, 10.0, "2024-01-05T00:00:00Z"), "asset_id": "ethereum", "symbol": "ETH"},
+            ]
+        )
+
+        bitcoin, ethereum = store.realized_pnl()
+        assert (bitcoin.asset_id, bitcoin.buys, bitcoin.sells) == ("bitcoin", 2, 2)
+        assert bitcoin.realized_pnl == pytest.approx(150.0 + 42.0)
+        assert bitcoin.proceeds == pytest.approx(600.0)
+        # Nothing bought: the whole sale counts as profit.
+        assert ethereum.realized_pnl == pytest.approx(10.0)
+
+        # Buys before the window still set the cost basis of sells inside it.
+        (windowed,) = store.realized_pnl(asset="BITCOIN", since=parse_since("2024-01-03"))
+        assert (windowed.buys, windowed.sells) == (0, 2)
+        assert windowed.realized_pnl == pytest.approx(192.0)
+
+
+def test_query_filters_by_asset_side_and_time(tmp_path) -> None:
+    with TransactionStore(tmp_path / "tx.sqlite3") as store:
+        store.insert(
+            [
+                _trade(1, "BUY", 1.0, 100.0, "2024-01-01T00:00:00Z"),
+                _trade(2, "sell", 0.5, 110.0, "2024-01-02T00:00:00Z"),
+                _trade(3, "SELL", 0.5, 120.0, "2024-01-03T00:00:00Z"),
+                {"id": 4, "type": "BUY"},
+            ]
+        )
+
+        assert store.count() == 3
+        assert [row.id for row in store.query(side="sell")] == [3, 2]
+        assert [row.id for row in store.query(since=parse_since("2024-01-02"), limit=1)] == [3]
+        assert store.query(asset="ethereum") == []
+
+
+def test_parse_since_accepts_durations_and_dates() -> None:
+    assert parse_since("2h", now=10_000.0) == 10_000.0 - 7200
+    assert parse_since("1w", now=1e6) == 1e6 - 7 * 86400
+    with pytest.raises(ValueError):
+        parse_since("soon")
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import asyncio
+import io
+
+import httpx
+
+from kursach_desktop.api import AsyncKursachApi
+from kursach_desktop.watch import CLEAR_BELOW, CLEAR_SCREEN, FrameRenderer, watch_dashboard
+
+from .conftest import BASE_URL
+
+
+class Screen(io.StringIO):
+    def __init__(self) -> None:
+        super().__init__()
+        self.writes: list = []
+
+    def write(self, text: str) -> int:
+        self.writes.append(text)
+        return super().write(text)
+
+
+def test_terminal_frames_rewrite_only_changed_rows() -> None:
+    screen = Screen()
+    renderer = FrameRenderer(screen, ansi=True)
+
+    assert renderer.render(["Cash: 1", "BTC: 2", "ETH: 3"], "ok") == 5
+    assert screen.writes[0].startswith("\x1b[?25l" + CLEAR_SCREEN)
+
+    assert renderer.render(["Cash: 1", "BTC: 5", "ETH: 3"], "ok") == 1
+    assert screen.writes[1] == "\x1b[2;1HBTC: 5\x1b[K"
+
+    assert renderer.render(["Cash: 1", "BTC: 5", "ETH: 3"], "ok") == 0
+    assert len(screen.writes) == 2
+
+    assert renderer.render(["Cash: 1"], "ok") == 2
+    assert screen.writes[2].endswith("\x1b[4;1H" + CLEAR_BELOW)
+    assert renderer.stats.writes == 3 and renderer.stats.frames == 4
+
+
+def test_plain_output_prints_whole_frames_only_on_change() -> None:
+    screen = Screen()
+    renderer = FrameRenderer(screen, ansi=False)
+
+    renderer.render(["Cash: 1", "BTC: 2"], "updated 10:00")
+    renderer.render(["Cash: 1", "BTC: 2"], "updated 10:01")
+    renderer.render(["Cash: 2", "BTC: 2"], "updated 10:02")
+    renderer.close()
+
+    assert screen.writes == ["Cash: 1\nBTC: 2\nupdated 10:00\n", "Cash: 2\nBTC: 2\nupdated 10:02\n"]
+    assert "\x1b" not in screen.getvalue()
+
+
+def test_failed_refresh_keeps_the_last_frame(backend) -> None:
+    overviews = []
+
+    def handle(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/crypto/sell/overview":
+            overviews.append(request)
+            if len(overviews) == 2:
+                return httpx.Response(503, json={"detail": "Injected failure"})
+        return backend.handle(request)
+
+    async def run():
+        async with httpx.AsyncClient(base_url=BASE_URL, transport=httpx.MockTransport(handle)) as client:
+            api = AsyncKursachApi(BASE_URL, token=backend.issue_token(), client=client)
+            renderer = FrameRenderer(Screen(), ansi=True)
+            return renderer, await watch_dashboard(api, renderer, interval=0, iterations=3)
+
+    renderer, stats = asyncio.run(run())
+
+    assert (stats.frames, stats.errors) == (3, 1)
+    first, failed, recovered = renderer.stream.writes
+    assert "Desktop Dashboard" in first
+    # Only the status row changes; the dashboard rows stay as they were.
+    assert "Refresh failed" in failed and "Desktop Dashboard" not in failed
+    assert "Updated" in recovered